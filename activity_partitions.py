@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+活动表按 start_time 分区
+支持按年(year)或学期(semester)做 RANGE COLUMNS 分区：
+建表子句、写入前补齐分区、预建未来分区、归档旧分区，以及用 EXPLAIN 验证分区裁剪。
+分区表在全量爬取时保留（不重建），归档过的分区不会回来
+"""
+
+import sys
+import argparse
+from datetime import datetime
+import pymysql
+from summary_tables import rebuild_summary
+
+# ============ 配置 ============
+PARTITION_START_YEAR = 2019  # 最早的独立分区，更早的数据进入 p_old
+PARTITION_AHEAD = 2  # 预建的未来分区个数
+NULL_START_TIME = datetime(1970, 1, 1)  # 分区表主键包含 start_time，缺失时用此值代替（落在 p_old，不归档）
+
+DB_CONFIG = {
+    'host': '10.5.80.8',
+    'user': 'root',
+    'password': '123456',
+    'database': '2ketang',
+    'charset': 'utf8mb4'
+}
+# ==============================
+
+# 进程内缓存的分区上界，避免每批写入都查询 information_schema
+_known_bounds = {}
+
+
+def period_of(dt, scheme):
+    """返回时间所在的分区周期: (分区名, 下界, 上界)
+
+    学期划分: 上半年学期 [2月1日, 8月1日)，下半年学期 [8月1日, 次年2月1日)
+    """
+    if scheme == 'year':
+        return f"p{dt.year}", datetime(dt.year, 1, 1), datetime(dt.year + 1, 1, 1)
+    if scheme == 'semester':
+        if dt.month >= 8:
+            return f"p{dt.year}s2", datetime(dt.year, 8, 1), datetime(dt.year + 1, 2, 1)
+        if dt.month >= 2:
+            return f"p{dt.year}s1", datetime(dt.year, 2, 1), datetime(dt.year, 8, 1)
+        return f"p{dt.year - 1}s2", datetime(dt.year - 1, 8, 1), datetime(dt.year, 2, 1)
+    raise ValueError(f"未知的分区方案: {scheme}")
+
+
+def periods_between(start, end, scheme):
+    """从 start 所在周期到 end 所在周期（含）的全部周期"""
+    periods = []
+    current = period_of(start, scheme)
+    while current[1] <= end:
+        periods.append(current)
+        current = period_of(current[2], scheme)
+    return periods
+
+
+def _partition_sql(name, upper):
+    return f"PARTITION {name} VALUES LESS THAN ('{upper:%Y-%m-%d %H:%M:%S}')"
+
+
+def partition_clause(scheme, now=None):
+    """CREATE TABLE 末尾的分区子句"""
+    now = now or datetime.now()
+    first = datetime(PARTITION_START_YEAR, 1, 1) if scheme == 'year' else datetime(PARTITION_START_YEAR, 2, 1)
+    last = now
+    for _ in range(PARTITION_AHEAD):
+        last = period_of(last, scheme)[2]
+    parts = [f"PARTITION p_old VALUES LESS THAN ('{first:%Y-%m-%d %H:%M:%S}')"]
+    parts += [_partition_sql(name, upper) for name, _, upper in periods_between(first, last, scheme)]
+    parts.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+    return "PARTITION BY RANGE COLUMNS(start_time) (\n        " + ",\n        ".join(parts) + "\n    )"
+
+
+def load_partitions(cursor, table='activities', database=DB_CONFIG['database']):
+    """读取表的分区列表: [(分区名, 上界datetime或None)]，按顺序排列"""
+    cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (database, table)
+    )
+    partitions = []
+    for name, description in cursor.fetchall():
+        description = (description or '').strip("'")
+        upper = None if description.upper() == 'MAXVALUE' else datetime.strptime(description, '%Y-%m-%d %H:%M:%S')
+        partitions.append((name, upper))
+    return partitions
+
+
+def detect_scheme(partitions):
+    """根据分区名推断分区方案，未分区时返回None"""
+    for name, _ in partitions:
+        if name.startswith('p') and name[1:5].isdigit():
+            return 'semester' if name.endswith(('s1', 's2')) else 'year'
+    return None
+
+
+def reset_partition_cache():
+    """表被重建后清空进程内缓存的分区上界"""
+    _known_bounds.clear()
+
+
+def _last_bound(cursor):
+    if 'activities' not in _known_bounds:
+        partitions = load_partitions(cursor)
+        bounds = [upper for _, upper in partitions if upper is not None]
+        _known_bounds['activities'] = (detect_scheme(partitions), max(bounds) if bounds else None)
+    return _known_bounds['activities']
+
+
+def ensure_partitions(cursor, upto, scheme=None):
+    """保证 upto 时间落在独立分区内：不够时把 p_future 拆分出新的分区
+
+    p_future 中通常没有数据，REORGANIZE 只改元数据，代价很小。
+    """
+    detected, last_bound = _last_bound(cursor)
+    scheme = scheme or detected
+    if scheme is None or last_bound is None or upto < last_bound:
+        return []
+
+    new_periods = periods_between(last_bound, upto, scheme)
+    parts = [_partition_sql(name, upper) for name, _, upper in new_periods]
+    parts.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+    cursor.execute(f"ALTER TABLE activities REORGANIZE PARTITION p_future INTO ({', '.join(parts)})")
+    _known_bounds['activities'] = (scheme, new_periods[-1][2])
+    names = [name for name, _, _ in new_periods]
+    print(f"    [分区] 新增分区: {', '.join(names)}")
+    return names
+
+
+def route_batch(cursor, start_times):
+    """写入一批活动前调用：按这批数据的最大开始时间补齐分区"""
+    times = [t for t in start_times if t is not None]
+    if times:
+        return ensure_partitions(cursor, max(times))
+    return []
+
+
+def add_future_partitions(cursor, ahead=PARTITION_AHEAD, now=None):
+    """预建从当前周期起往后 ahead 个周期的分区"""
+    scheme, _ = _last_bound(cursor)
+    if scheme is None:
+        print("activities 不是分区表")
+        return []
+    target = now or datetime.now()
+    for _ in range(ahead):
+        target = period_of(target, scheme)[2]
+    return ensure_partitions(cursor, target, scheme)
+
+
+def archive_partitions(cursor, before):
+    """把上界不晚于 before 的分区数据移到 activities_archive，再把这些分区并入 p_old
+
+    p_old 始终保留为最低的分区：开始时间缺失的活动以 NULL_START_TIME 写入这里，不归档；
+    合并后的 p_old 上界就是归档边界，之后爬到更早的活动直接写入归档表（见 archived_before）
+    """
+    partitions = load_partitions(cursor)
+    old = [(name, upper) for name, upper in partitions if upper is not None and upper <= before]
+    if not old:
+        return []
+
+    cursor.execute("SHOW TABLES LIKE 'activities_archive'")
+    if cursor.fetchone() is None:
+        cursor.execute("CREATE TABLE activities_archive LIKE activities")
+        cursor.execute("ALTER TABLE activities_archive REMOVE PARTITIONING")
+
+    for name, _ in old:
+        cursor.execute(f"REPLACE INTO activities_archive SELECT * FROM activities PARTITION ({name}) "
+                       f"WHERE start_time <> %s", (NULL_START_TIME,))
+        archived = cursor.rowcount
+        cursor.execute(f"DELETE FROM activities PARTITION ({name}) WHERE start_time <> %s", (NULL_START_TIME,))
+        print(f"    [分区] {name} 已归档 ({archived} 行)")
+
+    # 归档后的分区已空（只剩占位行），合并成一个 p_old 只需搬动占位行
+    names = [name for name, _ in old]
+    if names != ['p_old']:
+        cursor.execute(f"ALTER TABLE activities REORGANIZE PARTITION {', '.join(names)} "
+                       f"INTO ({_partition_sql('p_old', old[-1][1])})")
+        print(f"    [分区] {', '.join(names)} 已合并为 p_old (< {old[-1][1]:%Y-%m-%d})")
+    _known_bounds.pop('archive', None)
+
+    # 行被移出后汇总表需要重算
+    rebuild_summary(cursor, 'activities')
+    return names
+
+
+def archived_before(cursor):
+    """已归档的时间边界：有 activities_archive 时为 p_old 的上界，否则为 None
+
+    开始时间早于该边界的活动写入归档表，全量爬取不会把归档过的数据写回活动表
+    """
+    if 'archive' not in _known_bounds:
+        bound = None
+        cursor.execute("SHOW TABLES LIKE 'activities_archive'")
+        if cursor.fetchone() is not None:
+            bound = next((upper for name, upper in load_partitions(cursor) if name == 'p_old'), None)
+        _known_bounds['archive'] = bound
+    return _known_bounds['archive']
+
+
+def explain_partitions(cursor, start, end):
+    """对按时间范围查询执行 EXPLAIN，返回实际访问的分区列表"""
+    sql = "SELECT COUNT(*), SUM(hours) FROM activities WHERE start_time >= %s AND start_time < %s"
+    try:
+        cursor.execute("EXPLAIN PARTITIONS " + sql, (start, end))  # MySQL 5.7
+    except pymysql.MySQLError:
+        cursor.execute("EXPLAIN " + sql, (start, end))  # MySQL 8.0 默认输出 partitions 列
+    columns = [d[0] for d in cursor.description]
+    used = []
+    for row in cursor.fetchall():
+        partitions = dict(zip(columns, row)).get('partitions')
+        if partitions:
+            used.extend(partitions.split(','))
+    return used
+
+
+def _parse_date(text):
+    return datetime.strptime(text, '%Y-%m-%d')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="活动表分区维护")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='列出分区')
+    add = sub.add_parser('add', help='预建未来分区')
+    add.add_argument('--ahead', type=int, default=PARTITION_AHEAD)
+    archive = sub.add_parser('archive', help='归档旧分区')
+    archive.add_argument('--before', type=_parse_date, required=True, help='归档上界不晚于该日期的分区 (YYYY-MM-DD)')
+    explain = sub.add_parser('explain', help='验证时间范围查询的分区裁剪')
+    explain.add_argument('--from', dest='start', type=_parse_date, required=True)
+    explain.add_argument('--to', dest='end', type=_parse_date, required=True)
+    args = parser.parse_args()
+
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        if args.command == 'list':
+            partitions = load_partitions(cursor)
+            print(f"分区方案: {detect_scheme(partitions) or '未分区'}")
+            for name, upper in partitions:
+                print(f"  {name}: < {upper or 'MAXVALUE'}")
+        elif args.command == 'add':
+            add_future_partitions(cursor, args.ahead)
+        elif args.command == 'archive':
+            archive_partitions(cursor, args.before)
+        elif args.command == 'explain':
+            used = explain_partitions(cursor, args.start, args.end)
+            total = len(load_partitions(cursor))
+            print(f"访问分区: {', '.join(used) or '无'} ({len(used)}/{total})")
+            if total and len(used) >= total:
+                print("未发生分区裁剪")
+                return 1
+        conn.commit()
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+活动名称搜索
+对 activities.name 建立字二元组(bigram)倒排索引，保存为本地紧凑的倒排文件；
+爬取时增量更新，查询时求交集并回查原名称确认子串，结果按匹配程度排序
+
+说明：分区后的 InnoDB 表不支持 FULLTEXT 索引，所以索引放在本地文件而不是 MySQL ngram 解析器
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import heapq
+import struct
+import argparse
+import unicodedata
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+# ============ 配置 ============
+INDEX_FILE = "activity_search.idx"
+DEFAULT_LIMIT = 20
+
+DB_CONFIG = {
+    'host': '10.5.80.8',
+    'user': 'root',
+    'password': '123456',
+    'database': '2ketang',
+    'charset': 'utf8mb4'
+}
+# ==============================
+
+MAGIC = b'ASIX1'
+
+
+def normalize(text):
+    """统一全角/半角、大小写，去掉空白"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return ''.join(text.split())
+
+
+def bigrams(text):
+    """文本的字二元组集合（单字文本返回该字本身）"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class ActivitySearchIndex:
+    """活动名称倒排索引
+
+    文件格式: MAGIC + 头部长度(uint32) + 头部JSON + zlib压缩的倒排数据。
+    头部保存 act_id -> 名称 以及每个词项在倒排数据中的 (偏移, 长度)；
+    每个词项的倒排是升序 act_id 的差值(uint32)，差值很小，压缩后体积约为原始的几分之一。
+    查询用到某个词项时才做前缀和还原，结果缓存。
+    """
+
+    def __init__(self):
+        self.docs = {}  # act_id -> 原始名称
+        self._terms = {}  # 词项 -> (偏移, 长度)，指向文件中的倒排数据
+        self._postings = memoryview(array('I'))  # 文件中的倒排差值数据
+        self._decoded = {}  # 词项 -> 已还原的 act_id 数组
+        self._added = {}  # 词项 -> 增量加入的 act_id 集合（保存时合并）
+        self._normalized = {}  # act_id -> 规范化名称（查询时懒计算）
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        """加载索引文件，不存在时返回空索引"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"不是活动搜索索引文件: {path}")
+        offset = len(MAGIC)
+        (header_len,) = struct.unpack_from('<I', data, offset)
+        offset += 4
+        header = json.loads(data[offset:offset + header_len].decode('utf-8'))
+        offset += header_len
+
+        postings = array('I')
+        postings.frombytes(zlib.decompress(data[offset:]))
+        if header.get('byteorder') != sys.byteorder:
+            postings.byteswap()
+        index._postings = memoryview(postings)
+        for doc in header['docs']:
+            index.docs[doc[0]] = doc[1]
+            index._normalized[doc[0]] = doc[2] if len(doc) > 2 else doc[1]
+        index._terms = {term: tuple(pos) for term, pos in header['terms'].items()}
+        return index
+
+    def save(self, path=INDEX_FILE):
+        """合并增量后整体重写索引文件（先写临时文件再替换）"""
+        postings_by_term = {}
+        for act_id in self.docs:
+            for term in bigrams(self._normalized_name(act_id)):
+                postings_by_term.setdefault(term, []).append(act_id)
+
+        postings = array('I')
+        terms = {}
+        for term, ids in postings_by_term.items():
+            ids.sort()
+            terms[term] = (len(postings), len(ids))
+            postings.append(ids[0])
+            postings.extend(b - a for a, b in zip(ids, ids[1:]))
+
+        # 规范化后名称与原名不同时才额外保存
+        docs = []
+        for act_id, name in sorted(self.docs.items()):
+            normalized = self._normalized_name(act_id)
+            docs.append([act_id, name] if normalized == name else [act_id, name, normalized])
+
+        header = json.dumps({
+            'byteorder': sys.byteorder,
+            'docs': docs,
+            'terms': terms,
+        }, ensure_ascii=False).encode('utf-8')
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            f.write(zlib.compress(postings.tobytes(), 6))
+        os.replace(tmp_path, path)
+
+        self._postings = memoryview(postings)
+        self._decoded = {}
+        self._terms = terms
+        self._added = {}
+        self.dirty = False
+
+    def add_activities(self, activities):
+        """增量加入一批活动（爬取时每页调用）
+
+        名称变化的活动只追加新词项；旧词项留在倒排中，查询时会被名称回查过滤，
+        下次保存时自然清除。
+
+        Returns:
+            int: 新增或名称变化的活动数
+        """
+        changed = 0
+        for act in activities:
+            act_id = act.get('actId') or act.get('act_id')
+            name = act.get('name')
+            if not act_id or not name or self.docs.get(act_id) == name:
+                continue
+            self.docs[act_id] = name
+            self._normalized.pop(act_id, None)
+            for term in bigrams(normalize(name)):
+                self._added.setdefault(term, set()).add(act_id)
+            changed += 1
+        if changed:
+            self.dirty = True
+        return changed
+
+    def remove(self, act_id):
+        """删除一个活动（倒排中的残留同样由回查过滤）"""
+        if self.docs.pop(act_id, None) is not None:
+            self._normalized.pop(act_id, None)
+            self.dirty = True
+
+    def _base_postings(self, term):
+        decoded = self._decoded.get(term)
+        if decoded is None:
+            start, length = self._terms.get(term, (0, 0))
+            decoded = self._decoded[term] = array('I', accumulate(self._postings[start:start + length]))
+        return decoded
+
+    def _term_size(self, term):
+        return self._terms.get(term, (0, 0))[1] + len(self._added.get(term, ()))
+
+    def _candidates(self, query):
+        """求所有词项倒排的交集，返回候选 act_id 集合"""
+        terms = bigrams(query)
+        if len(query) == 1:
+            # 单字查询：合并所有包含该字的二元组
+            terms = {t for t in list(self._terms) + list(self._added) if query in t}
+            result = set()
+            for term in terms:
+                result.update(self._base_postings(term))
+                result.update(self._added.get(term, ()))
+            return result
+
+        ordered = sorted(terms, key=self._term_size)
+        first = ordered[0]
+        candidates = set(self._base_postings(first)) | self._added.get(first, set())
+        for term in ordered[1:]:
+            if not candidates:
+                break
+            base = self._base_postings(term)
+            added = self._added.get(term, ())
+            kept = set()
+            for act_id in candidates:
+                i = bisect_left(base, act_id)
+                if (i < len(base) and base[i] == act_id) or act_id in added:
+                    kept.add(act_id)
+            candidates = kept
+        return candidates
+
+    def _normalized_name(self, act_id):
+        name = self._normalized.get(act_id)
+        if name is None:
+            name = self._normalized[act_id] = normalize(self.docs[act_id])
+        return name
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """子串搜索
+
+        排序: 完全匹配 > 匹配位置靠前（前缀最优） > 名称较短 > act_id较大（较新）
+
+        Returns:
+            list: [(act_id, 名称)]
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        hits = []
+        for act_id in self._candidates(query):
+            if act_id not in self.docs:
+                continue
+            name = self._normalized_name(act_id)
+            position = name.find(query)
+            if position < 0:
+                continue
+            hits.append(((name != query, position, len(name), -act_id), act_id))
+        return [(act_id, self.docs[act_id]) for _, act_id in heapq.nsmallest(limit, hits)]
+
+
+def build_from_mysql():
+    """从 activities 表全量构建索引"""
+    import pymysql
+
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT act_id, name FROM activities")
+        index = ActivitySearchIndex()
+        index.add_activities({'actId': act_id, 'name': name} for act_id, name in cursor.fetchall())
+        return index
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def build_from_json(path):
+    """从爬虫导出的 activities_data.json 全量构建索引"""
+    with open(path, "r", encoding="utf-8") as f:
+        activities = json.load(f)
+    index = ActivitySearchIndex()
+    index.add_activities(activities)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="活动名称搜索")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='全量构建索引')
+    build.add_argument('--from-json', help='从导出的JSON文件构建（默认从MySQL）')
+    query = sub.add_parser('query', help='搜索活动名称')
+    query.add_argument('text')
+    query.add_argument('--limit', type=int, default=DEFAULT_LIMIT)
+    parser.add_argument('--index', default=INDEX_FILE, help='索引文件路径')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = build_from_json(args.from_json) if args.from_json else build_from_mysql()
+        index.save(args.index)
+        print(f"索引已构建: {len(index.docs)} 个活动, {len(index._terms)} 个词项, "
+              f"{os.path.getsize(args.index) / 1024:.0f} KB, 耗时 {time.perf_counter() - start:.2f}s")
+        return
+
+    start = time.perf_counter()
+    index = ActivitySearchIndex.load(args.index)
+    loaded = time.perf_counter()
+    results = index.search(args.text, args.limit)
+    searched = time.perf_counter()
+    for act_id, name in results:
+        print(f"  {act_id}: {name}")
+    print(f"\n共 {len(results)} 条, 加载 {(loaded - start) * 1000:.1f}ms, 查询 {(searched - loaded) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列表爬取的自适应每页条数
+每页记录加载耗时、数据量和浏览器JS堆占用：页面卡住、加载过慢或堆过大时降一档，
+连续几页正常且更大一档的历史吞吐不更差时升一档，始终不超过网站上限。
+条数只在 PAGE_SIZE_LADDER 的档位间切换（每档是下一档的整数倍），
+按已读取的行偏移量换算新页码，切换前后不漏行、不重行。
+每次运行各档位的页数和吞吐追加到 page_sizes.jsonl，下次从吞吐最高的档位开始
+"""
+
+import os
+import json
+from datetime import datetime
+
+from cdp_transport import run_script
+from instrumentation import log
+
+# ============ 配置 ============
+PAGE_SIZE_LADDER = (250, 500, 1000, 2000)  # 可选条数（网站最大支持2000条）
+SLOW_PAGE_SECONDS = 15  # 单页加载超过这个时间视为过慢
+MAX_HEAP_MB = 400  # 页面JS堆超过这个值时降档
+GROW_AFTER = 3  # 连续正常这么多页后尝试升档
+HISTORY_FILE = "page_sizes.jsonl"
+# ==============================
+
+HEAP_SCRIPT = "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : null;"
+
+# Element UI 分页组件：调用页码按钮同样的 handleCurrentChange 跳到指定页
+GO_TO_PAGE_SCRIPT = """
+var el = document.querySelector('.el-pagination');
+if (!el || !el.__vue__) return null;
+var pager = el.__vue__;
+if (pager.handleCurrentChange) {
+    pager.handleCurrentChange(%d);
+} else {
+    pager.internalCurrentPage = %d;
+}
+return pager.internalCurrentPage;
+"""
+
+
+def go_to_page(driver, page):
+    """跳到第 page 页，返回分页组件当前页码（找不到分页组件返回 None）"""
+    return run_script(driver, GO_TO_PAGE_SCRIPT % (page, page))
+
+
+def page_heap_mb(driver):
+    try:
+        heap = run_script(driver, HEAP_SCRIPT)
+    except Exception:
+        return None
+    return heap / 1024 / 1024 if heap else None
+
+
+def payload_kb(rows, sample=20):
+    """一页数据序列化后的大小（KB），近似接口返回的数据量
+
+    只序列化前 sample 行按行数估算，2000 行整页序列化要上百毫秒
+    """
+    if not rows:
+        return 0.0
+    head = rows[:sample]
+    return len(json.dumps(head, ensure_ascii=False, default=str)) * len(rows) / len(head) / 1024
+
+
+def locate(offset, size):
+    """行偏移量 offset 在每页 size 条时的位置: (页码, 该页开头要跳过的行数)"""
+    return offset // size + 1, offset % size
+
+
+class PageSizeController:
+    """根据每页的加载情况选择下一页的条数
+
+    Args:
+        entity: 'students' / 'activities'，用于历史记录
+        initial: 初始条数，None 时取历史吞吐最高的档位（没有历史时取最大档）
+        max_size: 条数上限（爬虫的 PAGE_SIZE），超过的档位不用
+    """
+
+    def __init__(self, entity, initial=None, max_size=None, ladder=PAGE_SIZE_LADDER, history_file=HISTORY_FILE):
+        self.entity = entity
+        self.ladder = tuple(s for s in sorted(ladder) if not max_size or s <= max_size) or (max_size,)
+        self.history_file = history_file
+        self.stats = {}  # 条数 -> [页数, 行数, 耗时, 数据KB, 最大堆MB, 卡住次数]
+        self.healthy = 0
+        self.size = self._nearest(initial or self._best_from_history() or self.ladder[-1])
+        self.target = self.size
+
+    def _nearest(self, size):
+        fitting = [s for s in self.ladder if s <= size]
+        return fitting[-1] if fitting else self.ladder[0]
+
+    def _best_from_history(self):
+        if not os.path.exists(self.history_file):
+            return None
+        best = None
+        with open(self.history_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('entity') == self.entity and record.get('best'):
+                    best = record['best']
+        return best
+
+    def throughput(self, size):
+        """该档位的平均吞吐（行/秒），没有记录时返回 None"""
+        pages, rows, seconds = self.stats.get(size, (0, 0, 0))[:3]
+        return rows / seconds if pages and seconds else None
+
+    def observe(self, rows, seconds, payload_kb=None, heap_mb=None, stalled=False):
+        """记录当前档位刚读完的一页，并决定目标档位"""
+        entry = self.stats.setdefault(self.size, [0, 0, 0.0, 0.0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += rows
+        entry[2] += seconds
+        entry[3] += payload_kb or 0
+        entry[4] = max(entry[4], heap_mb or 0)
+        entry[5] += bool(stalled)
+
+        index = self.ladder.index(self.size)
+        reason = None
+        if stalled:
+            reason = '页面卡住'
+        elif seconds > SLOW_PAGE_SECONDS:
+            reason = f'加载 {seconds:.1f}s'
+        elif heap_mb and heap_mb > MAX_HEAP_MB:
+            reason = f'JS堆 {heap_mb:.0f}MB'
+
+        if reason:
+            self.healthy = 0
+            if index > 0:
+                self.target = self.ladder[index - 1]
+                log(f"    [分页] {reason}，每页降到 {self.target} 条", page_size=self.target, reason=reason)
+            return
+
+        self.healthy += 1
+        if self.healthy >= GROW_AFTER and index + 1 < len(self.ladder):
+            larger = self.ladder[index + 1]
+            current, previous = self.throughput(self.size), self.throughput(larger)
+            if previous is None or current is None or previous >= current:
+                self.target = larger
+
+    def next_size(self, offset):
+        """下一页使用的条数；升档要等偏移量对齐新档位，避免重读"""
+        if self.target != self.size and offset % self.target == 0:
+            if self.target > self.size:
+                log(f"    [分页] 连续 {self.healthy} 页正常，每页升到 {self.target} 条", page_size=self.target)
+            self.size = self.target
+            self.healthy = 0
+        return self.size
+
+    def summary(self):
+        """打印各档位的吞吐并追加到历史文件，返回吞吐最高的档位"""
+        if not self.stats:
+            return None
+        print(f"\n{'每页条数':<10}{'页数':>6}{'行数':>9}{'耗时(s)':>10}{'行/秒':>10}{'KB/页':>10}{'最大堆MB':>10}{'卡住':>6}")
+        for size in sorted(self.stats):
+            pages, rows, seconds, payload, heap, stalls = self.stats[size]
+            rate = rows / seconds if seconds else 0
+            print(f"{size:<10}{pages:>6}{rows:>9}{seconds:>10.1f}{rate:>10.0f}{payload / pages:>10.0f}"
+                  f"{heap:>10.0f}{stalls:>6}")
+        rated = [s for s in self.stats if self.throughput(s) is not None]
+        best = max(rated, key=self.throughput) if rated else self.size
+        with open(self.history_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                'ts': datetime.now().isoformat(timespec='seconds'),
+                'entity': self.entity,
+                'best': best,
+                'sizes': {str(size): {'pages': s[0], 'rows': s[1], 'seconds': round(s[2], 2),
+                                      'payload_kb': round(s[3], 1), 'max_heap_mb': round(s[4], 1), 'stalls': s[5]}
+                          for size, s in self.stats.items()},
+            }, ensure_ascii=False) + "\n")
+        return best
@@ -6,8 +6,6 @@
 
 import time
 import json
-from selenium.webdriver.common.by import By
-from main import login
 
 ACTIVITY_URL = "https://2ketangpc.svtcc.edu.cn/communist/activityDown?oto=0"
 
@@ -104,6 +102,8 @@ def analyze_page(driver):
 
 
 def main():
+    from main import login
+
     print("=" * 60)
     print("分析活动页面数据结构")
     print("=" * 60)
@@ -8,7 +8,6 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from typing import List, Optional
 from PIL import Image
@@ -19,46 +18,53 @@ import time
 from ..models.data_models import Point, UIElements
 from ..utils.logger import logger
 from ..utils.config import LoginConfig
+from instrumentation import traced
+from browser_pool import BrowserPool, chrome_options, create_driver
+from slider_calibration import SliderCalibrator
+from gap_detector import find_gap
 
 
 class BrowserAutomation:
     """浏览器自动化类，使用Selenium WebDriver控制浏览器"""
     
-    def __init__(self, config: LoginConfig):
+    def __init__(self, config: LoginConfig, pool: Optional[BrowserPool] = None):
         """初始化浏览器自动化
         
         Args:
             config: 登录配置
+            pool: 浏览器池；提供时从池中租用预热好的浏览器，关闭时归还
         """
         self.config = config
+        self.pool = pool
         self.driver: Optional[webdriver.Chrome] = None
         self.ui_elements = UIElements()
         self.wait_timeout = 10
+        self.calibrator = SliderCalibrator()
+        self._pending_attempt = None  # 已拖拽、等待结果的尝试 (缺口位置, 偏移, 轨迹步长)
+        self._attempts = 0
+        self._slider_canvas_width = None
     
     def _setup_driver(self) -> webdriver.Chrome:
         """设置Chrome WebDriver"""
         try:
-            chrome_options = Options()
-            
-            # 基本配置
-            if self.config.headless:
-                chrome_options.add_argument('--headless')
-            
-            chrome_options.add_argument(f'--window-size={self.config.browser_width},{self.config.browser_height}')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--disable-web-security')
-            chrome_options.add_argument('--allow-running-insecure-content')
-            
-            # 用户代理
-            chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-            
-            # 禁用图片加载以提高速度（可选）
-            # prefs = {"profile.managed_default_content_settings.images": 2}
-            # chrome_options.add_experimental_option("prefs", prefs)
+            if self.pool is not None:
+                driver = self.pool.lease()
+                driver.implicitly_wait(5)
+                logger.info(f"从浏览器池租用浏览器: {self.pool.stats()}")
+                return driver
+            
+            options = chrome_options(
+                headless=self.config.headless,
+                window_size=(self.config.browser_width, self.config.browser_height),
+                extra_args=[
+                    '--disable-web-security',
+                    '--allow-running-insecure-content',
+                    # 用户代理
+                    '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                ],
+            )
             
-            driver = webdriver.Chrome(options=chrome_options)
+            driver = create_driver(options)
             driver.implicitly_wait(5)
             
             logger.info("Chrome WebDriver初始化成功")
@@ -68,6 +74,7 @@ class BrowserAutomation:
             logger.error(f"WebDriver初始化失败: {e}")
             raise WebDriverException(f"WebDriver初始化失败: {e}")
     
+    @traced('page.navigate')
     def open_login_page(self) -> None:
         """打开登录页面"""
         try:
@@ -91,6 +98,7 @@ class BrowserAutomation:
             logger.error(f"打开登录页面失败: {e}")
             raise WebDriverException(f"打开登录页面失败: {e}")
     
+    @traced('login.credentials')
     def input_credentials(self, username: str, password: str) -> None:
         """输入用户名和密码
         
@@ -127,6 +135,7 @@ class BrowserAutomation:
             logger.error(f"输入凭据失败: {e}")
             raise WebDriverException(f"输入凭据失败: {e}")
     
+    @traced('login.slider_image')
     def get_slider_image(self) -> Optional[Image.Image]:
         """获取滑块验证码图像
         
@@ -143,6 +152,7 @@ class BrowserAutomation:
             
             # 获取canvas元素的截图
             canvas_screenshot = canvas_element.screenshot_as_png
+            self._slider_canvas_width = canvas_element.size.get('width')
             
             # 转换为PIL图像
             image = Image.open(io.BytesIO(canvas_screenshot))
@@ -181,24 +191,49 @@ class BrowserAutomation:
             logger.warning(f"JS逆向获取缺口位置失败: {e}")
             return None
     
-    def get_slide_distance(self, offset: int = 12) -> Optional[int]:
+    @traced('login.gap_image')
+    def get_gap_position_from_image(self) -> Optional[int]:
+        """截取验证码画布，用图像定位缺口（block_x 读不到时的后备）
+        
+        Returns:
+            int: 缺口位置（CSS像素），如果获取失败返回None
+        """
+        image = self.get_slider_image()
+        if image is None:
+            return None
+        try:
+            gap_x = find_gap(image, css_width=self._slider_canvas_width)
+            if gap_x is not None:
+                logger.info(f"图像定位缺口位置: {gap_x}px")
+            return gap_x
+        except Exception as e:
+            logger.warning(f"图像定位缺口位置失败: {e}")
+            return None
+    
+    def get_slide_distance(self, offset: Optional[int] = None) -> Optional[int]:
         """获取滑动距离
         
-        优先使用JS逆向方式获取缺口位置，加上校准偏移值
+        优先使用JS逆向方式获取缺口位置，读不到 block_x 时改用图像定位，加上校准偏移值
         
         Args:
-            offset: 校准偏移值（默认+15像素）
+            offset: 校准偏移值（默认由 SliderCalibrator 按历史尝试记录选择）
             
         Returns:
             int: 滑动距离（像素），如果获取失败返回None
         """
         gap_x = self.get_gap_position_from_js()
+        if gap_x is None:
+            gap_x = self.get_gap_position_from_image()
         if gap_x is not None:
+            if offset is None:
+                offset = self.calibrator.choose(gap_x)
+            self._pending_attempt = (gap_x, offset, None)
             slide_distance = gap_x + offset
             logger.info(f"滑动距离: {slide_distance}px (缺口{gap_x}px + 偏移{offset}px)")
             return slide_distance
         return None
     
+    @traced('login.captcha_attempt')
     def drag_slider(self, track_points: List[Point]) -> bool:
         """执行滑块拖拽操作
         
@@ -249,6 +284,11 @@ class BrowserAutomation:
             # 执行动作
             actions.perform()
             
+            if self._pending_attempt is not None:
+                gap_x, offset, _ = self._pending_attempt
+                steps = [track_points[i].x - track_points[i - 1].x for i in range(1, len(track_points))]
+                self._pending_attempt = (gap_x, offset, steps)
+            
             logger.info("滑块拖拽执行完成")
             
             # 等待验证结果
@@ -263,6 +303,7 @@ class BrowserAutomation:
             logger.error(f"滑块拖拽失败: {e}")
             return False
     
+    @traced('login.wait')
     def wait_for_login_success(self, timeout: int = 10) -> bool:
         """等待登录成功
         
@@ -286,6 +327,7 @@ class BrowserAutomation:
                 current_url = self.driver.current_url
                 if current_url != original_url and 'login' not in current_url.lower():
                     logger.info(f"检测到页面跳转: {original_url} -> {current_url}")
+                    self._record_attempt(True)
                     return True
                 
                 # 方法2: 检查是否出现用户信息或主页元素
@@ -304,6 +346,7 @@ class BrowserAutomation:
                             element = self.driver.find_element(By.XPATH, indicator)
                             if element.is_displayed():
                                 logger.info(f"找到登录成功标识: {indicator}")
+                                self._record_attempt(True)
                                 return True
                         except NoSuchElementException:
                             continue
@@ -314,12 +357,22 @@ class BrowserAutomation:
                 time.sleep(0.5)
             
             logger.warning("等待登录成功超时")
+            self._record_attempt(False)
             return False
             
         except Exception as e:
             logger.error(f"等待登录成功失败: {e}")
             return False
     
+    def _record_attempt(self, success: bool):
+        """把刚才那次拖拽的结果写入校准记录"""
+        if self._pending_attempt is None:
+            return
+        gap_x, offset, steps = self._pending_attempt
+        self._pending_attempt = None
+        self._attempts += 1
+        self.calibrator.record_attempt(gap_x, offset, success, steps, self._attempts)
+    
     def get_page_source(self) -> str:
         """获取当前页面源码"""
         try:
@@ -360,9 +413,13 @@ class BrowserAutomation:
         """关闭浏览器"""
         try:
             if self.driver:
-                self.driver.quit()
+                if self.pool is not None:
+                    self.pool.give_back(self.driver)
+                    logger.info("浏览器已归还到浏览器池")
+                else:
+                    self.driver.quit()
+                    logger.info("浏览器已关闭")
                 self.driver = None
-                logger.info("浏览器已关闭")
         except Exception as e:
             logger.error(f"关闭浏览器失败: {e}")
     
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫端到端基准测试
+用 fake_driver.FakeDriver 代替 Chrome、mock_site 代替真实站点，
+跑完整的 登录 -> 设置每页条数 -> 翻页提取 -> 写库 流程，
+输出每个爬虫的 页/秒、行/秒、各阶段耗时和Python峰值内存，并与保存的基线比较
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+import mock_site
+from fake_driver import FakeDriver
+
+# ============ 配置 ============
+BASELINE_FILE = "bench_baselines.json"
+DEFAULT_TOLERANCE = 0.2  # 比基线差20%以上判为退化
+# ==============================
+
+# 需要计时的函数: (函数名, 阶段名)
+TIMED_FUNCTIONS = (
+    ('get_page_info', 'page.info'),
+    ('set_page_size', 'page.set_size'),
+    ('get_data_count', 'page.wait_data'),
+    ('get_current_page_data', 'page.extract'),
+    ('click_next_page', 'page.navigate'),
+    ('init_database', 'db.init'),
+    ('save_batch_to_mysql', 'db.write'),
+)
+
+# crawl_all：登录一次，这些爬虫在同一会话的标签页里同时爬取（crawl_jobs.crawl_session）
+SESSION_CRAWLERS = ('crawl_students', 'crawl_activities')
+
+# 越大越好的指标；其余指标越小越好
+HIGHER_IS_BETTER = ('pages_per_s', 'rows_per_s')
+
+
+class PhaseRecorder:
+    """按阶段累计调用次数和耗时"""
+
+    def __init__(self):
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, phase, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    stats = self.phases.setdefault(phase, [0, 0.0])
+                    stats[0] += 1
+                    stats[1] += time.perf_counter() - start
+        return timed
+
+
+class _NoDatabase:
+    """替换模块里的 pymysql，保证基准测试不会去连真实数据库"""
+
+    class MySQLError(Exception):
+        pass
+
+    @staticmethod
+    def connect(*args, **kwargs):
+        raise _NoDatabase.MySQLError("基准测试未启用数据库")
+
+
+def _scaled_time(scale):
+    """返回 sleep 按比例缩短的 time 模块替身（只替换爬虫模块里的引用）"""
+    real_sleep = time.sleep
+    fake = types.ModuleType('time')
+    fake.__dict__.update(time.__dict__)
+    fake.sleep = lambda seconds: real_sleep(seconds * scale)
+    return fake
+
+
+@contextmanager
+def _patched(patches):
+    """临时替换模块属性，结束后恢复"""
+    saved = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    try:
+        for module, name, value in patches:
+            setattr(module, name, value)
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+def run_crawler(crawler, base_url, sleep_scale=0.01, use_db=False, driver_options=None,
+                write_latency=0.0, use_jobs=False):
+    """对一个爬虫模块跑一次完整爬取；crawler 为 'crawl_all' 时登录一次、SESSION_CRAWLERS 同时爬取
+
+    write_latency 为不写库时每批模拟的写库耗时；use_jobs 时经 crawl_jobs 的任务组爬取（写库与翻页重叠）
+
+    Returns:
+        dict: 该次运行的指标
+    """
+    import main
+    import browser_pool
+    import crawl_lookups
+    import governor
+    modules = [__import__(name) for name in (SESSION_CRAWLERS if crawler == 'crawl_all' else (crawler,))]
+
+    recorder = PhaseRecorder()
+    rows_written = [0]
+    written_lock = threading.Lock()
+    driver_options = driver_options or {}
+
+    def fake_chrome(options=None, **kwargs):
+        return FakeDriver(base_url, **driver_options)
+
+    def save_stub(batch):
+        time.sleep(write_latency)
+        with written_lock:
+            rows_written[0] += len(batch)
+        return len(batch)
+
+    patches = [
+        (browser_pool, 'webdriver', types.SimpleNamespace(Chrome=fake_chrome)),
+        (main, 'time', _scaled_time(sleep_scale)),
+        (crawl_lookups, 'time', _scaled_time(sleep_scale)),
+        (governor, 'time', _scaled_time(sleep_scale)),
+    ]
+    for module in modules:
+        patches.append((module, 'time', _scaled_time(sleep_scale)))
+        if not use_db:
+            patches += [
+                (module, 'init_database', lambda: None),
+                (module, 'save_batch_to_mysql', save_stub),
+                (module, 'pymysql', _NoDatabase),
+            ]
+    if not use_db:
+        patches.append((crawl_lookups, 'save_lookups_to_mysql', lambda changed: 0))
+
+    with _patched(patches):
+        timed = [(module, name, recorder.wrap(phase, getattr(module, name)))
+                 for module in modules for name, phase in TIMED_FUNCTIONS if hasattr(module, name)]
+        timed.append((main, 'login', recorder.wrap('login', main.login)))
+        timed.append((main, 'get_gap_position_from_image',
+                      recorder.wrap('login.gap_image', main.get_gap_position_from_image)))
+        with _patched(timed):
+            tracemalloc.start()
+            start = time.perf_counter()
+            driver = main.login()
+            if driver is None:
+                raise RuntimeError("模拟登录失败")
+            if crawler == 'crawl_all':
+                import crawl_jobs
+                sessions = crawl_jobs.crawl_session(driver, [name.split('_', 1)[1] for name in SESSION_CRAWLERS])
+                records = [record for rows in sessions.values() for record in rows or []]
+            elif use_jobs:
+                import crawl_jobs
+                records = crawl_jobs.run_crawl(modules[0], crawler.split('_', 1)[1], driver)
+            else:
+                records = modules[0].crawl_all_pages(driver)
+            wall = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    pages = recorder.phases.get('page.extract', [0])[0]
+    rows = len(records or [])
+    return {
+        'crawler': crawler,
+        'wall_s': round(wall, 3),
+        'pages': pages,
+        'rows': rows,
+        'rows_written': rows_written[0] if not use_db else rows,
+        'pages_per_s': round(pages / wall, 3) if wall else 0,
+        'rows_per_s': round(rows / wall, 1) if wall else 0,
+        'peak_mb': round(peak / 1024 / 1024, 2),
+        'captcha_attempts': driver.captcha_attempts,
+        'script_calls': driver.calls['execute_script'],
+        'cdp_calls': driver.calls['cdp'],
+        'phases': {phase: {'calls': calls, 'seconds': round(seconds, 4)}
+                   for phase, (calls, seconds) in recorder.phases.items()},
+    }
+
+
+def print_result(result):
+    print(f"\n[{result['crawler']}] 用时 {result['wall_s']}s, {result['pages']} 页, {result['rows']} 行")
+    print(f"    {result['pages_per_s']} 页/秒, {result['rows_per_s']} 行/秒, 峰值内存 {result['peak_mb']} MB, "
+          f"验证码尝试 {result['captcha_attempts']} 次, execute_script {result['script_calls']} 次, "
+          f"CDP {result.get('cdp_calls', 0)} 次")
+    print(f"    {'阶段':<18}{'次数':>8}{'耗时(s)':>12}")
+    for phase, stats in sorted(result['phases'].items(), key=lambda kv: -kv[1]['seconds']):
+        print(f"    {phase:<18}{stats['calls']:>8}{stats['seconds']:>12.3f}")
+
+
+def compare_with_baseline(result, baseline, tolerance=DEFAULT_TOLERANCE):
+    """与基线比较，返回退化项列表"""
+    regressions = []
+    for metric in ('pages_per_s', 'rows_per_s', 'wall_s', 'peak_mb'):
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        if metric in HIGHER_IS_BETTER:
+            worse = new < old * (1 - tolerance)
+        else:
+            worse = new > old * (1 + tolerance)
+        if worse:
+            regressions.append(f"{metric}: 基线 {old} -> 本次 {new}")
+    return regressions
+
+
+def load_baselines(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="爬虫端到端基准测试（假WebDriver + 模拟站点）")
+    parser.add_argument('--crawler', choices=['crawl_students', 'crawl_activities', 'crawl_all', 'all'], default='all',
+                        help='all: 各爬虫分别运行；crawl_all: 登录一次在两个标签页里同时爬取')
+    parser.add_argument('--students', type=int, default=30000, help='模拟学生数')
+    parser.add_argument('--activities', type=int, default=4200, help='模拟活动数')
+    parser.add_argument('--latency', type=float, default=0.05, help='模拟站点每个请求的延迟（秒）')
+    parser.add_argument('--script-latency', type=float, default=0.0, help='每次 execute_script 的额外延迟（秒）')
+    parser.add_argument('--hide-block-x', action='store_true',
+                        help='模拟站点隐藏 block_x，登录走验证码画布截图 + gap_detector 定位')
+    parser.add_argument('--sleep-scale', type=float, default=0.01, help='爬虫中固定 sleep 的缩放比例')
+    parser.add_argument('--db', action='store_true', help='写入真实数据库（默认只计数不写库）')
+    parser.add_argument('--write-latency', type=float, default=0.0, help='不写库时每批模拟的写库耗时（秒）')
+    parser.add_argument('--jobs', action='store_true', help='经 crawl_jobs 的 asyncio 任务组爬取')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='基线文件')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    baseline_path = os.path.abspath(args.baseline)
+    crawlers = ['crawl_students', 'crawl_activities'] if args.crawler == 'all' else [args.crawler]
+
+    site = mock_site.MockSite(args.students, args.activities, args.latency)
+    server, base_url = mock_site.serve(site)
+    workdir = os.getcwd()
+    results = []
+    try:
+        # 爬虫会在当前目录写导出文件和索引，基准测试放到临时目录中运行
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sys.path.insert(0, workdir)
+            os.chdir(tmpdir)
+            try:
+                for crawler in crawlers:
+                    results.append(run_crawler(crawler, base_url, args.sleep_scale, args.db,
+                                               {'script_latency': args.script_latency, 'seed': 1,
+                                                'hide_block_x': args.hide_block_x},
+                                               args.write_latency, args.jobs))
+            finally:
+                os.chdir(workdir)
+    finally:
+        server.shutdown()
+
+    baselines = load_baselines(baseline_path)
+    failed = False
+    print("\n" + "=" * 60)
+    for result in results:
+        print_result(result)
+        baseline = baselines.get(result['crawler'])
+        if baseline and not args.save_baseline:
+            regressions = compare_with_baseline(result, baseline, args.tolerance)
+            for item in regressions:
+                print(f"    [退化] {item}")
+            failed = failed or bool(regressions)
+
+    if args.save_baseline:
+        for result in results:
+            baselines[result['crawler']] = result
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到 {baseline_path}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览器工厂与预热池
+chrome_options / create_driver 是 main.login、BrowserAutomation、守护进程共用的浏览器创建入口，
+set_resource_blocking 在爬取页面时拦截图片、字体、媒体和第三方脚本，
+PROFILE_DIR 可让浏览器复用带磁盘缓存/V8代码缓存的用户目录；
+BrowserPool 提前在后台启动N个浏览器，按 租用(lease)/归还(give_back) 使用，
+归还时重置标签页状态，使用次数或内存超限时回收并在后台补一个新的；
+open_tabs 在一个已登录的会话里开多个标签页，各自的 TabDriver 可以在不同线程里同时爬取
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from instrumentation import span, log
+
+# ============ 配置 ============
+POOL_SIZE = 2
+MAX_USES = 20  # 每个浏览器最多租用次数，之后回收
+MAX_HEAP_MB = 512  # 页面JS堆超过该值时回收
+WINDOW_SIZE = (1366, 768)
+HEADLESS = True
+
+# 持久化的 Chrome 用户目录：保留磁盘缓存和V8代码缓存，SPA的JS包不用每次重新下载、编译。
+# None 表示每次都用全新的临时目录。同时有多个浏览器时，只有拿到锁的那个直接使用该目录，
+# 其余的在启动时复制一份（复制品在浏览器退出时删除）。
+# 冷/热启动的可交互时间还没有在真实站点上测过（python browser_pool.py profile），所以默认不开
+PROFILE_DIR = None  # 如 "chrome_profile"
+DISK_CACHE_MB = 256
+
+# 偏向启动速度、减少后台活动的参数
+SPEED_ARGS = (
+    '--disable-gpu',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-extensions',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-background-networking',
+    '--disable-sync',
+    '--disable-default-apps',
+    '--mute-audio',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-features=Translate,OptimizationHints,MediaRouter',
+)
+
+# ---- 爬取时的资源拦截 ----
+# 爬虫只读Vue数据：图片、媒体、字体和第三方脚本（OSS上传SDK、高德地图）都不需要。
+# 拦截前后的加载耗时还没有在真实站点上测过（python browser_pool.py blocking），
+# 也没确认拦截后列表页的Vue数据不受影响，测过之前默认关闭
+BLOCK_RESOURCES = False
+BLOCKED_URL_PATTERNS = (
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.mp4', '*.webm', '*.mp3', '*.ogg',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*aliyun-oss-sdk*',
+    '*webapi.amap.com*', '*restapi.amap.com*', '*vdata.amap.com*',
+    '*hm.baidu.com*',
+)
+# 各页面放行的模式：登录页的滑块验证码要先加载背景图才会生成缺口(block_x)
+ALLOWED_URL_PATTERNS = {
+    'login': ('*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp'),
+    'crawl': (),
+}
+# 启动时就生效的内容设置（2=禁止），与验证码无关的才放在这里
+CONTENT_PREFS = {
+    'profile.managed_default_content_settings.notifications': 2,
+    'profile.managed_default_content_settings.geolocation': 2,
+    'profile.managed_default_content_settings.media_stream': 2,
+    'profile.managed_default_content_settings.popups': 2,
+    'profile.default_content_setting_values.automatic_downloads': 2,
+}
+# ==============================
+
+
+def chrome_options(headless=HEADLESS, window_size=WINDOW_SIZE, extra_args=(), block_resources=BLOCK_RESOURCES):
+    """爬取用的 Chrome 参数"""
+    options = Options()
+    if block_resources:
+        options.add_experimental_option('prefs', dict(CONTENT_PREFS))
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument(f'--window-size={window_size[0]},{window_size[1]}')
+    for arg in SPEED_ARGS:
+        options.add_argument(arg)
+    for arg in extra_args:
+        options.add_argument(arg)
+    # DOMContentLoaded 后就返回；后续都在等具体元素或Vue数据，不需要等图片等资源
+    options.page_load_strategy = 'eager'
+    return options
+
+
+# 复制配置目录时跳过的锁文件和临时文件
+_PROFILE_SKIP = ('SingletonLock', 'SingletonSocket', 'SingletonCookie', 'lockfile', '.crawler.lock', '*.tmp')
+
+
+def _lock_file(path):
+    """对 path 加非阻塞排他锁，成功返回打开的文件（进程退出时锁自动释放），失败返回 None"""
+    handle = open(path, 'a+')
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def acquire_profile(profile_dir):
+    """取得可用的用户目录
+
+    Returns:
+        tuple: (用户目录, 释放函数)。拿到锁时是 profile_dir 本身；
+        否则是启动时复制出的临时目录，释放时删除
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    lock = _lock_file(os.path.join(profile_dir, '.crawler.lock'))
+    if lock is not None:
+        return profile_dir, lock.close
+
+    clone = tempfile.mkdtemp(prefix='chrome-profile-')
+    shutil.copytree(profile_dir, clone, dirs_exist_ok=True, ignore=shutil.ignore_patterns(*_PROFILE_SKIP))
+    return clone, lambda: shutil.rmtree(clone, ignore_errors=True)
+
+
+def create_driver(options=None, profile_dir=PROFILE_DIR):
+    """启动一个 Chrome；profile_dir 不为空时使用持久化用户目录（见 PROFILE_DIR）"""
+    options = options or chrome_options()
+    release = None
+    if profile_dir:
+        user_data_dir, release = acquire_profile(profile_dir)
+        options.add_argument(f'--user-data-dir={os.path.abspath(user_data_dir)}')
+        options.add_argument(f'--disk-cache-size={DISK_CACHE_MB * 1024 * 1024}')
+    try:
+        with span('browser.launch', profile=bool(profile_dir)):
+            driver = webdriver.Chrome(options=options)
+    except Exception:
+        if release:
+            release()
+        raise
+    if release:
+        # 浏览器退出后再释放锁/删除复制品（Chrome 退出前还会写缓存）
+        quit_driver = driver.quit
+
+        def quit():
+            try:
+                quit_driver()
+            finally:
+                release()
+
+        driver.quit = quit
+    return driver
+
+
+def set_resource_blocking(driver, page='crawl', enabled=BLOCK_RESOURCES):
+    """按页面设置 CDP 的 Network.setBlockedURLs；非 Chromium 驱动直接跳过
+
+    Args:
+        page: ALLOWED_URL_PATTERNS 中的页面名，对应的模式不拦截
+        enabled: False 时清空拦截列表
+    """
+    execute_cdp_cmd = getattr(driver, 'execute_cdp_cmd', None)
+    if execute_cdp_cmd is None:
+        return False
+    allowed = set(ALLOWED_URL_PATTERNS.get(page, ()))
+    patterns = [p for p in BLOCKED_URL_PATTERNS if p not in allowed] if enabled else []
+    try:
+        execute_cdp_cmd('Network.enable', {})
+        execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    except Exception as e:
+        log(f"[浏览器] 设置资源拦截失败: {e}")
+        return False
+    return True
+
+
+# 当前页面的导航耗时和资源统计（毫秒，相对导航开始）
+PAGE_TIMING_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+if (!nav) return null;
+var resources = performance.getEntriesByType('resource');
+var bytes = 0;
+for (var i = 0; i < resources.length; i++) bytes += resources[i].transferSize || 0;
+return {
+    dom_content_loaded: nav.domContentLoadedEventEnd,
+    load: nav.loadEventEnd,
+    resources: resources.length,
+    transfer_kb: Math.round((bytes + (nav.transferSize || 0)) / 1024)
+};
+"""
+
+
+def page_timings(driver, wait_load=15):
+    """等 load 事件结束后读取导航耗时（eager 模式下 driver.get 在 DOMContentLoaded 就返回了）"""
+    deadline = time.time() + wait_load
+    timings = None
+    while time.time() < deadline:
+        timings = driver.execute_script(PAGE_TIMING_SCRIPT)
+        if timings and timings.get('load'):
+            break
+        time.sleep(0.2)
+    return timings
+
+
+class _PooledDriver:
+    __slots__ = ('driver', 'uses', 'created')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created = time.time()
+
+
+class BrowserPool:
+    """预先启动的浏览器池
+
+    Args:
+        size: 池中浏览器数
+        options_factory: 返回 Options 的函数（每个浏览器调用一次）
+        max_uses: 租用次数上限
+        max_heap_mb: 页面JS堆上限（MB），None 表示不检查
+    """
+
+    def __init__(self, size=POOL_SIZE, options_factory=chrome_options, max_uses=MAX_USES, max_heap_mb=MAX_HEAP_MB):
+        self.size = size
+        self.options_factory = options_factory
+        self.max_uses = max_uses
+        self.max_heap_mb = max_heap_mb
+        self._idle = []
+        self._leased = {}  # id(driver) -> _PooledDriver
+        self._launching = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.hits = 0
+        self.misses = 0
+        self.recycled = 0
+        self.lease_seconds = []
+
+    # ---------- 启动 ----------
+    def start(self):
+        """在后台把池填满"""
+        with self._cond:
+            missing = self.size - len(self._idle) - len(self._leased) - self._launching
+            self._launching += max(0, missing)
+        for _ in range(max(0, missing)):
+            threading.Thread(target=self._launch_into_pool, daemon=True).start()
+        return self
+
+    def _launch_into_pool(self):
+        try:
+            pooled = _PooledDriver(create_driver(self.options_factory()))
+        except Exception as e:
+            log(f"[浏览器池] 启动浏览器失败: {e}")
+            with self._cond:
+                self._launching -= 1
+                self._cond.notify_all()
+            return
+        with self._cond:
+            self._launching -= 1
+            if self._closed:
+                pooled.driver.quit()
+                return
+            self._idle.append(pooled)
+            self._cond.notify_all()
+
+    # ---------- 租用/归还 ----------
+    def lease(self, timeout=None):
+        """租用一个浏览器；池里有空闲的立即返回，否则等后台启动完成或现场启动"""
+        started = time.perf_counter()
+        launch = False
+        with span('pool.wait') as waited:
+            with self._cond:
+                hit = bool(self._idle)
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while not self._idle:
+                    if len(self._leased) + self._launching < self.size:
+                        # 池没满也没有在启动的：当前线程直接启动
+                        self._launching += 1
+                        launch = True
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("等待空闲浏览器超时")
+                    self._cond.wait(remaining)
+                pooled = None if launch else self._idle.pop()
+            if launch:
+                try:
+                    pooled = _PooledDriver(create_driver(self.options_factory()))
+                finally:
+                    with self._cond:
+                        self._launching -= 1
+            waited['hit'] = hit
+
+        with self._cond:
+            pooled.uses += 1
+            self._leased[id(pooled.driver)] = pooled
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.lease_seconds.append(time.perf_counter() - started)
+        return pooled.driver
+
+    def give_back(self, driver, broken=False, reset=True):
+        """归还浏览器
+
+        Args:
+            broken: 浏览器已不可用，直接关闭并在后台补一个
+            reset: 清理标签页、Cookie 和本地存储（保留登录态时传 False）
+        """
+        with self._cond:
+            pooled = self._leased.pop(id(driver), None)
+        if pooled is None:
+            raise ValueError("该浏览器不是从池中租用的")
+
+        if not broken and reset:
+            broken = not self._reset(driver)
+        if broken or self._should_recycle(pooled):
+            self.recycled += 1
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            if not self._closed:
+                self.start()
+            return
+
+        with self._cond:
+            if self._closed:
+                driver.quit()
+                return
+            self._idle.append(pooled)
+            self._cond.notify_all()
+
+    @contextmanager
+    def leased(self, reset=True):
+        """with pool.leased() as driver: ...（归还时重置失败的浏览器会被回收）"""
+        driver = self.lease()
+        try:
+            yield driver
+        finally:
+            self.give_back(driver, reset=reset)
+
+    def _reset(self, driver):
+        """关闭多余标签页，清Cookie和本地存储，回到空白页；失败返回 False"""
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            if len(handles) > 1:
+                driver.switch_to.window(handles[0])
+            driver.delete_all_cookies()
+            driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            log(f"[浏览器池] 重置浏览器失败，回收: {e}")
+            return False
+
+    def _should_recycle(self, pooled):
+        if self.max_uses and pooled.uses >= self.max_uses:
+            return True
+        if self.max_heap_mb:
+            try:
+                heap = pooled.driver.execute_script(
+                    "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : null;")
+            except Exception:
+                return True
+            if heap and heap / 1024 / 1024 > self.max_heap_mb:
+                return True
+        return False
+
+    # ---------- 统计/关闭 ----------
+    def stats(self):
+        leases = self.hits + self.misses
+        waits = sorted(self.lease_seconds)
+        return {
+            'size': self.size,
+            'idle': len(self._idle),
+            'leased': len(self._leased),
+            'leases': leases,
+            'hit_rate': round(self.hits / leases, 3) if leases else None,
+            'recycled': self.recycled,
+            'lease_avg_ms': round(sum(waits) / len(waits) * 1000, 1) if waits else None,
+            'lease_p95_ms': round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else None,
+            'lease_max_ms': round(waits[-1] * 1000, 1) if waits else None,
+        }
+
+    def close(self):
+        """关闭空闲浏览器；租出去的由租用方自己归还后关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            try:
+                pooled.driver.quit()
+            except Exception:
+                pass
+
+
+class TabDriver:
+    """同一浏览器会话里一个标签页的 driver 视图，多个线程可以各用一个标签页同时爬取
+
+    WebDriver 同一时刻只能操作当前标签页：每次调用先拿会话锁、切到自己的标签页再执行，
+    调用之间（sleep、等数据加载）不占锁，其他标签页的命令可以插进来。
+    driver 的属性（current_url 等）同样在锁内切换后读取；quit 只关闭自己的标签页
+    """
+
+    def __init__(self, driver, handle, lock):
+        self._driver = driver
+        self._handle = handle
+        self._lock = lock
+
+    def _focus(self):
+        if self._driver.current_window_handle != self._handle:
+            self._driver.switch_to.window(self._handle)
+
+    def __getattr__(self, name):
+        driver = self._driver
+        if not callable(getattr(type(driver), name, None)):
+            with self._lock:
+                self._focus()
+                return getattr(driver, name)
+        method = getattr(driver, name)
+
+        def in_tab(*args, **kwargs):
+            with self._lock:
+                self._focus()
+                return self._adopt(method(*args, **kwargs))
+        return in_tab
+
+    def _adopt(self, result):
+        """find_element(s) 返回的元素改为经本标签页执行命令（WebElement 的命令都走 _parent.execute）"""
+        for element in result if isinstance(result, list) else (result,):
+            if getattr(element, '_parent', None) is self._driver:
+                element._parent = self
+        return result
+
+    def quit(self):
+        with self._lock:
+            self._focus()
+            self._driver.close()
+
+
+def open_tabs(driver, count):
+    """在已登录的会话里凑够 count 个标签页（共用Cookie），返回各自的 TabDriver"""
+    lock = threading.RLock()
+    with lock:
+        handles = [driver.current_window_handle]
+        for _ in range(count - 1):
+            driver.switch_to.new_window('tab')
+            handles.append(driver.current_window_handle)
+        driver.switch_to.window(handles[0])
+    return [TabDriver(driver, handle, lock) for handle in handles]
+
+
+def compare_blocking(urls, runs=3):
+    """登录后分别在拦截/不拦截两种情况下加载页面，打印 DOMContentLoaded、load 和传输量"""
+    from main import login
+
+    driver = login(create_driver(chrome_options(block_resources=False)))
+    if driver is None:
+        print("登录失败")
+        return
+    try:
+        print(f"{'页面':<40}{'拦截':>6}{'DCL(ms)':>10}{'load(ms)':>10}{'资源数':>8}{'传输KB':>10}")
+        for url in urls:
+            for blocked in (False, True):
+                set_resource_blocking(driver, 'crawl', enabled=blocked)
+                samples = []
+                for _ in range(runs):
+                    driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+                    driver.get(url)
+                    timings = page_timings(driver)
+                    if timings:
+                        samples.append(timings)
+                if not samples:
+                    continue
+                avg = {k: sum(t[k] for t in samples) / len(samples) for k in samples[0]}
+                print(f"{url.split('/', 3)[-1][:38]:<40}{'是' if blocked else '否':>6}{avg['dom_content_loaded']:>10.0f}"
+                      f"{avg['load']:>10.0f}{avg['resources']:>8.0f}{avg['transfer_kb']:>10.0f}")
+    finally:
+        driver.quit()
+
+
+def measure_time_to_interactive(profile_dir, runs=3):
+    """测登录页和学生列表页的可交互时间（毫秒）
+
+    登录页：driver.get 到用户名输入框可点击；列表页：driver.get 到分页组件拿到总数。
+    profile_dir 为 None 时每次都是全新目录（冷启动）；否则先跑一次预热，再测热缓存。
+    每次打开登录页前清掉 Cookie：持久化目录里留着上次的登录会话，登录页可能直接跳走，
+    冷热两种情况都从未登录开始，差别只来自缓存
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from main import login, LOGIN_URL
+    from crawl_students import STUDENT_LIST_URL, get_page_info
+
+    def one_run():
+        driver = create_driver(chrome_options(), profile_dir=profile_dir)
+        try:
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            start = time.perf_counter()
+            driver.get(LOGIN_URL)
+            WebDriverWait(driver, 30).until(
+                EC.element_to_be_clickable((By.XPATH, '//input[@class="login-input user"][1]')))
+            login_ms = (time.perf_counter() - start) * 1000
+            if login(driver) is None:
+                return login_ms, None
+            start = time.perf_counter()
+            driver.get(STUDENT_LIST_URL)
+            WebDriverWait(driver, 30).until(lambda d: get_page_info(d))
+            return login_ms, (time.perf_counter() - start) * 1000
+        finally:
+            driver.quit()
+
+    if profile_dir:
+        one_run()  # 预热缓存
+    results = [one_run() for _ in range(runs)]
+    list_times = [r[1] for r in results if r[1] is not None]
+    return (sum(r[0] for r in results) / len(results),
+            sum(list_times) / len(list_times) if list_times else None)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="浏览器池与资源拦截的耗时对比")
+    sub = parser.add_subparsers(dest='command', required=True)
+    pool_cmd = sub.add_parser('pool', help='浏览器池冷/热启动对比')
+    pool_cmd.add_argument('--size', type=int, default=POOL_SIZE)
+    pool_cmd.add_argument('--leases', type=int, default=10)
+    timing_cmd = sub.add_parser('blocking', help='资源拦截前后的页面加载耗时')
+    timing_cmd.add_argument('--runs', type=int, default=3)
+    profile_cmd = sub.add_parser('profile', help='空白配置与持久化配置的可交互时间对比')
+    profile_cmd.add_argument('--dir', default=PROFILE_DIR or 'chrome_profile', help='持久化用户目录')
+    profile_cmd.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == 'profile':
+        for label, directory in (('冷(空白配置)', None), ('热(持久化配置)', args.dir)):
+            login_ms, list_ms = measure_time_to_interactive(directory, args.runs)
+            list_text = f"{list_ms:.0f}ms" if list_ms is not None else "登录失败"
+            print(f"{label:<16} 登录页 {login_ms:.0f}ms, 学生列表页 {list_text}")
+    elif args.command == 'blocking':
+        from crawl_students import STUDENT_LIST_URL
+        from crawl_activities import ACTIVITY_URL
+        compare_blocking([STUDENT_LIST_URL, ACTIVITY_URL], args.runs)
+    else:
+        start = time.perf_counter()
+        driver = create_driver()
+        print(f"冷启动一个浏览器: {(time.perf_counter() - start) * 1000:.0f}ms")
+        driver.quit()
+
+        pool = BrowserPool(args.size).start()
+        time.sleep(10)  # 等后台预热完成
+        for _ in range(args.leases):
+            with pool.leased() as driver:
+                driver.get('about:blank')
+        print(pool.stats())
+        pool.close()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提取脚本的 CDP 通道
+driver.execute_script 要经过 WebDriver 协议的脚本封装（参数/元素序列化、结果转换），
+轮询等数据时每页要调很多次。这里改为用 execute_cdp_cmd 直接发 DevTools 的 Runtime.evaluate，
+returnByValue 直接拿 JSON 结果，awaitPromise 支持返回 Promise 的脚本。
+驱动不支持 CDP（非 Chromium、远程驱动）、脚本需要参数或 CDP 连续出错时回落到 execute_script
+
+python cdp_transport.py --runs 50   登录后在学生/活动列表页对比两种方式的单次调用耗时
+这项对比还没有在真实站点上跑过，CDP 通道的提速幅度尚未实测，所以 USE_CDP 默认关闭；
+对比结果确认更快之后再打开（对比本身不受 USE_CDP 影响）
+"""
+
+import time
+
+from instrumentation import log
+
+# ============ 配置 ============
+USE_CDP = False  # 实测 Runtime.evaluate 确实更快后再改为 True
+MAX_CDP_FAILURES = 3  # 连续失败这么多次后，该浏览器不再尝试 CDP
+# ==============================
+
+# 脚本按 execute_script 的写法（函数体里 return 结果），包成立即执行的函数
+_EXPRESSION = "(function() {\n%s\n})()"
+
+
+def _use_cdp(driver):
+    return USE_CDP and getattr(driver, 'execute_cdp_cmd', None) is not None \
+        and getattr(driver, '_cdp_failures', 0) < MAX_CDP_FAILURES
+
+
+def _set_failures(driver, failures):
+    try:
+        driver._cdp_failures = failures
+    except AttributeError:
+        pass
+
+
+def _cdp_failed(driver, error):
+    failures = getattr(driver, '_cdp_failures', 0) + 1
+    _set_failures(driver, failures)
+    if failures >= MAX_CDP_FAILURES:
+        log(f"[CDP] Runtime.evaluate 连续失败 {failures} 次，改用 execute_script: {error}")
+
+
+def evaluate(driver, script):
+    """用 Runtime.evaluate 执行脚本并返回 JSON 结果；脚本抛错时抛 JavascriptException"""
+    response = driver.execute_cdp_cmd('Runtime.evaluate', {
+        'expression': _EXPRESSION % script,
+        'returnByValue': True,
+        'awaitPromise': True,
+    })
+    details = response.get('exceptionDetails')
+    if details:
+        from selenium.common.exceptions import JavascriptException
+        exception = details.get('exception') or {}
+        raise JavascriptException(exception.get('description') or details.get('text'))
+    return response.get('result', {}).get('value')
+
+
+def run_script(driver, script, *args):
+    """执行提取脚本：能用 CDP 就走 Runtime.evaluate，否则用 execute_script
+
+    带参数的脚本（如传入页面元素）只能走 execute_script
+    """
+    if args or not _use_cdp(driver):
+        return driver.execute_script(script, *args)
+    try:
+        result = evaluate(driver, script)
+    except Exception as e:
+        # 出错时才导入 selenium 的异常类型，只用写库函数的模块导入本模块时不加载 selenium
+        from selenium.common.exceptions import JavascriptException
+        if isinstance(e, JavascriptException):
+            raise
+        # 协议层面的错误（命令不支持、页面正在跳转等），本次回落
+        _cdp_failed(driver, e)
+        return driver.execute_script(script)
+    _set_failures(driver, 0)
+    return result
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def compare_transports(driver, scripts, runs=50):
+    """对每个脚本分别用 execute_script 和 Runtime.evaluate 调用 runs 次，输出单次耗时
+
+    Args:
+        scripts: {名称: 脚本}
+    """
+    print(f"{'脚本':<24}{'方式':<18}{'平均ms':>9}{'p50':>9}{'p95':>9}  结果一致")
+    for name, script in scripts.items():
+        expected = driver.execute_script(script)
+        for label, call in (('execute_script', lambda: driver.execute_script(script)),
+                            ('Runtime.evaluate', lambda: evaluate(driver, script))):
+            timings = []
+            same = True
+            for _ in range(runs):
+                start = time.perf_counter()
+                result = call()
+                timings.append((time.perf_counter() - start) * 1000)
+                same = same and result == expected
+            print(f"{name:<24}{label:<18}{sum(timings) / runs:>9.2f}{_percentile(timings, 50):>9.2f}"
+                  f"{_percentile(timings, 95):>9.2f}  {'是' if same else '否'}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import crawl_students
+    import crawl_activities
+    from main import login
+    from browser_pool import create_driver, chrome_options
+
+    parser = argparse.ArgumentParser(description="execute_script 与 CDP Runtime.evaluate 的调用耗时对比")
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    driver = login(create_driver(chrome_options()))
+    if driver is None:
+        raise SystemExit("登录失败")
+    try:
+        for module, url in ((crawl_students, crawl_students.STUDENT_LIST_URL),
+                            (crawl_activities, crawl_activities.ACTIVITY_URL)):
+            driver.get(url)
+            time.sleep(5)
+            print(f"\n{url}")
+            compare_transports(driver, {
+                'get_page_info': module.PAGE_INFO_SCRIPT,
+                'get_data_count': module.DATA_COUNT_SCRIPT,
+                'get_current_page_data': module.PAGE_DATA_SCRIPT,
+            }, args.runs)
+    finally:
+        driver.quit()
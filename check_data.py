@@ -2,9 +2,13 @@
 # -*- coding: utf-8 -*-
 """
 检查数据完整性
+默认读取增量维护的汇总表；--verify 时再做一次全表扫描并比对
 """
 
+import sys
+import argparse
 import pymysql
+from summary_tables import ensure_summary, rebuild_summary, read_total, read_dimension
 
 DB_CONFIG = {
     'host': '10.5.80.8',
@@ -14,34 +18,144 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
-def check_data():
-    conn = pymysql.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    
-    # 总数
-    cursor.execute("SELECT COUNT(*) FROM students")
-    total = cursor.fetchone()[0]
+# 报表查询（--verify 全表扫描时执行，query_plans.py 会对它们做执行计划检查）
+REPORT_QUERIES = {
+    'student_total': "SELECT COUNT(*), MIN(id), MAX(id) FROM students",
+    'student_grade': "SELECT grade_name, COUNT(*) FROM students GROUP BY grade_name",
+    'student_college': "SELECT college_name, COUNT(*) FROM students GROUP BY college_name",
+    'student_class': "SELECT class_name, COUNT(*) FROM students GROUP BY class_name",
+    'student_campus': "SELECT campus_name, COUNT(*) FROM students GROUP BY campus_name",
+    'activity_total': "SELECT COUNT(*), COALESCE(SUM(hours), 0) FROM activities",
+    'activity_org': "SELECT org_name, COUNT(*), COALESCE(SUM(hours), 0) FROM activities GROUP BY org_name",
+    'activity_class': "SELECT class_name, COUNT(*), COALESCE(SUM(hours), 0) FROM activities GROUP BY class_name",
+    'activity_month': (
+        "SELECT DATE_FORMAT(start_time, '%Y-%m'), COUNT(*), COALESCE(SUM(hours), 0) "
+        "FROM activities GROUP BY DATE_FORMAT(start_time, '%Y-%m')"
+    ),
+}
+
+
+def has_table(cursor, table):
+    """库里是否有这张表（只爬过学生时还没有 activities 表）"""
+    cursor.execute("SHOW TABLES LIKE %s", (table,))
+    return cursor.fetchone() is not None
+
+
+def print_summary(cursor):
+    """从汇总表输出统计结果"""
+    ensure_summary(cursor, 'students')
+    total, _, min_id, max_id = read_total(cursor, 'students')
     print(f"数据库总记录数: {total}")
-    
-    # ID范围
-    cursor.execute("SELECT MIN(id), MAX(id) FROM students")
-    min_id, max_id = cursor.fetchone()
     print(f"ID范围: {min_id} - {max_id}")
-    
+
     # 按年级统计
     print("\n按年级统计:")
-    cursor.execute("SELECT grade_name, COUNT(*) as cnt FROM students GROUP BY grade_name ORDER BY grade_name")
-    for row in cursor.fetchall():
-        print(f"  {row[0]}: {row[1]} 条")
-    
+    for value, cnt, _ in read_dimension(cursor, 'students', 'grade'):
+        print(f"  {value}: {cnt} 条")
+
     # 按院系统计
     print("\n按院系统计:")
-    cursor.execute("SELECT college_name, COUNT(*) as cnt FROM students GROUP BY college_name ORDER BY cnt DESC")
-    for row in cursor.fetchall():
-        print(f"  {row[0]}: {row[1]} 条")
-    
-    cursor.close()
-    conn.close()
+    for value, cnt, _ in read_dimension(cursor, 'students', 'college', order_by_count=True):
+        print(f"  {value}: {cnt} 条")
+
+    # 活动统计
+    if not has_table(cursor, 'activities'):
+        print("\n活动表不存在，跳过活动统计")
+        return
+    ensure_summary(cursor, 'activities')
+    act_total, act_hours, _, _ = read_total(cursor, 'activities')
+    print(f"\n活动总数: {act_total}, 总学时: {act_hours}")
+    print("\n按月份统计活动:")
+    for value, cnt, hours in read_dimension(cursor, 'activities', 'month'):
+        print(f"  {value or '未知'}: {cnt} 个, {hours} 学时")
+
+
+def _merge_groups(rows):
+    """GROUP BY 结果中 NULL 与空字符串在汇总表里是同一个取值，这里合并"""
+    merged = {}
+    for row in rows:
+        key = row[0] or ''
+        values = row[1:]
+        if key in merged:
+            values = tuple(a + b for a, b in zip(merged[key], values))
+        merged[key] = values
+    return merged
+
+
+def verify_summary(cursor):
+    """全表扫描重新统计，与汇总表逐项比对
+
+    Returns:
+        int: 不一致的项数
+    """
+    mismatches = 0
+
+    def compare(label, expected, actual):
+        nonlocal mismatches
+        if expected != actual:
+            mismatches += 1
+            print(f"  [不一致] {label}: 全表扫描={expected}, 汇总表={actual}")
+
+    cursor.execute(REPORT_QUERIES['student_total'])
+    total, min_id, max_id = cursor.fetchone()
+    summary_total = read_total(cursor, 'students')
+    compare("学生总数", total, summary_total[0])
+    compare("学生ID范围", (min_id, max_id), (summary_total[2], summary_total[3]))
+
+    for dim in ('grade', 'college', 'class', 'campus'):
+        cursor.execute(REPORT_QUERIES[f'student_{dim}'])
+        expected = _merge_groups(cursor.fetchall())
+        actual = {value: (cnt,) for value, cnt, _ in read_dimension(cursor, 'students', dim)}
+        compare(f"学生按{dim}统计", expected, actual)
+
+    if not has_table(cursor, 'activities'):
+        return mismatches
+    cursor.execute(REPORT_QUERIES['activity_total'])
+    act_total, act_hours = cursor.fetchone()
+    summary_act = read_total(cursor, 'activities')
+    compare("活动总数/总学时", (act_total, act_hours), (summary_act[0], summary_act[1]))
+
+    for dim in ('org', 'class', 'month'):
+        cursor.execute(REPORT_QUERIES[f'activity_{dim}'])
+        expected = _merge_groups(cursor.fetchall())
+        actual = {value: (cnt, hours) for value, cnt, hours in read_dimension(cursor, 'activities', dim)}
+        compare(f"活动按{dim}统计", expected, actual)
+
+    return mismatches
+
+
+def check_data(verify=False, rebuild=False):
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+
+    try:
+        if rebuild:
+            rebuild_summary(cursor, 'students')
+            if has_table(cursor, 'activities'):
+                rebuild_summary(cursor, 'activities')
+            conn.commit()
+            print("汇总表已全量重算\n")
+
+        print_summary(cursor)
+        conn.commit()
+
+        if verify:
+            print("\n全表扫描校验:")
+            mismatches = verify_summary(cursor)
+            if mismatches:
+                print(f"  共 {mismatches} 项不一致，可使用 --rebuild 重算汇总表")
+            else:
+                print("  汇总表与全表扫描一致")
+            return mismatches
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
 
 if __name__ == "__main__":
-    check_data()
+    parser = argparse.ArgumentParser(description="检查数据完整性")
+    parser.add_argument('--verify', action='store_true', help='全表扫描并与汇总表比对')
+    parser.add_argument('--rebuild', action='store_true', help='从基础表全量重算汇总表')
+    args = parser.parse_args()
+    sys.exit(1 if check_data(verify=args.verify, rebuild=args.rebuild) else 0)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统一命令行入口
+  python cli.py crawl students|activities|lookups [--profile [DIR]]  登录并爬取
+  python cli.py crawl all               登录一次，学生和活动在同一浏览器的两个标签页里同时爬取
+  python cli.py crawl participants --discover  找出活动名单接口（名单爬虫未完成：接口确认前不能爬取）
+  python cli.py resume [任务 ...]       从库里已有的数据接着爬（守护进程的增量任务各跑一次）
+  python cli.py export students|activities [--format json|csv] [--out 文件]  从MySQL导出
+  python cli.py report data|captcha|coverage|run [...]  数据汇总 / 验证码尝试统计 / ID覆盖快照 / 运行日志阶段耗时
+  python cli.py history --at 时间 | --since 时间 [--until 时间]  学生学分/总分的历史快照
+  python cli.py replay 文件 --entity students|activities  把导出的JSON重新写入MySQL
+  python cli.py bench [bench_crawl 参数]  端到端基准测试
+各子命令用到的模块在执行时才导入：export / report / replay 不加载 selenium，启动只需几十毫秒
+（python -X importtime cli.py report data 可以查看）
+"""
+
+import sys
+import argparse
+
+# ============ 配置 ============
+RESUME_JOBS = ('activities_incremental', 'open_activities')  # resume 默认执行的任务
+REPLAY_BATCH = 2000  # replay 每批写入的条数
+# ==============================
+
+EXPORT_TABLES = {'students': 'code', 'activities': 'act_id'}  # 表 -> 排序键
+
+
+def cmd_crawl(args):
+    if args.entity == 'all':
+        import crawl_jobs
+        return crawl_jobs.main()
+    if args.entity == 'participants':
+        import crawl_participants
+        return crawl_participants.main(restart=args.restart, discover=args.discover)
+    if args.entity == 'lookups':
+        import crawl_lookups
+        crawl_lookups.main()
+    elif args.entity == 'students':
+        import crawl_students
+        crawl_students.main(profile_dir=args.profile)
+    else:
+        import crawl_activities
+        crawl_activities.main(profile_dir=args.profile)
+    return 0
+
+
+def cmd_resume(args):
+    """守护进程的增量任务：从最新一页翻到已入库的数据为止"""
+    from crawl_daemon import JOBS, Scheduler
+    from instrumentation import start_run, end_run
+
+    jobs = args.jobs or list(RESUME_JOBS)
+    start_run('resume')
+    scheduler = Scheduler([job for job in JOBS if job[0] in jobs])
+    try:
+        failed = [name for name in jobs if not scheduler.run_job(name)]
+    finally:
+        scheduler.stop()
+        end_run()
+    return 1 if failed else 0
+
+
+def cmd_export(args):
+    """流式读取整张表写到文件，不把整表放进内存"""
+    import csv
+    import json
+    import pymysql
+    from check_data import DB_CONFIG
+
+    out = args.out or f"{args.entity}_export.{args.format}"
+    conn = pymysql.connect(**DB_CONFIG, cursorclass=pymysql.cursors.SSCursor)
+    cursor = conn.cursor()
+    count = 0
+    try:
+        cursor.execute(f"SELECT * FROM {args.entity} ORDER BY {EXPORT_TABLES[args.entity]}")
+        columns = [column[0] for column in cursor.description]
+        with open(out, "w", encoding="utf-8", newline='') as f:
+            if args.format == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for row in cursor:
+                    writer.writerow(row)
+                    count += 1
+            else:
+                f.write("[")
+                for row in cursor:
+                    f.write(",\n" if count else "\n")
+                    f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str))
+                    count += 1
+                f.write("\n]\n")
+    finally:
+        cursor.close()
+        conn.close()
+    print(f"已导出 {count} 条 {args.entity} 到 {out}")
+    return 0
+
+
+def cmd_report(args):
+    if args.kind == 'data':
+        from check_data import check_data
+        return 1 if check_data(verify=args.verify, rebuild=args.rebuild) else 0
+    if args.kind == 'coverage':
+        from id_coverage import report
+        for entity in ('students', 'activities'):
+            report(entity)
+        return 0
+    if args.kind == 'captcha':
+        import os
+        from slider_calibration import ATTEMPT_LOG, report
+        path = args.log or ATTEMPT_LOG
+        if not os.path.exists(path):
+            print(f"还没有尝试记录: {path}")
+            return 1
+        report(path)
+        return 0
+
+    from instrumentation import latest_run_log, read_run_log, print_phases
+    path = args.log or latest_run_log()
+    if not path:
+        print("没有运行日志")
+        return 1
+    name, stats = read_run_log(path)
+    print(f"{path} ({name})")
+    print_phases(sorted(stats.items(), key=lambda kv: -kv[1][1])[:args.top])
+    return 0
+
+
+def cmd_replay(args):
+    """把爬虫导出的 JSON（students_data.json / activities_data.json）按批写回数据库"""
+    import json
+    if args.entity == 'students':
+        import crawl_students as crawler
+    else:
+        import crawl_activities as crawler
+
+    with open(args.file, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    if args.rebuild:
+        crawler.init_database()
+    saved = 0
+    for start in range(0, len(records), args.batch):
+        saved += crawler.save_batch_to_mysql(records[start:start + args.batch])
+        print(f"    已写入 {min(start + args.batch, len(records))}/{len(records)}")
+    print(f"重放完成: {saved}/{len(records)} 条写入 {args.entity}")
+    return 0 if saved == len(records) else 1
+
+
+def cmd_history(args):
+    import student_history
+    return student_history.main(args.history_args)
+
+
+def cmd_bench(args):
+    import bench_crawl
+    sys.argv = ['bench_crawl.py'] + args.bench_args
+    return bench_crawl.main()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="第二课堂数据爬虫")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    crawl = sub.add_parser('crawl', help='登录并爬取')
+    crawl.add_argument('entity', choices=['students', 'activities', 'lookups', 'all', 'participants'])
+    crawl.add_argument('--profile', nargs='?', const='profiles', metavar='DIR',
+                       help='开启性能分析（all / participants 不支持）')
+    crawl.add_argument('--restart', action='store_true', help='participants: 丢弃上次的检查点，从头开始')
+    crawl.add_argument('--discover', action='store_true', help='participants: 列出名单页发出的请求，用于配置 DETAIL_API（配置前名单爬虫不能运行）')
+    crawl.set_defaults(func=cmd_crawl)
+
+    resume = sub.add_parser('resume', help='从库里已有的数据接着爬（增量任务各跑一次）')
+    resume.add_argument('jobs', nargs='*', metavar='JOB',
+                        help=f"守护进程任务名，默认 {' '.join(RESUME_JOBS)}")
+    resume.set_defaults(func=cmd_resume)
+
+    export = sub.add_parser('export', help='从MySQL导出整张表')
+    export.add_argument('entity', choices=list(EXPORT_TABLES))
+    export.add_argument('--format', choices=['json', 'csv'], default='json')
+    export.add_argument('--out', help='输出文件（默认 <表名>_export.<格式>）')
+    export.set_defaults(func=cmd_export)
+
+    report = sub.add_parser('report', help='数据汇总 / 验证码统计 / ID覆盖 / 运行耗时')
+    report.add_argument('kind', choices=['data', 'captcha', 'coverage', 'run'])
+    report.add_argument('--verify', action='store_true', help='data: 全表扫描并与汇总表比对')
+    report.add_argument('--rebuild', action='store_true', help='data: 从基础表全量重算汇总表')
+    report.add_argument('--log', help='captcha/run: 指定日志文件（run 默认最近一次运行）')
+    report.add_argument('--top', type=int, default=20, help='run: 显示的阶段数')
+    report.set_defaults(func=cmd_report)
+
+    replay = sub.add_parser('replay', help='把导出的JSON重新写入MySQL')
+    replay.add_argument('file')
+    replay.add_argument('--entity', choices=['students', 'activities'], required=True)
+    replay.add_argument('--rebuild', action='store_true', help='先重建表')
+    replay.add_argument('--batch', type=int, default=REPLAY_BATCH)
+    replay.set_defaults(func=cmd_replay)
+
+    history = sub.add_parser('history', help='学生学分/总分的历史快照（其余参数原样传给 student_history.py）',
+                             add_help=False)
+    history.set_defaults(func=cmd_history)
+
+    bench = sub.add_parser('bench', help='端到端基准测试（其余参数原样传给 bench_crawl.py）', add_help=False)
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'bench':
+        args.bench_args = extra
+    elif args.command == 'history':
+        args.history_args = extra
+    elif extra:
+        parser.error(f"无法识别的参数: {' '.join(extra)}")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
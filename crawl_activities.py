@@ -3,20 +3,40 @@
 """
 活动数据爬虫 - 支持翻页
 登录后爬取全部活动列表数据并保存到MySQL
+selenium / main.login 在用到时才导入，只用写库函数时不加载浏览器相关模块
 """
 
+import sys
 import time
 import json
+import argparse
 import pymysql
 from datetime import datetime
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from main import login
+from cdp_transport import run_script
+from adaptive_paging import PageSizeController, go_to_page, locate, page_heap_mb, payload_kb
+from id_coverage import IdCoverage, load_snapshot, REPAIR_MAX_PAGES
+from page_retry import PageRetry, session_lost, load_dead_pages, clear_dead_pages
+from governor import get_governor
+from instrumentation import span, traced, log, start_run, end_run, summary
+import metrics
+from crawl_lookups import refresh_lookups, build_lookup_maps, resolve_activity
+from activity_search import ActivitySearchIndex
+from activity_partitions import (
+    partition_clause, reset_partition_cache, route_batch, load_partitions, detect_scheme,
+    add_future_partitions, archived_before, NULL_START_TIME
+)
+from summary_tables import (
+    reset_summary, fetch_existing_rows, new_changeset, record_change, apply_changes
+)
 
 # ============ 配置 ============
 ACTIVITY_URL = "https://2ketangpc.svtcc.edu.cn/communist/activityDown?oto=0"
-PAGE_SIZE = 2000  # 每页条数
+PAGE_SIZE = 2000  # 每页条数上限（网站最大支持2000条），实际条数由 adaptive_paging 调整
 MAX_PAGES = None  # 最大爬取页数，None表示爬取全部
+RECENT_MAX_PAGES = 3  # 增量爬取最多翻几页
+METRICS_PORT = None  # 爬取期间在该端口提供 /metrics，None表示只写 textfile
+PROFILE_DIR = "profiles"  # --profile 不带目录时的报告目录
+PARTITION_SCHEME = None  # 活动表分区方案：None不分区，'year'按年，'semester'按学期
 
 # MySQL数据库配置
 DB_CONFIG = {
@@ -29,98 +49,109 @@ DB_CONFIG = {
 # ==============================
 
 
-def get_page_info(driver):
-    """获取分页信息"""
-    try:
-        script = """
-        function findPageInfo(el) {
-            if (el.__vue__) {
-                var vm = el.__vue__;
-                var data = vm.$data || {};
-                if (data.total !== undefined) {
-                    return {total: data.total, pageSize: data.pageSize || 10, currentPage: data.currentPage || 1};
-                }
+# 提取脚本（经 cdp_transport.run_script 执行）
+PAGE_INFO_SCRIPT = """
+function findPageInfo(el) {
+    if (el.__vue__) {
+        var vm = el.__vue__;
+        var data = vm.$data || {};
+        if (data.total !== undefined) {
+            return {total: data.total, pageSize: data.pageSize || 10, currentPage: data.currentPage || 1};
+        }
+    }
+    for (var i = 0; i < el.children.length; i++) {
+        var result = findPageInfo(el.children[i]);
+        if (result) return result;
+    }
+    return null;
+}
+return findPageInfo(document.body);
+"""
+
+PAGE_DATA_SCRIPT = """
+function findActivityData(el) {
+    if (el.__vue__) {
+        var vm = el.__vue__;
+        var data = vm.$data || {};
+        if (data.data && Array.isArray(data.data) && data.data.length > 0) {
+            var item = data.data[0];
+            if (item && item.actId && item.name) {
+                return data.data;
             }
-            for (var i = 0; i < el.children.length; i++) {
-                var result = findPageInfo(el.children[i]);
-                if (result) return result;
+        }
+    }
+    for (var i = 0; i < el.children.length; i++) {
+        var result = findActivityData(el.children[i]);
+        if (result) return result;
+    }
+    return null;
+}
+return findActivityData(document.body);
+"""
+
+DATA_COUNT_SCRIPT = """
+function findActivityData(el) {
+    if (el.__vue__) {
+        var vm = el.__vue__;
+        var data = vm.$data || {};
+        if (data.data && Array.isArray(data.data) && data.data.length > 0) {
+            var item = data.data[0];
+            if (item && item.actId && item.name) {
+                return data.data.length;
             }
-            return null;
         }
-        return findPageInfo(document.body);
-        """
-        return driver.execute_script(script)
+    }
+    for (var i = 0; i < el.children.length; i++) {
+        var result = findActivityData(el.children[i]);
+        if (result) return result;
+    }
+    return 0;
+}
+return findActivityData(document.body);
+"""
+
+
+def get_page_info(driver):
+    """获取分页信息"""
+    try:
+        return run_script(driver, PAGE_INFO_SCRIPT)
     except:
         return None
 
 
+@traced('page.extract', rows_from_result=True)
 def get_current_page_data(driver, prev_first_id=None, max_wait=15):
     """获取当前页的活动数据"""
-    script = """
-    function findActivityData(el) {
-        if (el.__vue__) {
-            var vm = el.__vue__;
-            var data = vm.$data || {};
-            if (data.data && Array.isArray(data.data) && data.data.length > 0) {
-                var item = data.data[0];
-                if (item && item.actId && item.name) {
-                    return data.data;
-                }
-            }
-        }
-        for (var i = 0; i < el.children.length; i++) {
-            var result = findActivityData(el.children[i]);
-            if (result) return result;
-        }
-        return null;
-    }
-    return findActivityData(document.body);
-    """
-    
     if prev_first_id:
         print(f"    等待数据更新 (上一页首条ID: {prev_first_id})...")
-        for i in range(max_wait):
-            data = driver.execute_script(script)
-            if data and len(data) > 0:
-                current_first_id = data[0].get('actId')
-                if current_first_id != prev_first_id:
-                    print(f"    数据已更新 (新首条ID: {current_first_id}, 共{len(data)}条)")
-                    return data
-                else:
-                    print(f"    等待中... ({i+1}/{max_wait})")
-            time.sleep(1)
-        print(f"    警告: 等待{max_wait}秒后数据仍未更新")
+        with span('page.wait_data', prev_first_id=prev_first_id) as waited:
+            for i in range(max_wait):
+                waited['polls'] = i + 1
+                data = run_script(driver, PAGE_DATA_SCRIPT)
+                if data and len(data) > 0:
+                    current_first_id = data[0].get('actId')
+                    if current_first_id != prev_first_id:
+                        print(f"    数据已更新 (新首条ID: {current_first_id}, 共{len(data)}条)")
+                        return data
+                    else:
+                        log(f"    等待中... ({i+1}/{max_wait})", poll=i + 1)
+                time.sleep(1)
+            log(f"    警告: 等待{max_wait}秒后数据仍未更新", polls=max_wait)
     
-    return driver.execute_script(script)
+    return run_script(driver, PAGE_DATA_SCRIPT)
 
 
 def get_data_count(driver):
     """获取当前页面数据条数"""
-    script = """
-    function findActivityData(el) {
-        if (el.__vue__) {
-            var vm = el.__vue__;
-            var data = vm.$data || {};
-            if (data.data && Array.isArray(data.data) && data.data.length > 0) {
-                var item = data.data[0];
-                if (item && item.actId && item.name) {
-                    return data.data.length;
-                }
-            }
-        }
-        for (var i = 0; i < el.children.length; i++) {
-            var result = findActivityData(el.children[i]);
-            if (result) return result;
-        }
-        return 0;
-    }
-    return findActivityData(document.body);
-    """
-    return driver.execute_script(script)
+    return run_script(driver, DATA_COUNT_SCRIPT)
 
 
+@traced('page.set_size')
 def set_page_size(driver, size):
     """设置每页显示条数"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+
     try:
         time.sleep(3)
         page_input = driver.find_element(By.CSS_SELECTOR, ".page-input input.el-input__inner")
@@ -141,8 +172,11 @@ def set_page_size(driver, size):
         return False
 
 
+@traced('page.navigate')
 def click_next_page(driver):
     """点击下一页按钮"""
+    from selenium.webdriver.common.by import By
+
     try:
         # 等待加载遮罩消失
         for i in range(10):
@@ -193,6 +227,7 @@ def click_next_page(driver):
         return False
 
 
+@traced('db.init')
 def init_database():
     """初始化数据库和表"""
     conn = pymysql.connect(
@@ -206,11 +241,22 @@ def init_database():
     cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_CONFIG['database']}` DEFAULT CHARSET utf8mb4")
     cursor.execute(f"USE `{DB_CONFIG['database']}`")
     
+    # 分区表保留：全量爬取按主键覆盖写入，已归档的分区不会被重建回来
+    if PARTITION_SCHEME and detect_scheme(load_partitions(cursor)) == PARTITION_SCHEME:
+        reset_partition_cache()
+        add_future_partitions(cursor)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        print(f"[DB] 保留已有的activities分区表 (按{PARTITION_SCHEME}分区)")
+        return
+    
     cursor.execute("DROP TABLE IF EXISTS activities")
     
-    create_table_sql = """
+    # 分区表的主键必须包含分区列 start_time
+    create_table_sql = f"""
     CREATE TABLE activities (
-        act_id INT PRIMARY KEY COMMENT '活动ID',
+        act_id INT NOT NULL COMMENT '活动ID',
         name VARCHAR(500) NOT NULL COMMENT '活动名称',
         class_id INT COMMENT '分类ID',
         class_name VARCHAR(100) COMMENT '分类名称',
@@ -221,7 +267,7 @@ def init_database():
         admin_name VARCHAR(100) COMMENT '管理员名称',
         creator_id INT COMMENT '创建者ID',
         hours DECIMAL(5,2) COMMENT '学时',
-        start_time DATETIME COMMENT '开始时间',
+        start_time DATETIME {'NOT NULL' if PARTITION_SCHEME else 'NULL'} COMMENT '开始时间',
         end_time DATETIME COMMENT '结束时间',
         enroll_end_time DATETIME COMMENT '报名截止时间',
         status TINYINT COMMENT '状态',
@@ -234,14 +280,22 @@ def init_database():
         finish_status2 VARCHAR(50) COMMENT '完成状态2',
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+        PRIMARY KEY ({'act_id, start_time' if PARTITION_SCHEME else 'act_id'}),
         INDEX idx_name (name(100)),
         INDEX idx_class_id (class_id),
         INDEX idx_org_id (org_id),
-        INDEX idx_start_time (start_time)
+        INDEX idx_start_time_hours (start_time, hours),
+        INDEX idx_org_name_hours (org_name, hours),
+        INDEX idx_class_name_hours (class_name, hours)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='第二课堂活动信息表'
+    {partition_clause(PARTITION_SCHEME) if PARTITION_SCHEME else ''}
     """
     cursor.execute(create_table_sql)
-    print("[DB] 已重建activities表")
+    reset_partition_cache()
+    print(f"[DB] 已重建activities表{f' (按{PARTITION_SCHEME}分区)' if PARTITION_SCHEME else ''}")
+    
+    # 基础表重建后汇总表同步清零
+    reset_summary(cursor, 'activities')
     
     conn.commit()
     cursor.close()
@@ -256,6 +310,7 @@ def timestamp_to_datetime(ts):
     return None
 
 
+@traced('db.write', rows_from_result=True)
 def save_batch_to_mysql(activities):
     """批量保存活动数据到MySQL"""
     if not activities:
@@ -280,6 +335,16 @@ def save_batch_to_mysql(activities):
     )
     """
     
+    # 写入前读取旧行，用于计算汇总表的增量
+    existing = fetch_existing_rows(cursor, 'activities', [act.get('actId') for act in activities])
+    changes = new_changeset()
+    
+    # 分区表：按本批最大开始时间补齐分区，MySQL会把每行写入对应分区
+    archive_bound = None
+    if PARTITION_SCHEME:
+        route_batch(cursor, [timestamp_to_datetime(act.get('startTime')) for act in activities])
+        archive_bound = archived_before(cursor)
+    
     success_count = 0
     fail_count = 0
     
@@ -318,13 +383,33 @@ def save_batch_to_mysql(activities):
                 act.get('finishStatus') if act.get('finishStatus') != '' else None,
                 act.get('finishStatus2') if act.get('finishStatus2') != '' else None
             )
+            if PARTITION_SCHEME:
+                # 主键是 (act_id, start_time)：开始时间缺失时用占位值，开始时间变化时先删旧行
+                if values[11] is None:
+                    values = values[:11] + (NULL_START_TIME,) + values[12:]
+                old = existing.get(act.get('actId'))
+                if old is not None and old['start_time'] != values[11]:
+                    cursor.execute("DELETE FROM activities WHERE act_id = %s", (act.get('actId'),))
+                if archive_bound and NULL_START_TIME < values[11] < archive_bound:
+                    # 早于归档边界的活动只更新归档表，不写回活动表和汇总表
+                    cursor.execute(insert_sql.replace("INTO activities", "INTO activities_archive"), values)
+                    success_count += 1
+                    continue
             cursor.execute(insert_sql, values)
+            record_change(changes, 'activities', existing, {
+                'act_id': act.get('actId'),
+                'org_name': act.get('orgName'),
+                'class_name': act.get('className'),
+                'start_time': values[11],
+                'hours': act.get('hours'),
+            })
             success_count += 1
         except Exception as e:
             fail_count += 1
             if fail_count <= 3:
                 print(f"    写入失败: {act.get('actId')} - {e}")
     
+    apply_changes(cursor, 'activities', changes)
     conn.commit()
     cursor.close()
     conn.close()
@@ -335,11 +420,26 @@ def save_batch_to_mysql(activities):
     return success_count
 
 
-def crawl_all_pages(driver):
-    """爬取所有页面的活动数据"""
+def open_activity_list(driver, size=PAGE_SIZE):
+    """打开活动列表、刷新查找表并切换到每页 size 条
+
+    Returns:
+        tuple: (查找表映射, 总条数)
+    """
+    from browser_pool import set_resource_blocking
+
     print("\n[6] 访问活动列表页面...")
-    driver.get(ACTIVITY_URL)
-    time.sleep(3)
+    set_resource_blocking(driver, 'crawl')
+    with span('page.navigate', url=ACTIVITY_URL):
+        driver.get(ACTIVITY_URL)
+        time.sleep(3)
+    
+    # 同一会话中刷新组织/分类查找表（缓存有效或哈希未变时不会重新拉取）
+    try:
+        lookup_maps = build_lookup_maps(refresh_lookups(driver))
+    except Exception as e:
+        print(f"    查找表刷新失败: {e}")
+        lookup_maps = None
     
     page_info = get_page_info(driver)
     if page_info:
@@ -349,62 +449,278 @@ def crawl_all_pages(driver):
         print("[7] 无法获取总数")
         total = 999999
     
-    print(f"[8] 输入每页 {PAGE_SIZE} 条并按回车...")
-    set_page_size(driver, PAGE_SIZE)
+    print(f"[8] 输入每页 {size} 条并按回车...")
+    set_page_size(driver, size)
     
     print("    等待数据加载...")
-    for i in range(20):
-        time.sleep(1)
-        data_count = get_data_count(driver)
-        if data_count and data_count >= PAGE_SIZE * 0.9:
-            print(f"    数据加载完成: {data_count} 条")
-            break
-        print(f"    加载中... ({i+1}/20) 当前: {data_count} 条")
+    with span('page.wait_data', page=1) as waited:
+        for i in range(20):
+            time.sleep(1)
+            data_count = get_data_count(driver)
+            waited.update(polls=i + 1, rows=data_count or 0)
+            if data_count and data_count >= min(size, total) * 0.9:
+                print(f"    数据加载完成: {data_count} 条")
+                break
+            print(f"    加载中... ({i+1}/20) 当前: {data_count} 条")
     
-    init_database()
+    return lookup_maps, total
+
+
+def reposition(driver, size, offset, total):
+    """切换到每页 size 条并跳到第 offset 行所在的页（total 为列表总条数，用于判断最后一页的行数）
+
+    Returns:
+        tuple: (该页开头已读过、需要跳过的行数, 跳页前显示的首条ID；已在目标页时为 None)
+    """
+    page_no, skip = locate(offset, size)
+    print(f"    切换到每页 {size} 条，从第 {offset + 1} 行（第 {page_no} 页）继续")
+    set_page_size(driver, size)
+    # 切换后显示的可能是第一页（满页），也可能已是目标页；目标页是最后一页时不满 size 条
+    expected = (size, min(size, total - (page_no - 1) * size))
+    with span('page.wait_data', page_size=size) as waited:
+        for i in range(20):
+            time.sleep(1)
+            waited['polls'] = i + 1
+            if get_data_count(driver) in expected:
+                break
+    info = get_page_info(driver) or {}
+    if page_no == 1 or info.get('currentPage') == page_no:
+        return skip, None
+    shown = run_script(driver, PAGE_DATA_SCRIPT) or [{}]
+    with span('page.navigate', page=page_no):
+        go_to_page(driver, page_no)
+    return skip, shown[0].get('actId')
+
+
+def recover_page(driver, size, offset, total):
+    """重试前的恢复：会话掉线时重新登录（失败时抛出 RuntimeError）并回到活动列表，再定位到第 offset 行所在的页"""
+    if session_lost(driver):
+        from main import login
+
+        print("    会话已失效，重新登录...")
+        if login(driver) is None:
+            # login 失败时已关闭浏览器（合并爬取时是这个标签页），不能再翻页
+            raise RuntimeError("重新登录失败，停止爬取")
+        with span('page.navigate', url=ACTIVITY_URL):
+            driver.get(ACTIVITY_URL)
+            time.sleep(3)
+    return reposition(driver, size, offset, total)
+
+
+def repair_missing(driver, coverage, size, lookup_maps, save=None):
+    """按ID覆盖记录找出缺失的ID区间，只重新读取它们可能所在的页并补写入库；
+    死信队列里的页（本次和以前爬取时重试用完的）整页重新读取；save 为写入函数，默认直接写库
+
+    Returns:
+        list: 补读到的活动
+    """
+    save = save or save_batch_to_mysql
+    ranges = coverage.missing_ranges(load_snapshot('activities'))
+    coverage.report(ranges)
+    # 死信页按当前每页条数拆成对齐的页；pending: 死信记录的行偏移 -> 还没读到的页
+    pending = {}
+    for record in load_dead_pages('activities'):
+        rows = range(record['offset'], record['offset'] + record['size'], size)
+        pending.setdefault(record['offset'], set()).update(row - row % size for row in rows)
+    dead_offsets = set().union(*pending.values())
+    offsets = sorted(set(coverage.suspect_offsets(ranges, size)) | dead_offsets)
+    if not offsets:
+        return []
+    if len(offsets) > REPAIR_MAX_PAGES:
+        print(f"    可疑页 {len(offsets)} 个，超过 {REPAIR_MAX_PAGES} 页，请重新全量爬取")
+        coverage.complete = False
+        return []
+    print(f"\n[修补] {len(ranges)} 个缺失区间、{len(pending)} 个死信页，重新读取 {len(offsets)} 页...")
+    recovered = []
+    with span('page.repair', ranges=len(ranges), pages=len(offsets)) as repaired:
+        for index, offset in enumerate(offsets):
+            page_no = offset // size + 1
+            with get_governor().request():
+                info = get_page_info(driver) or {}
+                prev_first_id = None
+                if info.get('currentPage') != page_no:
+                    shown = run_script(driver, PAGE_DATA_SCRIPT) or [{}]
+                    prev_first_id = shown[0].get('actId')
+                    go_to_page(driver, page_no)
+                rows = get_current_page_data(driver, prev_first_id, max_wait=20) or []
+            if rows and offset in dead_offsets:
+                for waiting in pending.values():
+                    waiting.discard(offset)
+            missing = coverage.missing(ranges)
+            found = [r for r in rows if r.get('actId') is not None and (
+                offset in dead_offsets and int(r['actId']) not in coverage.seen
+                or any(start <= int(r['actId']) <= end for start, end in missing))]
+            if found:
+                found = [resolve_activity(a, lookup_maps) for a in found]
+                save(found)
+                coverage.recover(found)
+                recovered.extend(found)
+            log(f"    第 {page_no} 页: 补读 {len(found)} 条", page=page_no, recovered=len(found))
+            if not coverage.missing(ranges) and not dead_offsets.intersection(offsets[index + 1:]):
+                break
+        repaired['recovered'] = len(recovered)
+    clear_dead_pages('activities', {offset for offset, waiting in pending.items() if not waiting})
+    if any(pending.values()):
+        coverage.complete = False
+    left = coverage.missing(ranges)
+    if left:
+        print(f"    仍有 {sum(end - start + 1 for start, end in left)} 个ID未找到（可能已被删除）")
+    return recovered
+
+
+def crawl_all_pages(driver, sink=None):
+    """爬取所有页面的活动数据
+
+    Args:
+        sink: crawl_jobs.CrawlPipeline；给出时每页交给 sink.write 异步写库和导出，
+              sink.stopped 时不再翻页。不给时直接写库，结束后导出 JSON
+    """
+    # 每页条数由控制器根据加载情况调整，从历史吞吐最高的档位开始
+    controller = PageSizeController('activities', max_size=PAGE_SIZE)
+    size = controller.size
+    governor = get_governor()
+    ticket = governor.acquire()
+    try:
+        lookup_maps, total = open_activity_list(driver, size)
     
-    all_activities = []
-    total_saved = 0
-    page = 1
-    max_pages = MAX_PAGES or (total // PAGE_SIZE + 1)
-    prev_first_id = None
+        init_database()
     
-    print(f"\n[9] 开始爬取数据 (预计 {max_pages} 页)...")
+        # 活动名称搜索索引：每页增量加入，爬取结束后保存
+        search_index = ActivitySearchIndex.load()
     
-    while page <= max_pages:
-        time.sleep(2)
-        
-        if page == 1:
-            activities = get_current_page_data(driver)
-        else:
-            activities = get_current_page_data(driver, prev_first_id, max_wait=20)
+        all_activities = []
+        total_saved = 0
+        page = 1
+        offset = 0  # 已读取的行数；换档时按它计算新页码
+        skip = 0  # 当前页开头已读过的行数
+        total_known = total != 999999  # 拿不到总数时 open_activity_list 返回 999999
+        retries = PageRetry('activities')
+        max_pages = MAX_PAGES or (total // size + 1)
+        coverage = IdCoverage('activities', 'actId', total)
+        save = sink.write if sink else save_batch_to_mysql
+        prev_first_id = None
+    
+        print(f"\n[9] 开始爬取数据 (预计 {max_pages} 页)...")
+    
+        while page <= max_pages:
+            if sink and sink.stopped:
+                governor.release(ticket)
+                break
+            time.sleep(2)
         
-        if not activities or len(activities) == 0:
-            print(f"    第 {page} 页无数据，停止爬取")
-            break
+            failure = None
+            try:
+                if prev_first_id is None:
+                    activities = get_current_page_data(driver)
+                else:
+                    activities = get_current_page_data(driver, prev_first_id, max_wait=20)
+            except Exception as e:
+                activities, failure = None, f"读取出错: {e}"
+            load_seconds = ticket.elapsed
         
-        current_first_id = activities[0].get('actId') if activities else None
+            # 还没读够总数时的空页、等待后首条ID仍没变都算这一页失败
+            current_first_id = activities[0].get('actId') if activities else None
+            at_end = not activities and not failure and (not total_known or offset >= total)
+            if not activities and not at_end:
+                failure = failure or '空页'
+            elif activities and prev_first_id is not None and current_first_id == prev_first_id:
+                failure = '数据未更新'
+            governor.release(ticket, error=bool(failure))
+            if at_end:
+                print(f"    第 {page} 页无数据，停止爬取")
+                break
         
-        saved = save_batch_to_mysql(activities)
-        total_saved += saved
+            controller.observe(len(activities or []), load_seconds, payload_kb(activities), page_heap_mb(driver), bool(failure))
+            if failure:
+                # 降档后退避重试；重试次数用完的页进入死信队列，从下一页继续
+                size = controller.next_size(offset)
+                if retries.should_retry(offset, size, failure):
+                    with retries.backoff(offset):
+                        ticket = governor.acquire()
+                        skip, prev_first_id = recover_page(driver, size, offset, total)
+                elif retries.give_up:
+                    print(f"    连续 {retries.consecutive_dead} 页失败，停止爬取")
+                    break
+                else:
+                    offset += size
+                    page += 1
+                    if offset >= total:
+                        break
+                    ticket = governor.acquire()
+                    skip, prev_first_id = recover_page(driver, size, offset, total)
+                max_pages = MAX_PAGES or (page + (total - offset) // size)
+                continue
+            retries.succeeded(offset)
         
-        existing_ids = {a.get('actId') for a in all_activities}
-        new_activities = [a for a in activities if a.get('actId') not in existing_ids]
-        all_activities.extend(new_activities)
+            # 跳过换档后与上一页重叠的行
+            fetched = len(activities)
+            activities = [resolve_activity(a, lookup_maps) for a in activities[skip:]]
+            coverage.add_page(offset, activities)
+            saved = save(activities)
+            total_saved += saved
+            offset += len(activities)
+            search_index.add_activities(activities)
         
-        print(f"    第 {page}/{max_pages} 页: 获取 {len(activities)} 条, 新增 {len(new_activities)} 条, 累计 {len(all_activities)} 条")
+            existing_ids = {a.get('actId') for a in all_activities}
+            new_activities = [a for a in activities if a.get('actId') not in existing_ids]
+            all_activities.extend(new_activities)
         
-        prev_first_id = current_first_id
+            log(f"    第 {page}/{max_pages} 页: 获取 {len(activities)} 条, 新增 {len(new_activities)} 条, 累计 {len(all_activities)} 条",
+                page=page, rows=len(activities), new=len(new_activities), total=len(all_activities),
+                page_size=size, offset=offset, load_s=round(load_seconds, 2))
         
-        if len(activities) < PAGE_SIZE:
-            print(f"    当前页只有 {len(activities)} 条，已到最后一页")
-            break
+            prev_first_id = current_first_id
         
-        page += 1
-        if page <= max_pages:
-            if not click_next_page(driver):
-                print("    无法翻页，停止爬取")
+            if fetched < size or offset >= total:
+                print(f"    当前页只有 {fetched} 条，已到最后一页")
                 break
+        
+            # 档位不变时点击下一页；换档时按偏移量跳到新档位对应的页
+            page += 1
+            if page <= max_pages:
+                ticket = governor.acquire()
+                new_size = controller.next_size(offset)
+                if new_size != size:
+                    size = new_size
+                    skip, prev_first_id = reposition(driver, size, offset, total)
+                    max_pages = MAX_PAGES or (page + (total - offset) // size)
+                elif click_next_page(driver):
+                    skip = 0
+                else:
+                    print("    点击下一页失败，按页码跳转")
+                    skip, prev_first_id = reposition(driver, size, offset, total)
+    except BaseException:
+        # recover_page / reposition 等抛出时归还手里的许可，不占着并发名额等 TICKET_TIMEOUT 过期
+        governor.release(ticket, error=True)
+        raise
+    # 正常结束时许可都已归还（再次 release 不起作用），翻页后没再读取就退出循环时在这里归还
+    governor.release(ticket)
+    
+    controller.summary()
+    retries.summary()
+    if retries.give_up:
+        # 连续死信后停止，后面的页没有读，快照要保留上次的ID
+        coverage.complete = False
+    if sink and sink.stopped:
+        # 中断时读到的活动不完整：只保存索引新增的部分，不修补、不删除索引、不覆盖上次的快照
+        if search_index.dirty:
+            search_index.save()
+        return all_activities
+    recovered = repair_missing(driver, coverage, size, lookup_maps, save)
+    search_index.add_activities(recovered)
+    all_activities.extend(recovered)
+    coverage.save()
+    
+    # 活动表每次重建，索引同步删除本次未出现的活动
+    crawled_ids = {a.get('actId') for a in all_activities}
+    for act_id in [i for i in search_index.docs if i not in crawled_ids]:
+        search_index.remove(act_id)
+    if search_index.dirty:
+        search_index.save()
+        print(f"    搜索索引已更新: {len(search_index.docs)} 个活动")
+    if sink:
+        print(f"\n[10] 爬取完成! 内存中去重后: {len(all_activities)} 条唯一记录")
+        return all_activities
     
     try:
         conn = pymysql.connect(**DB_CONFIG)
@@ -420,35 +736,111 @@ def crawl_all_pages(driver):
     print(f"    内存中去重后: {len(all_activities)} 条唯一记录")
     print(f"    数据库实际记录: {db_count} 条")
     
-    with open("activities_data.json", "w", encoding="utf-8") as f:
-        json.dump(all_activities, f, ensure_ascii=False, indent=2, default=str)
+    with span('export.flush', rows=len(all_activities)):
+        with open("activities_data.json", "w", encoding="utf-8") as f:
+            json.dump(all_activities, f, ensure_ascii=False, indent=2, default=str)
     print(f"    数据已保存到 activities_data.json")
     
     return all_activities
 
 
-def main():
+def crawl_recent_pages(driver, stop_when, max_pages=RECENT_MAX_PAGES):
+    """只爬列表最前面的几页并写库（不重建表），供守护进程的增量任务使用
+
+    列表按开始时间倒序，新发布和仍在进行中的活动都在前几页；
+    stop_when(本页活动) 返回 True 时不再翻页
+
+    Returns:
+        list: 爬到的活动
+    """
+    governor = get_governor()
+    with governor.request():
+        lookup_maps, total = open_activity_list(driver)
+    search_index = ActivitySearchIndex.load()
+    
+    crawled = []
+    prev_first_id = None
+    for page in range(1, max_pages + 1):
+        if page > 1:
+            with governor.request():
+                if not click_next_page(driver):
+                    break
+                activities = get_current_page_data(driver, prev_first_id, max_wait=20)
+        else:
+            activities = get_current_page_data(driver)
+        if not activities:
+            break
+        
+        prev_first_id = activities[0].get('actId')
+        activities = [resolve_activity(a, lookup_maps) for a in activities]
+        save_batch_to_mysql(activities)
+        search_index.add_activities(activities)
+        crawled.extend(activities)
+        log(f"    第 {page} 页: 获取 {len(activities)} 条", page=page, rows=len(activities))
+        
+        if len(activities) < PAGE_SIZE or stop_when(activities):
+            break
+    
+    if search_index.dirty:
+        search_index.save()
+    return crawled
+
+
+def main(profile_dir=None):
+    from main import login
+    from crawl_jobs import run_crawl
+
+    start_run('crawl_activities')
+    metrics.install('activities')
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
     print("=" * 60)
     print("第二课堂活动数据爬虫 - 支持翻页")
     print("=" * 60)
     
+    profiler = None
+    if profile_dir:
+        from profiling import CrawlProfiler
+        profiler = CrawlProfiler('activities', profile_dir)
+        profiler.start()
+    
     driver = login()
     
     if not driver:
         print("登录失败，无法继续")
+        metrics.finish('activities', success=False)
+        if profiler:
+            profiler.stop()
+        summary()
+        end_run()
         return
     
+    if profiler:
+        profiler.attach(driver)
+    
+    success = False
+    
     try:
-        crawl_all_pages(driver)
+        # 翻页、写库、导出由 crawl_jobs 的任务组并发执行
+        success = bool(run_crawl(sys.modules[__name__], 'activities', driver))
     except KeyboardInterrupt:
-        print("\n\n用户中断...")
+        print("\n\n用户中断，已读取的页已写入数据库并导出到 activities_data.json")
     except Exception as e:
         print(f"\n爬取异常: {e}")
     finally:
         print("\n等待3秒后关闭浏览器...")
         time.sleep(3)
         driver.quit()
+        metrics.finish('activities', success)
+        if profiler:
+            profiler.stop()
+        summary()
+        end_run()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="爬取活动数据")
+    parser.add_argument('--profile', nargs='?', const=PROFILE_DIR, metavar='DIR',
+                        help=f'开启性能分析，报告写到该目录（默认 {PROFILE_DIR}）')
+    args = parser.parse_args()
+    main(profile_dir=args.profile)
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫守护进程
+常驻进程里保持已登录的浏览器（默认1个，取自预热的浏览器池），按类cron表达式（带随机抖动）定时执行任务：
+学生全量刷新、活动增量、进行中活动刷新、查找表刷新。
+会话空闲较久时先检查是否仍然有效，过期才重新登录；任务状态写入 daemon_status.json，
+也可以通过本地HTTP端口查看 /status 和 /metrics
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import traceback
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pymysql
+
+import metrics
+from main import login
+from browser_pool import BrowserPool
+from instrumentation import span, log, start_run, end_run
+from governor import get_governor
+
+# ============ 配置 ============
+POOL_SIZE = 1  # 同时保持登录的浏览器数
+SESSION_CHECK_URL = "https://2ketangpc.svtcc.edu.cn/home"
+SESSION_CHECK_AFTER = 10 * 60  # 浏览器空闲超过该秒数，使用前先检查会话
+OPEN_ACTIVITY_GRACE = 24 * 3600  # 结束不到一天的活动仍算进行中（签到、学时可能还在变）
+STATUS_FILE = "daemon_status.json"
+STATUS_PORT = None  # 如 8766：提供 http://127.0.0.1:8766/status 和 /metrics
+
+# 任务: 名称, cron表达式(分 时 日 月 周), 随机抖动秒数
+JOBS = [
+    ('students_full', '30 2 * * *', 600),
+    ('activities_incremental', '*/30 7-22 * * *', 120),
+    ('open_activities', '15 */2 * * *', 120),
+    ('lookups', '0 6 * * *', 300),
+]
+
+DB_CONFIG = {
+    'host': '10.5.80.8',
+    'user': 'root',
+    'password': '123456',
+    'database': '2ketang',
+    'charset': 'utf8mb4'
+}
+# ==============================
+
+
+# ---------- cron 表达式 ----------
+CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def parse_cron_field(text, low, high):
+    """解析cron的一个字段，支持 * 、*/n、a-b、a-b/n、a,b"""
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(x) for x in part.split('-'))
+        else:
+            start = end = int(part)
+        if start < low or end > high + (1 if high == 6 else 0) or start > end:
+            raise ValueError(f"cron字段超出范围: {text}")
+        values.update(range(start, end + 1, step))
+    if high == 6 and 7 in values:  # 周字段 7 也表示周日
+        values.discard(7)
+        values.add(0)
+    return values
+
+
+def parse_cron(expr):
+    """解析5段cron表达式，返回 (分, 时, 日, 月, 周, 日是否受限, 周是否受限)"""
+    parts = expr.split()
+    if len(parts) != 5:
+        raise ValueError(f"cron表达式应为5段: {expr}")
+    fields = [parse_cron_field(p, low, high) for p, (low, high) in zip(parts, CRON_RANGES)]
+    return (*fields, parts[2] != '*', parts[4] != '*')
+
+
+def _day_matches(cron, moment):
+    minutes, hours, days, months, weekdays, day_restricted, weekday_restricted = cron
+    day_ok = moment.day in days
+    weekday_ok = (moment.weekday() + 1) % 7 in weekdays
+    if day_restricted and weekday_restricted:
+        return day_ok or weekday_ok  # 与标准cron一致：日和周都限定时满足其一即可
+    return day_ok and weekday_ok
+
+
+def next_run(cron, after):
+    """after 之后（不含）下一个满足cron的整分钟"""
+    minutes, hours, days, months = cron[:4]
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = after + timedelta(days=366 * 4)
+    while moment < limit:
+        if moment.month not in months:
+            moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+        elif not _day_matches(cron, moment):
+            moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+        elif moment.hour not in hours:
+            moment = moment.replace(minute=0) + timedelta(hours=1)
+        elif moment.minute not in minutes:
+            moment += timedelta(minutes=1)
+        else:
+            return moment
+    raise ValueError("cron表达式没有可用的执行时间")
+
+
+# ---------- 浏览器会话池 ----------
+class Session:
+    """一个已登录的浏览器"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.last_used = time.time()
+        self.logins = 1
+
+
+class SessionPool:
+    """最多保持 size 个已登录浏览器；取用时按需检查会话，过期才重新登录
+
+    浏览器来自预热的 BrowserPool：首次登录和浏览器损坏后的替换都不用等冷启动
+    """
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self.browsers = BrowserPool(size).start()
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with span('session.wait') as waited:
+            with self._cond:
+                while not self._idle and self._created >= self.size:
+                    self._cond.wait()
+                if self._idle:
+                    session = self._idle.pop()
+                else:
+                    self._created += 1
+                    session = None
+            waited['new_session'] = session is None
+
+        try:
+            if session is None:
+                session = Session(self._login_new())
+            else:
+                self._ensure_logged_in(session)
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        return session
+
+    def _login_new(self):
+        driver = self.browsers.lease()
+        if login(driver) is None:
+            self.browsers.give_back(driver, broken=True)
+            raise RuntimeError("登录失败")
+        return driver
+
+    def _ensure_logged_in(self, session):
+        if time.time() - session.last_used < SESSION_CHECK_AFTER:
+            return
+        with span('session.check') as checked:
+            try:
+                with get_governor().request():
+                    session.driver.get(SESSION_CHECK_URL)
+                    time.sleep(2)
+                expired = 'login' in session.driver.current_url.lower()
+                alive = True
+            except Exception as e:
+                log(f"[会话] 浏览器不可用，换一个: {e}")
+                expired = True
+                alive = False
+            checked['expired'] = expired
+        if not expired:
+            return
+        if not alive:
+            self.browsers.give_back(session.driver, broken=True)
+            session.driver = self._login_new()
+        else:
+            log("[会话] 登录已过期，重新登录")
+            if login(session.driver) is None:
+                self.browsers.give_back(session.driver, broken=True)
+                raise RuntimeError("重新登录失败")
+        session.logins += 1
+
+    def release(self, session, broken=False):
+        """归还会话；broken 时关闭浏览器，下次取用时重新创建"""
+        if broken:
+            self.browsers.give_back(session.driver, broken=True)
+        with self._cond:
+            if broken:
+                self._created -= 1
+            else:
+                session.last_used = time.time()
+                self._idle.append(session)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        self.browsers.close()
+        for session in idle:
+            self.browsers.give_back(session.driver, broken=True)
+
+
+# ---------- 任务 ----------
+def load_activity_ids():
+    """数据库中已有的活动ID"""
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT act_id FROM activities")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def job_students_full(driver):
+    import crawl_students
+    return len(crawl_students.crawl_all_pages(driver) or [])
+
+
+def job_activities_incremental(driver):
+    """从最新一页开始，翻到整页都是已入库的活动为止"""
+    import crawl_activities
+    known = load_activity_ids()
+    crawled = crawl_activities.crawl_recent_pages(
+        driver, lambda acts: all(a.get('actId') in known for a in acts))
+    return sum(1 for a in crawled if a.get('actId') not in known)
+
+
+def job_open_activities(driver):
+    """刷新尚未结束（或刚结束）的活动，翻到整页都已结束为止"""
+    import crawl_activities
+    cutoff = (time.time() - OPEN_ACTIVITY_GRACE) * 1000
+    crawled = crawl_activities.crawl_recent_pages(
+        driver, lambda acts: all((a.get('endTime') or 0) < cutoff for a in acts))
+    return len(crawled)
+
+
+def job_lookups(driver):
+    import crawl_lookups
+    cache = crawl_lookups.refresh_lookups(driver, force=True)
+    return sum(len(info.get('data') or []) for info in cache.get('lists', {}).values())
+
+
+# 任务名 -> (函数, 指标里的实体名)
+JOB_FUNCTIONS = {
+    'students_full': (job_students_full, 'students'),
+    'activities_incremental': (job_activities_incremental, 'activities'),
+    'open_activities': (job_open_activities, 'activities'),
+    'lookups': (job_lookups, 'lookups'),
+}
+
+
+# ---------- 调度 ----------
+class Scheduler:
+    """按cron表达式调度任务；同一任务上一次还没结束时跳过本次"""
+
+    def __init__(self, jobs=JOBS, pool=None, status_file=STATUS_FILE):
+        self.pool = pool or SessionPool()
+        self.status_file = status_file
+        self.jobs = {}
+        for name, expr, jitter in jobs:
+            if name not in JOB_FUNCTIONS:
+                raise ValueError(f"未知任务: {name}")
+            self.jobs[name] = {
+                'cron': parse_cron(expr),
+                'jitter': jitter,
+                'status': {'schedule': expr, 'state': 'idle', 'next_run': None, 'runs': 0, 'failures': 0,
+                           'last_start': None, 'last_end': None, 'last_duration_s': None,
+                           'last_rows': None, 'last_error': None},
+            }
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _schedule_next(self, name, now):
+        job = self.jobs[name]
+        when = next_run(job['cron'], now) + timedelta(seconds=random.uniform(0, job['jitter']))
+        job['next'] = when
+        job['status']['next_run'] = when.isoformat(timespec='seconds')
+
+    def status(self):
+        with self._lock:
+            return {
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+                'browsers': self.pool._created,
+                'jobs': {name: dict(job['status']) for name, job in self.jobs.items()},
+            }
+
+    def _save_status(self):
+        status = self.status()
+        tmp_path = self.status_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(status, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.status_file)
+
+    def run_job(self, name):
+        """在当前线程执行一次任务（取会话 -> 执行 -> 归还）"""
+        func, entity = JOB_FUNCTIONS[name]
+        status = self.jobs[name]['status']
+        with self._lock:
+            status.update(state='running', last_start=datetime.now().isoformat(timespec='seconds'))
+        self._save_status()
+        log(f"[任务] {name} 开始", job=name)
+
+        started = time.perf_counter()
+        session = None
+        broken = False
+        rows = None
+        error = None
+        metrics.install(entity)
+        try:
+            session = self.pool.acquire()
+            with span(f'job.{name}') as job_span:
+                rows = func(session.driver)
+                job_span['rows'] = rows
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            broken = session is not None and not _driver_alive(session.driver)
+            traceback.print_exc()
+        finally:
+            if session is not None:
+                self.pool.release(session, broken=broken)
+            metrics.finish(entity, success=error is None)
+
+        duration = time.perf_counter() - started
+        with self._lock:
+            status.update(state='idle', runs=status['runs'] + 1, last_end=datetime.now().isoformat(timespec='seconds'),
+                          last_duration_s=round(duration, 1), last_rows=rows, last_error=error)
+            if error:
+                status['failures'] += 1
+        self._save_status()
+        log(f"[任务] {name} {'失败: ' + error if error else '完成'}，用时 {duration:.1f}s，{rows} 条",
+            job=name, ok=error is None, rows=rows, duration_s=round(duration, 1))
+        return error is None
+
+    def run_forever(self):
+        now = datetime.now()
+        for name in self.jobs:
+            self._schedule_next(name, now)
+        self._save_status()
+        for name, job in self.jobs.items():
+            log(f"    {name:<24} {job['status']['schedule']:<18} 下次 {job['status']['next_run']}")
+
+        while not self._stop.is_set():
+            now = datetime.now()
+            for name, job in self.jobs.items():
+                if job['next'] > now:
+                    continue
+                self._schedule_next(name, now)
+                if job['status']['state'] == 'running':
+                    log(f"[任务] {name} 上一次仍在运行，跳过本次", job=name)
+                    continue
+                thread = threading.Thread(target=self.run_job, args=(name,), name=f"job-{name}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._threads = [t for t in self._threads if t.is_alive()]
+            earliest = min(job['next'] for job in self.jobs.values())
+            self._stop.wait(max(1.0, min(60.0, (earliest - datetime.now()).total_seconds())))
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self.pool.close()
+
+
+def _driver_alive(driver):
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def serve_status(scheduler, port, host='127.0.0.1'):
+    """后台线程提供 /status（任务状态JSON）和 /metrics"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path == '/status':
+                payload = json.dumps(scheduler.status(), ensure_ascii=False, indent=2).encode('utf-8')
+                content_type = 'application/json; charset=utf-8'
+            elif path == '/metrics':
+                payload = metrics.render().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def print_status(path=STATUS_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        print(f"没有状态文件: {path}")
+        return
+    print(f"更新时间: {status['updated_at']}, 浏览器: {status['browsers']}")
+    for name, job in status['jobs'].items():
+        print(f"  {name:<24} {job['state']:<8} 运行 {job['runs']} 次, 失败 {job['failures']} 次, "
+              f"上次 {job['last_end'] or '-'} ({job['last_rows']} 条), 下次 {job['next_run']}")
+        if job['last_error']:
+            print(f"      最近错误: {job['last_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="爬虫守护进程")
+    parser.add_argument('--once', choices=list(JOB_FUNCTIONS), help='立即执行一次指定任务后退出')
+    parser.add_argument('--status', action='store_true', help='查看任务状态')
+    parser.add_argument('--port', type=int, default=STATUS_PORT, help='状态/指标HTTP端口')
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+        return 0
+
+    start_run('daemon')
+    scheduler = Scheduler([job for job in JOBS if not args.once or job[0] == args.once])
+    try:
+        if args.once:
+            return 0 if scheduler.run_job(args.once) else 1
+        if args.port:
+            serve_status(scheduler, args.port)
+            print(f"状态: http://127.0.0.1:{args.port}/status")
+        print("=" * 60)
+        print("爬虫守护进程已启动 (Ctrl+C 退出)")
+        print("=" * 60)
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止...")
+    finally:
+        scheduler.stop()
+        end_run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
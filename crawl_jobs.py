@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取任务的 asyncio 编排
+一次爬取会话里的每个实体（学生、活动）拆成 pages / writes 两个任务，整个会话再加一个 exports 任务，
+一起运行（_run_tasks：任一任务出错时取消其余任务并等它们收尾），之间用 asyncio.Queue 按页传递数据：
+  - pages: 翻页读取。浏览器调用在 AsyncDriver 的单个线程里执行（selenium 的 driver 不能多线程共用）
+  - writes: 写库。写入函数在会话共用的有界线程池里逐页执行，每个实体按读取顺序提交（汇总表增量依赖写入顺序）
+  - exports: 各实体已提交的页逐页追加到各自的 JSON 文件并 flush
+翻页等待、写库提交和文件写入互相重叠；写库队列有上限，写库跟不上时翻页会等待。
+合并爬取（crawl all）只登录一次，学生和活动在同一浏览器的两个标签页里同时翻页
+（查找表随活动列表在活动标签页里刷新），总耗时接近较慢的那个实体。
+Ctrl-C 时停止翻页：正在读的页读完，已读到的页照常写库，已提交的页都写进 JSON 文件（文件保持完整）。
+python crawl_jobs.py [students activities]  登录一次，合并爬取
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from instrumentation import span, log, start_run, end_run, summary
+import metrics
+
+# ============ 配置 ============
+IO_WORKERS = 4  # 写库、写文件共用的线程数
+QUEUE_PAGES = 3  # 每个实体等待写库的页数上限，超过时翻页等待
+EXPORTS = {  # 实体 -> (爬虫模块, 导出文件, 去重键)
+    'students': ('crawl_students', "students_data.json", 'code'),
+    'activities': ('crawl_activities', "activities_data.json", 'actId'),
+}
+# ==============================
+
+_DONE = object()  # 队列结束标记
+
+
+class AsyncDriver:
+    """driver 调用的异步包装：所有调用在同一个专用线程里按顺序执行"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='driver')
+
+    def call(self, func, *args, **kwargs):
+        """在浏览器线程里执行 func(driver, *args, **kwargs)，返回 asyncio Future"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, partial(func, self.driver, *args, **kwargs))
+
+    def get(self, url):
+        return self.call(lambda driver: driver.get(url))
+
+    def run_script(self, script, *args):
+        from cdp_transport import run_script
+        return self.call(run_script, script, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+async def _run_tasks(*coroutines):
+    """同时运行若干 (名称, 协程)，全部完成后返回
+
+    任一任务出错时取消其余任务，等它们收尾后抛出该错误；
+    自身被取消时同样等所有任务收尾（效果同 asyncio.TaskGroup，Python 3.8 起可用）
+    """
+    loop = asyncio.get_running_loop()
+    tasks = [loop.create_task(coroutine, name=name) for name, coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _in_entity(entity, func, *args, **kwargs):
+    """在线程池里执行时把区间指标记到 entity 名下"""
+    with metrics.bound(entity):
+        return func(*args, **kwargs)
+
+
+class CrawlPipeline:
+    """一个实体的 pages / writes 任务
+
+    crawl_all_pages(driver, sink=pipeline) 在浏览器线程里调用 write() 交出每页数据，
+    并在每页开始前检查 stopped
+
+    Args:
+        crawler: 爬虫模块（crawl_students / crawl_activities），写库时取它的 save_batch_to_mysql
+        entity: 'students' / 'activities'
+    """
+
+    def __init__(self, crawler, entity):
+        self.crawler = crawler
+        self.entity = entity
+        _, self.export_file, self.key = EXPORTS[entity]
+        self.pages = 0
+        self.queued = 0
+        self.saved = 0
+        self.exported = 0
+        self.result = None
+        self.complete = False  # 爬虫读完所有页（没有放弃、没有剩下的死信页）时设为 True
+        self.error = None
+        self.session = None
+        self._writes = None
+
+    # ---------- 浏览器线程调用 ----------
+
+    @property
+    def stopped(self):
+        return self.session.stopped or self.error is not None
+
+    def write(self, rows):
+        """交出一页数据（写库队列满时等待），返回排队的行数"""
+        if not rows:
+            return 0
+        asyncio.run_coroutine_threadsafe(self._writes.put(list(rows)), self.session.loop).result()
+        self.pages += 1
+        self.queued += len(rows)
+        return len(rows)
+
+    # ---------- 事件循环里的任务 ----------
+
+    async def crawl(self, adriver):
+        """翻页任务：爬虫出错只记在本实体上，不影响同一会话里的其他实体"""
+        self._writes = asyncio.Queue(QUEUE_PAGES)
+        try:
+            self.result = await self.session.wait(
+                adriver.call(partial(_in_entity, self.entity, self.crawler.crawl_all_pages), sink=self))
+        except Exception as e:
+            self.error = e
+            log(f"    [{self.entity}] 爬取异常: {e}", entity=self.entity, error=str(e))
+        finally:
+            await self._writes.put(_DONE)
+
+    async def write_loop(self):
+        """逐页写库；写库出错后停止本实体的翻页，剩下的页只出队不再写入"""
+        session = self.session
+        while True:
+            rows = await session.wait(asyncio.ensure_future(self._writes.get()))
+            if rows is _DONE:
+                break
+            if self.error:
+                continue
+            try:
+                self.saved += await session.wait(
+                    session.blocking(_in_entity, self.entity, self.crawler.save_batch_to_mysql, rows))
+            except Exception as e:
+                self.error = e
+                log(f"    [{self.entity}] 写库出错，停止爬取: {e}", entity=self.entity, error=str(e))
+                continue
+            await session.exports.put((self, rows))
+        # 所有页写完后关闭本次的历史批次（目前只有学生记录历史）
+        finish = getattr(self.crawler, 'finish_snapshot', None)
+        if finish:
+            complete = self.complete and not self.error and not session.stopped
+            try:
+                await session.wait(session.blocking(_in_entity, self.entity, finish, complete))
+            except Exception as e:
+                log(f"    [{self.entity}] 关闭历史批次出错: {e}", entity=self.entity, error=str(e))
+
+    def export_rows(self, handle, rows, seen):
+        with span('export.flush', rows=len(rows)) as flushed:
+            count = 0
+            for row in rows:
+                key = row.get(self.key)
+                if key in seen:
+                    continue
+                seen.add(key)
+                handle.write(",\n" if self.exported + count else "\n")
+                handle.write(json.dumps(row, ensure_ascii=False, default=str))
+                count += 1
+            handle.flush()
+            flushed['new'] = count
+        return count
+
+    def report(self):
+        state = "出错" if self.error else "已中断" if self.session.stopped else "完成"
+        log(f"\n[{self.entity} {state}] 读取 {self.pages} 页 {self.queued} 条, 写库 {self.saved} 条, "
+            f"导出 {self.exported} 条到 {self.export_file}",
+            entity=self.entity, pages=self.pages, rows=self.queued, saved=self.saved, exported=self.exported)
+
+
+class CrawlSession:
+    """一次登录里同时进行的若干实体爬取：共用写库线程池和导出任务
+
+    Args:
+        pipelines: [CrawlPipeline]，每个实体一个
+    """
+
+    def __init__(self, pipelines):
+        self.pipelines = pipelines
+        for pipeline in pipelines:
+            pipeline.session = self
+        self.loop = None
+        self.exports = None
+        self._io = None
+        self._stop = threading.Event()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def stop(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            log("\n    正在停止：读完当前页后不再翻页，已读取的数据继续写库和导出...")
+
+    async def wait(self, future):
+        """等 future 完成；期间被取消（Ctrl-C 或其他任务出错）只停止翻页，不丢下已开始的工作"""
+        while True:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    raise
+                self.stop()
+
+    def blocking(self, func, *args, **kwargs):
+        return self.loop.run_in_executor(self._io, partial(func, *args, **kwargs))
+
+    async def _pipeline(self, pipeline, adriver):
+        """一个实体的翻页与写库（写库任务结束后通知导出任务）"""
+        try:
+            await _run_tasks((f'pages-{pipeline.entity}', pipeline.crawl(adriver)),
+                             (f'writes-{pipeline.entity}', pipeline.write_loop()))
+        finally:
+            await self.exports.put((pipeline, _DONE))
+
+    async def _export_loop(self):
+        """各实体已提交的页追加到 <导出文件>.part，实体结束时补上 ']' 并替换正式文件"""
+        files = {}
+        try:
+            for pipeline in self.pipelines:
+                temp = pipeline.export_file + ".part"
+                handle = await self.blocking(open, temp, "w", encoding="utf-8")
+                files[pipeline] = (handle, temp, set())
+                await self.wait(self.blocking(handle.write, "["))
+            while files:
+                pipeline, rows = await self.wait(asyncio.ensure_future(self.exports.get()))
+                handle, temp, seen = files[pipeline]
+                if rows is not _DONE:
+                    pipeline.exported += await self.wait(self.blocking(pipeline.export_rows, handle, rows, seen))
+                    continue
+                del files[pipeline]
+                await self.wait(self.blocking(self._close_export, handle, temp, pipeline.export_file))
+        finally:
+            for handle, temp, _ in files.values():
+                self._close_export(handle, temp, None)
+
+    @staticmethod
+    def _close_export(handle, temp, path):
+        handle.write("\n]\n")
+        handle.close()
+        if path:
+            os.replace(temp, path)
+
+    async def run(self, drivers):
+        """每个实体用各自的 driver（同一会话的不同标签页）爬取，全部结束后返回 {实体: 记录}"""
+        self.loop = asyncio.get_running_loop()
+        self.exports = asyncio.Queue()
+        self._io = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='crawl-io')
+        adrivers = [AsyncDriver(driver) for driver in drivers]
+        try:
+            await _run_tasks(('exports', self._export_loop()),
+                             *((pipeline.entity, self._pipeline(pipeline, adriver))
+                               for pipeline, adriver in zip(self.pipelines, adrivers)))
+        finally:
+            for adriver in adrivers:
+                adriver.close()
+            self._io.shutdown(wait=False)
+            for pipeline in self.pipelines:
+                pipeline.report()
+        return {pipeline.entity: pipeline.result for pipeline in self.pipelines}
+
+
+def run_crawl(crawler, entity, driver):
+    """单个实体的全量爬取（同步入口，Ctrl-C 时收尾后抛出 KeyboardInterrupt）
+
+    Returns:
+        list: 爬到的记录
+    """
+    pipeline = CrawlPipeline(crawler, entity)
+    asyncio.run(CrawlSession([pipeline]).run([driver]))
+    if pipeline.error:
+        raise pipeline.error
+    return pipeline.result
+
+
+def crawl_session(driver, entities=('students', 'activities')):
+    """在已登录的会话里给每个实体开一个标签页同时爬取
+
+    Returns:
+        dict: {实体: 记录}，出错的实体为 None
+    """
+    import importlib
+    from browser_pool import open_tabs
+
+    tabs = open_tabs(driver, len(entities))
+    pipelines = [CrawlPipeline(importlib.import_module(EXPORTS[entity][0]), entity) for entity in entities]
+    return asyncio.run(CrawlSession(pipelines).run(tabs))
+
+
+def main(entities=('students', 'activities')):
+    """登录一次，合并爬取；返回退出码"""
+    from main import login
+
+    start_run('crawl_all')
+    for entity in entities:
+        metrics.install(entity)
+    metrics.bind(None)
+    print("=" * 60)
+    print(f"第二课堂合并爬取: {' + '.join(entities)}")
+    print("=" * 60)
+
+    driver = login()
+    if not driver:
+        print("登录失败，无法继续")
+        for entity in entities:
+            metrics.finish(entity, success=False)
+        end_run()
+        return 1
+
+    start = time.perf_counter()
+    results = {}
+    try:
+        results = crawl_session(driver, entities)
+    except KeyboardInterrupt:
+        print("\n\n用户中断，已读取的页已写入数据库并导出（见上方汇总）")
+    finally:
+        print(f"\n合并爬取用时 {time.perf_counter() - start:.1f}s")
+        driver.quit()
+        for entity in entities:
+            metrics.finish(entity, bool(results.get(entity)))
+        summary()
+        end_run()
+    return 0 if results and all(results.values()) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="登录一次，在同一浏览器的多个标签页里同时爬取")
+    parser.add_argument('entities', nargs='*', choices=list(EXPORTS), default=list(EXPORTS))
+    args = parser.parse_args()
+    sys.exit(main(tuple(args.entities)))
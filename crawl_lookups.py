@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查找表数据爬虫
+读取活动页面Vue状态中的 organizationes / xieban / options 列表，
+写入独立的数据表，并缓存到本地文件（带内容哈希和有效期）
+活动分类在 options 里（id 与活动的 classId 对应）；同一页面上的 classifies 只有“全部”一项，不读取
+"""
+
+import os
+import time
+import json
+import pymysql
+
+from governor import get_governor
+
+# ============ 配置 ============
+ACTIVITY_URL = "https://2ketangpc.svtcc.edu.cn/communist/activityDown?oto=0"
+CACHE_FILE = "lookup_cache.json"  # 本地缓存文件
+CACHE_TTL = 24 * 3600  # 缓存有效期（秒），过期后才会去页面比对哈希
+LOOKUP_KEYS = ('organizationes', 'xieban', 'options')
+
+# MySQL数据库配置
+DB_CONFIG = {
+    'host': '10.5.80.8',
+    'user': 'root',
+    'password': '123456',
+    'database': '2ketang',
+    'charset': 'utf8mb4'
+}
+# ==============================
+
+
+# 在浏览器端计算每个列表的哈希，只有哈希与缓存不同的列表才把完整数据传回
+LOOKUP_SCRIPT = """
+var keys = arguments[0];
+var known = arguments[1] || {};
+function fnv(s) {
+    var h = 0x811c9dc5;
+    for (var i = 0; i < s.length; i++) {
+        h ^= s.charCodeAt(i);
+        h = Math.imul(h, 0x01000193);
+    }
+    return (h >>> 0).toString(16);
+}
+function isRecordList(list) {
+    // options 这类通用名字也可能是下拉框等组件自己的状态，只接受带 id 的普通对象列表
+    var first = list[0];
+    return first && typeof first === 'object' && !first._isVue && ('id' in first || 'organizationId' in first);
+}
+function findLookups(el, found) {
+    if (el.__vue__) {
+        var data = el.__vue__.$data || {};
+        for (var i = 0; i < keys.length; i++) {
+            var k = keys[i];
+            if (!found[k] && Array.isArray(data[k]) && data[k].length > 0 && isRecordList(data[k])) {
+                found[k] = data[k];
+            }
+        }
+    }
+    for (var j = 0; j < el.children.length; j++) {
+        findLookups(el.children[j], found);
+    }
+    return found;
+}
+var found = findLookups(document.body, {});
+var result = {};
+for (var k in found) {
+    var text = JSON.stringify(found[k]);
+    var hash = fnv(text) + '-' + found[k].length;
+    result[k] = {hash: hash, len: found[k].length};
+    if (known[k] !== hash) {
+        result[k].data = JSON.parse(text);
+    }
+}
+return result;
+"""
+
+
+def load_cache(path=CACHE_FILE):
+    """读取本地缓存，不存在或损坏时返回空缓存"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if isinstance(cache, dict) and 'lists' in cache:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'fetched_at': 0, 'lists': {}}
+
+
+def save_cache(cache, path=CACHE_FILE):
+    """写入本地缓存（先写临时文件再替换，避免中断时留下半个文件）"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def cache_is_fresh(cache, ttl=CACHE_TTL):
+    """缓存是否非空且仍在有效期内"""
+    if not cache['lists']:
+        return False
+    return time.time() - cache.get('fetched_at', 0) < ttl
+
+
+def fetch_changed_lookups(driver, cache):
+    """从页面读取列表哈希，只取回哈希变化的列表
+
+    Returns:
+        dict: {key: {'hash', 'len', 'data'}}，只包含发生变化的列表
+    """
+    known = {k: v.get('hash') for k, v in cache['lists'].items()}
+    result = driver.execute_script(LOOKUP_SCRIPT, list(LOOKUP_KEYS), known) or {}
+    changed = {}
+    for key, info in result.items():
+        if 'data' in info:
+            changed[key] = info
+    return changed
+
+
+def init_lookup_tables(cursor):
+    """创建查找表（不存在时才创建，不删除已有数据）"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS lookup_organizations (
+        id INT PRIMARY KEY COMMENT '组织ID',
+        name VARCHAR(200) NOT NULL COMMENT '组织名称',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='组织列表(organizationes)'
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS lookup_xieban (
+        organization_id INT PRIMARY KEY COMMENT '组织ID',
+        organization_name VARCHAR(200) NOT NULL COMMENT '组织名称',
+        type TINYINT COMMENT '组织类型',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='协办组织列表(xieban)'
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS lookup_classifies (
+        id INT PRIMARY KEY COMMENT '分类ID',
+        name VARCHAR(100) NOT NULL COMMENT '分类名称',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='活动分类列表(options)'
+    """)
+
+
+def _lookup_rows(key, items):
+    """把页面列表转换成对应表的行，跳过没有ID的项（如“全部”）"""
+    rows = []
+    for item in items:
+        if key == 'xieban':
+            if item.get('organizationId') in ('', None):
+                continue
+            rows.append((item.get('organizationId'), item.get('organizationName') or '', item.get('type')))
+        else:
+            if item.get('id') in ('', None):
+                continue
+            rows.append((item.get('id'), item.get('name') or ''))
+    return rows
+
+
+LOOKUP_TABLES = {
+    'organizationes': ("lookup_organizations",
+                       "INSERT INTO lookup_organizations (id, name) VALUES (%s, %s)"),
+    'xieban': ("lookup_xieban",
+               "INSERT INTO lookup_xieban (organization_id, organization_name, type) VALUES (%s, %s, %s)"),
+    'options': ("lookup_classifies",
+                   "INSERT INTO lookup_classifies (id, name) VALUES (%s, %s)"),
+}
+
+
+def save_lookups_to_mysql(changed):
+    """把变化的列表整表替换写入MySQL（同一事务内先删后插）"""
+    if not changed:
+        return 0
+
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    total = 0
+    try:
+        init_lookup_tables(cursor)
+        for key, info in changed.items():
+            table, insert_sql = LOOKUP_TABLES[key]
+            rows = _lookup_rows(key, info['data'])
+            cursor.execute(f"DELETE FROM {table}")
+            if rows:
+                cursor.executemany(insert_sql, rows)
+            total += len(rows)
+            print(f"    [查找表] {table}: 写入 {len(rows)} 条")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return total
+
+
+def refresh_lookups(driver, force=False, cache_path=CACHE_FILE):
+    """刷新查找表缓存
+
+    缓存在有效期内直接返回；否则在当前会话里读取页面上的列表哈希，
+    只有哈希变化的列表才会被取回并写入数据库。
+
+    Args:
+        driver: 已登录的WebDriver
+        force: 忽略有效期，强制比对哈希
+
+    Returns:
+        dict: 最新的缓存内容
+    """
+    cache = load_cache(cache_path)
+    if not force and cache_is_fresh(cache):
+        print("    [查找表] 本地缓存有效，跳过")
+        return cache
+
+    with get_governor().request():
+        if ACTIVITY_URL.split('?')[0] not in driver.current_url:
+            driver.get(ACTIVITY_URL)
+            time.sleep(3)
+        changed = fetch_changed_lookups(driver, cache)
+    if changed:
+        save_lookups_to_mysql(changed)
+        for key, info in changed.items():
+            cache['lists'][key] = {'hash': info['hash'], 'data': info['data']}
+    else:
+        print("    [查找表] 列表未变化，无需重新写入")
+
+    cache['fetched_at'] = time.time()
+    save_cache(cache, cache_path)
+    return cache
+
+
+def build_lookup_maps(cache):
+    """把缓存转换成 ID -> 名称 的内存字典"""
+    lists = cache.get('lists', {})
+    organizations = {}
+    for item in lists.get('organizationes', {}).get('data', []):
+        if item.get('id') not in ('', None):
+            organizations[item['id']] = item.get('name')
+    xieban = {}
+    for item in lists.get('xieban', {}).get('data', []):
+        if item.get('organizationId') not in ('', None):
+            xieban[item['organizationId']] = item.get('organizationName')
+    classifies = {}
+    for item in lists.get('options', {}).get('data', []):
+        if item.get('id') not in ('', None):
+            classifies[item['id']] = item.get('name')
+    return {'organizations': organizations, 'xieban': xieban, 'classifies': classifies}
+
+
+def load_lookup_maps(cache_path=CACHE_FILE):
+    """只读本地缓存构建内存字典（不访问网页和数据库）"""
+    return build_lookup_maps(load_cache(cache_path))
+
+
+def resolve_activity(act, maps):
+    """用查找表补全活动中缺失的组织名称和分类名称"""
+    if not maps:
+        return act
+    if not act.get('orgName') and act.get('orgId') not in ('', None):
+        name = maps['xieban'].get(act['orgId']) or maps['organizations'].get(act['orgId'])
+        if name:
+            act['orgName'] = name
+    if not act.get('className') and act.get('classId') not in ('', None):
+        name = maps['classifies'].get(act['classId'])
+        if name:
+            act['className'] = name
+    return act
+
+
+def main():
+    from main import login
+
+    print("=" * 60)
+    print("第二课堂查找表爬虫")
+    print("=" * 60)
+
+    driver = login()
+    if not driver:
+        print("登录失败，无法继续")
+        return
+
+    try:
+        cache = refresh_lookups(driver, force=True)
+        for key in LOOKUP_KEYS:
+            info = cache['lists'].get(key)
+            if info:
+                print(f"    {key}: {len(info['data'])} 条, 哈希 {info['hash']}")
+            else:
+                print(f"    {key}: 页面上未找到")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
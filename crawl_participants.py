@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+活动报名/签到名单爬虫（未完成，目前只能用 --discover 找接口）
+按 activities 表里的 act_id 逐个取活动详情接口的名单，写入 activity_participants 表：
+  - 详情请求在已登录的页面里用 fetch 发出（共用登录会话的 Cookie / 令牌），
+    每次脚本调用处理一批活动，页面内最多 DETAIL_WORKERS 个请求同时进行，并发数随 governor 的上限缩放；
+  - 名单哈希在浏览器端计算，与上次相同的只传回哈希，不传数据也不写库；
+    结束已久、结束后已经抓过的活动直接跳过；
+  - 名单按批写库（同一事务先删该批活动的旧名单再插入），写库在后台线程进行，与下一批请求重叠；
+  - 每批提交后把已完成的活动记进检查点，中断后重新运行从检查点继续。
+站点的活动名单接口还没有确认，DETAIL_API 为空时爬虫不登录、直接退出。先用 --discover 登录后
+在浏览器里手动打开一个活动的名单，列出页面发出的请求，把名单接口填进 DETAIL_API（活动ID写成 {actId}）。
+DETAIL_SCRIPT 也只在模拟站点上验证过数据流（FakeDriver 用 Python 代答），还没有在真实浏览器里执行过；
+第一批请求全部失败、或连续 MAX_FAILED_BATCHES 批全部失败时停止，不会把所有活动都请求一遍。
+python crawl_participants.py --discover       找出名单接口
+python crawl_participants.py [--all] [--restart]
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pymysql
+
+from cdp_transport import run_script
+from governor import get_governor, MAX_INFLIGHT
+from id_coverage import IdRuns
+from instrumentation import span, traced, log, start_run, end_run, summary
+
+# ============ 配置 ============
+ACTIVITY_URL = "https://2ketangpc.svtcc.edu.cn/communist/activityDown?oto=0"
+# 活动详情（报名/签到名单）接口，相对站点根路径，活动ID写成 {actId}；
+# 尚未确认，用 --discover 找出活动名单页实际发出的请求后填写
+DETAIL_API = None
+TOKEN_STORAGE_KEY = None  # 接口要求请求头令牌时，localStorage/sessionStorage 里令牌的键名
+TOKEN_HEADER = "Authorization"
+DETAIL_WORKERS = 8  # 页面内同时进行的详情请求上限
+DETAIL_BATCH = 40  # 每次脚本调用处理的活动数
+MAX_FAILED_BATCHES = 3  # 连续这么多批请求全部失败时停止（第一批全部失败立即停止）
+WRITE_BATCH = 2000  # 名单每批写入的条数（凑够后提交）
+FROZEN_AFTER = 7 * 24 * 3600  # 结束超过该秒数、且结束后抓过名单的活动视为不再变化
+STATE_FILE = "participant_hashes.json"  # 每个活动上次的名单哈希和抓取时间
+CHECKPOINT_FILE = "participants_checkpoint.json"
+
+# MySQL数据库配置
+DB_CONFIG = {
+    'host': '10.5.80.8',
+    'user': 'root',
+    'password': '123456',
+    'database': '2ketang',
+    'charset': 'utf8mb4'
+}
+# ==============================
+
+
+# 页面内的有界并发池：workers 个 Promise 依次从 ids 取活动发请求；
+# 名单取响应里第一个对象数组，哈希与 known 相同时只返回哈希
+DETAIL_SCRIPT = """
+var args = %s;
+function fetchParticipants(args) {
+    var headers = {};
+    if (args.tokenKey) {
+        var token = localStorage.getItem(args.tokenKey) || sessionStorage.getItem(args.tokenKey);
+        if (token) headers[args.tokenHeader] = token;
+    }
+    function fnv(s) {
+        var h = 0x811c9dc5;
+        for (var i = 0; i < s.length; i++) {
+            h ^= s.charCodeAt(i);
+            h = Math.imul(h, 0x01000193);
+        }
+        return (h >>> 0).toString(16);
+    }
+    function findList(value) {
+        if (Array.isArray(value)) return value;
+        if (!value || typeof value !== 'object') return null;
+        for (var k in value) {
+            if (Array.isArray(value[k])) return value[k];
+        }
+        for (var k in value) {
+            var found = findList(value[k]);
+            if (found) return found;
+        }
+        return null;
+    }
+    var result = {};
+    var next = 0;
+    function worker() {
+        if (next >= args.ids.length) return Promise.resolve();
+        var id = args.ids[next++];
+        return fetch(args.api.replace('{actId}', id), {credentials: 'include', headers: headers})
+            .then(function(resp) {
+                if (!resp.ok) throw new Error('HTTP ' + resp.status);
+                return resp.json();
+            })
+            .then(function(body) {
+                var list = findList(body);
+                if (!list) throw new Error('响应中没有名单');
+                var hash = fnv(JSON.stringify(list)) + '-' + list.length;
+                result[id] = {hash: hash, len: list.length};
+                if (args.known[id] !== hash) result[id].data = list;
+            }, function(e) {
+                result[id] = {error: String(e)};
+            })
+            .then(worker);
+    }
+    var pool = [];
+    for (var i = 0; i < Math.min(args.workers, args.ids.length); i++) pool.push(worker());
+    return Promise.all(pool).then(function() { return result; });
+}
+return fetchParticipants(args);
+"""
+
+
+def _load_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _save_json(data, path):
+    """先写临时文件再替换，避免中断时留下半个文件"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _pick(row, *keys):
+    for key in keys:
+        if row.get(key) not in ('', None):
+            return row[key]
+    return None
+
+
+def _ms_to_datetime(value):
+    if isinstance(value, (int, float)) and value > 0:
+        return datetime.fromtimestamp(value / 1000)
+    return value or None
+
+
+def participant_values(act_id, row):
+    """名单里的一条转换成表的一行；接口字段名不确定，常见写法都认，原始数据另存一列"""
+    student_id = _pick(row, 'userId', 'studentId', 'stuId', 'id')
+    code = _pick(row, 'userCode', 'studentCode', 'code', 'stuCode')
+    return (
+        act_id,
+        str(code or student_id or ''),
+        student_id,
+        code,
+        _pick(row, 'userName', 'studentName', 'name', 'realName'),
+        _pick(row, 'applyStatus', 'status', 'auditStatus'),
+        _ms_to_datetime(_pick(row, 'signInTime', 'signTime', 'checkInTime')),
+        _ms_to_datetime(_pick(row, 'signOutTime', 'checkOutTime')),
+        _pick(row, 'hours', 'getHours', 'hour'),
+        json.dumps(row, ensure_ascii=False, default=str),
+    )
+
+
+def init_participant_table(cursor):
+    """创建名单表（不存在时才创建，不删除已有数据）"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS activity_participants (
+        act_id INT NOT NULL COMMENT '活动ID',
+        student_key VARCHAR(64) NOT NULL COMMENT '学号，没有学号时为学生ID',
+        student_id INT COMMENT '学生ID',
+        student_code VARCHAR(50) COMMENT '学号',
+        name VARCHAR(100) COMMENT '姓名',
+        apply_status TINYINT COMMENT '报名状态',
+        sign_in_time DATETIME COMMENT '签到时间',
+        sign_out_time DATETIME COMMENT '签退时间',
+        hours DECIMAL(5,2) COMMENT '获得学时',
+        raw JSON COMMENT '接口原始数据',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+        PRIMARY KEY (act_id, student_key),
+        INDEX idx_student_code (student_code)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='活动报名/签到名单'
+    """)
+
+
+@traced('db.write', rows_from_result=True)
+def save_participants(lists):
+    """整批替换若干活动的名单: lists = {act_id: [名单行]}，同一事务内先删后插；返回写入条数"""
+    if not lists:
+        return 0
+    rows = [participant_values(act_id, row) for act_id, items in lists.items() for row in items]
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        init_participant_table(cursor)
+        placeholders = ', '.join(['%s'] * len(lists))
+        cursor.execute(f"DELETE FROM activity_participants WHERE act_id IN ({placeholders})", list(lists))
+        if rows:
+            cursor.executemany("""
+            INSERT INTO activity_participants (
+                act_id, student_key, student_id, student_code, name, apply_status,
+                sign_in_time, sign_out_time, hours, raw
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE apply_status = VALUES(apply_status), sign_in_time = VALUES(sign_in_time),
+                sign_out_time = VALUES(sign_out_time), hours = VALUES(hours), raw = VALUES(raw)
+            """, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return len(rows)
+
+
+def load_targets():
+    """activities 表里的活动: [(act_id, 结束时间戳或 None)]，新活动在前"""
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT act_id, end_time FROM activities ORDER BY act_id DESC")
+        return [(act_id, end.timestamp() if end else None) for act_id, end in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def fetch_details(driver, ids, known, workers):
+    """在页面里并发请求一批活动的名单: {act_id: {'hash', 'len', 'data'?} 或 {'error'}}"""
+    args = {'ids': ids, 'known': {str(i): known[i] for i in ids if i in known}, 'workers': workers,
+            'api': DETAIL_API, 'tokenKey': TOKEN_STORAGE_KEY, 'tokenHeader': TOKEN_HEADER}
+    result = run_script(driver, DETAIL_SCRIPT % json.dumps(args, ensure_ascii=False)) or {}
+    return {int(act_id): info for act_id, info in result.items()}
+
+
+class ParticipantCrawler:
+    """一次名单爬取：哈希状态、检查点和后台写库
+
+    Args:
+        driver: 已登录的 WebDriver（停在站点的任意页面，fetch 需要同源）
+        full: True 时忽略“结束已久”的跳过规则，所有活动都请求一遍（哈希相同的仍不写库）
+    """
+
+    def __init__(self, driver, full=False, state_file=STATE_FILE, checkpoint_file=CHECKPOINT_FILE):
+        self.driver = driver
+        self.full = full
+        self.state_file = state_file
+        self.checkpoint_file = checkpoint_file
+        self.state = {int(k): v for k, v in _load_json(state_file, {}).items()}  # act_id -> [哈希, 抓取时间]
+        checkpoint = _load_json(checkpoint_file, None)
+        self.done = IdRuns(checkpoint['done']) if checkpoint else IdRuns()
+        self.started = checkpoint['started'] if checkpoint else time.time()
+        self.resumed = checkpoint is not None
+        self.lists = {}  # 待写入: act_id -> 名单
+        self.buffered = 0
+        self.pending = None  # (写库 Future, 这批的 act_id 和哈希)
+        self.failed = {}
+        self.stats = {'requested': 0, 'unchanged': 0, 'changed': 0, 'frozen': 0, 'written': 0}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='participants-db')
+
+    def _frozen(self, act_id, end_time):
+        """结束已久，且上次抓取在结束之后"""
+        previous = self.state.get(act_id)
+        return (not self.full and previous is not None and end_time is not None
+                and time.time() - end_time > FROZEN_AFTER and previous[1] > end_time)
+
+    def plan(self, targets):
+        """需要请求的活动ID（跳过检查点里已完成的和结束已久的）"""
+        ids = []
+        for act_id, end_time in targets:
+            if act_id in self.done:
+                continue
+            if self._frozen(act_id, end_time):
+                self.stats['frozen'] += 1
+                continue
+            ids.append(act_id)
+        return ids
+
+    def save_checkpoint(self):
+        _save_json({'started': self.started, 'done': self.done.runs()}, self.checkpoint_file)
+        _save_json(self.state, self.state_file)
+
+    def _finish_write(self):
+        """等上一批写库完成，把这批活动记为完成并保存检查点"""
+        if not self.pending:
+            return
+        future, hashes = self.pending
+        self.pending = None
+        self.stats['written'] += future.result()
+        now = time.time()
+        for act_id, hash_value in hashes.items():
+            self.state[act_id] = [hash_value, now]
+            self.done.add(act_id)
+        self.save_checkpoint()
+
+    def flush(self, hashes):
+        """把缓冲的名单交给后台线程写库（上一批写完才提交下一批，保证检查点只记已提交的）"""
+        self._finish_write()
+        if not self.lists:
+            return
+        lists, self.lists, self.buffered = self.lists, {}, 0
+        batch_hashes = {act_id: hashes.pop(act_id) for act_id in lists}
+        self.pending = (self._writer.submit(save_participants, lists), batch_hashes)
+
+    def run(self, targets):
+        ids = self.plan(targets)
+        total = len(ids)
+        print(f"\n[名单] 共 {len(targets)} 个活动，需请求 {total} 个"
+              f"（检查点已完成 {len(self.done)}，结束已久跳过 {self.stats['frozen']}）"
+              + ("，从上次中断处继续" if self.resumed else ""))
+        governor = get_governor()
+        known = {act_id: entry[0] for act_id, entry in self.state.items()}
+        hashes = {}  # 已取回、等待写库的活动 -> 新哈希
+        failed_batches = 0
+        try:
+            for start in range(0, total, DETAIL_BATCH):
+                batch = ids[start:start + DETAIL_BATCH]
+                # 页面内并发数跟随 governor 的并发上限缩放
+                workers = max(1, DETAIL_WORKERS * governor.limit // MAX_INFLIGHT)
+                with span('detail.fetch', activities=len(batch), workers=workers) as fetched:
+                    ticket = governor.acquire()
+                    try:
+                        results = fetch_details(self.driver, batch, known, workers)
+                    except Exception as e:
+                        results = {act_id: {'error': str(e)} for act_id in batch}
+                    errors = sum(1 for act_id in batch if 'error' in results.get(act_id, {'error': 1}))
+                    governor.release(ticket, error=errors > len(batch) // 2)
+                    fetched.update(errors=errors)
+                self.stats['requested'] += len(batch)
+                # 整批都失败多半是接口地址或登录状态不对，继续请求只会让所有活动都失败
+                failed_batches = failed_batches + 1 if errors == len(batch) else 0
+                if failed_batches and (start == 0 or failed_batches >= MAX_FAILED_BATCHES):
+                    sample = next((results[i]['error'] for i in batch if i in results), '没有返回')
+                    raise RuntimeError(f"连续 {failed_batches} 批名单请求全部失败，停止爬取"
+                                       f"（检查 DETAIL_API 和登录状态）: {sample}")
+                now = time.time()
+                for act_id in batch:
+                    info = results.get(act_id) or {'error': '没有返回'}
+                    if 'error' in info:
+                        self.failed[act_id] = info['error']
+                    elif 'data' in info:
+                        self.failed.pop(act_id, None)
+                        self.lists[act_id] = info['data']
+                        self.buffered += len(info['data'])
+                        hashes[act_id] = info['hash']
+                        self.stats['changed'] += 1
+                    else:
+                        # 名单没变：不写库，直接记为完成
+                        self.failed.pop(act_id, None)
+                        self.state[act_id] = [info['hash'], now]
+                        self.done.add(act_id)
+                        self.stats['unchanged'] += 1
+                if self.buffered >= WRITE_BATCH:
+                    self.flush(hashes)
+                elif not self.pending:
+                    self.save_checkpoint()
+                log(f"    已请求 {min(start + DETAIL_BATCH, total)}/{total}，变化 {self.stats['changed']}，"
+                    f"未变 {self.stats['unchanged']}，失败 {len(self.failed)}",
+                    requested=self.stats['requested'], changed=self.stats['changed'], failed=len(self.failed))
+        finally:
+            # 正常结束和中断都把已取回的名单写完、保存检查点
+            try:
+                self.flush(hashes)
+                self._finish_write()
+            finally:
+                self._writer.shutdown(wait=True)
+                self.save_checkpoint()
+        if not self.failed:
+            if os.path.exists(self.checkpoint_file):
+                os.remove(self.checkpoint_file)
+        return self.stats
+
+    def report(self):
+        s = self.stats
+        print(f"\n[名单] 请求 {s['requested']} 个活动：变化 {s['changed']}，未变 {s['unchanged']}，"
+              f"结束已久跳过 {s['frozen']}，失败 {len(self.failed)}，写入 {s['written']} 条")
+        for act_id, error in list(self.failed.items())[:10]:
+            print(f"    活动 {act_id}: {error}")
+        if self.failed:
+            print(f"    检查点已保留，重新运行会只请求未完成的活动")
+
+
+# 列出页面里 XHR / fetch 请求的地址（Resource Timing），用于找出名单接口
+RESOURCE_SCRIPT = """
+return performance.getEntriesByType('resource')
+    .filter(function(e) { return e.initiatorType === 'xmlhttprequest' || e.initiatorType === 'fetch'; })
+    .map(function(e) { return e.name; });
+"""
+
+
+def discover_detail_api(driver):
+    """打开活动列表，等用户在浏览器里打开一个活动的报名/签到名单后，列出期间页面发出的接口请求"""
+    driver.get(ACTIVITY_URL)
+    time.sleep(3)
+    before = set(run_script(driver, RESOURCE_SCRIPT) or [])
+    input("\n在浏览器里打开任意一个活动的报名/签到名单，加载完成后按回车...")
+    requests = [url for url in run_script(driver, RESOURCE_SCRIPT) or [] if url not in before]
+    if not requests:
+        print("没有捕获到新的接口请求（名单若在新标签页打开，请改为在当前标签页打开后重试）")
+        return []
+    print("\n期间页面发出的接口请求（名单接口通常带活动ID）:")
+    for url in dict.fromkeys(requests):
+        print(f"    {url}")
+    print("\n把名单接口的路径填进 DETAIL_API，活动ID写成 {actId}，例如 /xxx/detail?actId={actId}")
+    return requests
+
+
+def crawl_participants(driver, full=False, restart=False):
+    """打开活动列表页（fetch 需要站点同源），按 activities 表爬取名单
+
+    Returns:
+        dict: 统计
+    """
+    if not DETAIL_API:
+        raise RuntimeError("DETAIL_API 还没有配置，先运行 python crawl_participants.py --discover 找出名单接口")
+    if restart and os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+    with get_governor().request(), span('page.navigate', url=ACTIVITY_URL):
+        driver.get(ACTIVITY_URL)
+        time.sleep(3)
+    crawler = ParticipantCrawler(driver, full=full)
+    try:
+        return crawler.run(load_targets())
+    finally:
+        crawler.report()
+
+
+def main(full=False, restart=False, discover=False):
+    from main import login
+
+    if not discover and not DETAIL_API:
+        print("活动名单接口尚未确认（DETAIL_API 为空），名单爬虫还不能使用；"
+              "先运行 --discover 找出接口填进 DETAIL_API")
+        return 1
+
+    start_run('crawl_participants')
+    print("=" * 60)
+    print("第二课堂活动名单爬虫")
+    print("=" * 60)
+
+    driver = login()
+    if not driver:
+        print("登录失败，无法继续")
+        end_run()
+        return 1
+
+    try:
+        if discover:
+            return 0 if discover_detail_api(driver) else 1
+        stats = crawl_participants(driver, full=full, restart=restart)
+        return 0 if stats else 1
+    except KeyboardInterrupt:
+        print("\n\n用户中断，已取回的名单已写库，检查点已保存")
+        return 1
+    except RuntimeError as e:
+        print(f"\n{e}")
+        return 1
+    finally:
+        driver.quit()
+        summary()
+        end_run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按 activities 表爬取活动报名/签到名单")
+    parser.add_argument('--all', action='store_true', help='结束已久的活动也重新请求（名单未变的仍不写库）')
+    parser.add_argument('--restart', action='store_true', help='丢弃上次未完成的检查点，从头开始')
+    parser.add_argument('--discover', action='store_true', help='列出打开活动名单时页面发出的请求，用于配置 DETAIL_API')
+    args = parser.parse_args()
+    raise SystemExit(main(full=args.all, restart=args.restart, discover=args.discover))
@@ -3,20 +3,32 @@
 """
 学生数据爬虫 - 支持翻页
 登录后爬取全部学生列表数据并保存到MySQL
+selenium / main.login 在用到时才导入，只用写库函数时不加载浏览器相关模块
 """
 
+import sys
 import time
 import json
+import argparse
 import pymysql
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from main import login
+from cdp_transport import run_script
+from adaptive_paging import PageSizeController, go_to_page, locate, page_heap_mb, payload_kb
+from id_coverage import IdCoverage, load_snapshot, REPAIR_MAX_PAGES
+from page_retry import PageRetry, session_lost, load_dead_pages, clear_dead_pages
+from governor import get_governor
+from instrumentation import span, traced, log, start_run, end_run, summary
+import metrics
+from summary_tables import (
+    reset_summary, fetch_existing_rows, new_changeset, record_change, apply_changes
+)
+from student_history import begin_crawl, finish_crawl, current_crawl, record_snapshots
 
 # ============ 配置 ============
 STUDENT_LIST_URL = "https://2ketangpc.svtcc.edu.cn/student/list?type=4"
-PAGE_SIZE = 2000  # 每页条数（网站最大支持2000条）
+PAGE_SIZE = 2000  # 每页条数上限（网站最大支持2000条），实际条数由 adaptive_paging 调整
 MAX_PAGES = None  # 最大爬取页数，None表示爬取全部（测试时设为5页）
+METRICS_PORT = None  # 爬取期间在该端口提供 /metrics，None表示只写 textfile
+PROFILE_DIR = "profiles"  # --profile 不带目录时的报告目录
 
 # MySQL数据库配置
 DB_CONFIG = {
@@ -29,27 +41,101 @@ DB_CONFIG = {
 # ==============================
 
 
-def get_page_info(driver):
-    """获取分页信息：总条数和总页数"""
-    try:
-        script = """
-        function findVueData(el) {
-            if (el.__vue__) {
-                var vm = el.__vue__;
-                var data = vm.$data || {};
-                if (data.total !== undefined) {
-                    return {total: data.total, pageSize: data.pageSize || 10, currentPage: data.currentPage || 1};
+# 提取脚本（经 cdp_transport.run_script 执行）
+PAGE_INFO_SCRIPT = """
+function findVueData(el) {
+    if (el.__vue__) {
+        var vm = el.__vue__;
+        var data = vm.$data || {};
+        if (data.total !== undefined) {
+            return {total: data.total, pageSize: data.pageSize || 10, currentPage: data.currentPage || 1};
+        }
+    }
+    for (var i = 0; i < el.children.length; i++) {
+        var result = findVueData(el.children[i]);
+        if (result) return result;
+    }
+    return null;
+}
+return findVueData(document.body);
+"""
+
+# 更全面的数据获取脚本，查找最大的学生数据数组
+PAGE_DATA_SCRIPT = """
+function findAllStudentData(el, results) {
+    results = results || [];
+    if (el.__vue__) {
+        var vm = el.__vue__;
+        var data = vm.$data || {};
+        for (var key in data) {
+            if (Array.isArray(data[key]) && data[key].length > 0) {
+                var item = data[key][0];
+                if (item && item.code && item.name) {
+                    results.push({key: key, data: data[key], len: data[key].length});
                 }
             }
-            for (var i = 0; i < el.children.length; i++) {
-                var result = findVueData(el.children[i]);
-                if (result) return result;
+        }
+        // 也检查computed属性
+        if (vm._computedWatchers) {
+            for (var key in vm._computedWatchers) {
+                var val = vm[key];
+                if (Array.isArray(val) && val.length > 0) {
+                    var item = val[0];
+                    if (item && item.code && item.name) {
+                        results.push({key: key, data: val, len: val.length});
+                    }
+                }
             }
-            return null;
         }
-        return findVueData(document.body);
-        """
-        info = driver.execute_script(script)
+    }
+    for (var i = 0; i < el.children.length; i++) {
+        findAllStudentData(el.children[i], results);
+    }
+    return results;
+}
+var all = findAllStudentData(document.body, []);
+// 返回最大的数组
+if (all.length === 0) return null;
+var max = all[0];
+for (var i = 1; i < all.length; i++) {
+    if (all[i].len > max.len) max = all[i];
+}
+return max.data;
+"""
+
+DATA_COUNT_SCRIPT = """
+function findMaxStudentCount(el, maxCount) {
+    maxCount = maxCount || 0;
+    if (el.__vue__) {
+        var vm = el.__vue__;
+        var data = vm.$data || {};
+        for (var key in data) {
+            if (Array.isArray(data[key]) && data[key].length > 0) {
+                var item = data[key][0];
+                if (item && item.code && item.name) {
+                    if (data[key].length > maxCount) {
+                        maxCount = data[key].length;
+                    }
+                }
+            }
+        }
+    }
+    for (var i = 0; i < el.children.length; i++) {
+        var childMax = findMaxStudentCount(el.children[i], maxCount);
+        if (childMax > maxCount) maxCount = childMax;
+    }
+    return maxCount;
+}
+return findMaxStudentCount(document.body, 0);
+"""
+
+
+def get_page_info(driver):
+    """获取分页信息：总条数和总页数"""
+    from selenium.webdriver.common.by import By
+
+    try:
+        info = run_script(driver, PAGE_INFO_SCRIPT)
         if info:
             return info
     except:
@@ -65,71 +151,33 @@ def get_page_info(driver):
         return None
 
 
+@traced('page.extract', rows_from_result=True)
 def get_current_page_data(driver, prev_first_id=None, max_wait=15):
     """从Vue组件获取当前页的学生数据，确保数据已更新"""
-    # 更全面的数据获取脚本，查找最大的学生数据数组
-    script = """
-    function findAllStudentData(el, results) {
-        results = results || [];
-        if (el.__vue__) {
-            var vm = el.__vue__;
-            var data = vm.$data || {};
-            for (var key in data) {
-                if (Array.isArray(data[key]) && data[key].length > 0) {
-                    var item = data[key][0];
-                    if (item && item.code && item.name) {
-                        results.push({key: key, data: data[key], len: data[key].length});
-                    }
-                }
-            }
-            // 也检查computed属性
-            if (vm._computedWatchers) {
-                for (var key in vm._computedWatchers) {
-                    var val = vm[key];
-                    if (Array.isArray(val) && val.length > 0) {
-                        var item = val[0];
-                        if (item && item.code && item.name) {
-                            results.push({key: key, data: val, len: val.length});
-                        }
-                    }
-                }
-            }
-        }
-        for (var i = 0; i < el.children.length; i++) {
-            findAllStudentData(el.children[i], results);
-        }
-        return results;
-    }
-    var all = findAllStudentData(document.body, []);
-    // 返回最大的数组
-    if (all.length === 0) return null;
-    var max = all[0];
-    for (var i = 1; i < all.length; i++) {
-        if (all[i].len > max.len) max = all[i];
-    }
-    return max.data;
-    """
-    
     # 如果有上一页的第一条ID，等待数据变化
     if prev_first_id:
         print(f"    等待数据更新 (上一页首条ID: {prev_first_id})...")
-        for i in range(max_wait):
-            data = driver.execute_script(script)
-            if data and len(data) > 0:
-                current_first_id = data[0].get('id')
-                if current_first_id != prev_first_id:
-                    print(f"    数据已更新 (新首条ID: {current_first_id}, 共{len(data)}条)")
-                    return data
-                else:
-                    print(f"    等待中... ({i+1}/{max_wait}) 首条ID仍为 {current_first_id}, 当前{len(data)}条")
-            time.sleep(1)
-        print(f"    警告: 等待{max_wait}秒后数据仍未更新，强制读取")
+        with span('page.wait_data', prev_first_id=prev_first_id) as waited:
+            for i in range(max_wait):
+                waited['polls'] = i + 1
+                data = run_script(driver, PAGE_DATA_SCRIPT)
+                if data and len(data) > 0:
+                    current_first_id = data[0].get('id')
+                    if current_first_id != prev_first_id:
+                        print(f"    数据已更新 (新首条ID: {current_first_id}, 共{len(data)}条)")
+                        return data
+                    else:
+                        log(f"    等待中... ({i+1}/{max_wait}) 首条ID仍为 {current_first_id}, 当前{len(data)}条", poll=i + 1)
+                time.sleep(1)
+            log(f"    警告: 等待{max_wait}秒后数据仍未更新，强制读取", polls=max_wait)
     
-    return driver.execute_script(script)
+    return run_script(driver, PAGE_DATA_SCRIPT)
 
 
+@traced('page.set_size')
 def set_page_size(driver, size):
     """设置每页显示条数：输入数量 → 按回车键触发加载"""
+    from selenium.webdriver.common.by import By
     from selenium.webdriver.common.keys import Keys
     
     try:
@@ -160,36 +208,14 @@ def set_page_size(driver, size):
 
 def get_data_count(driver):
     """获取当前页面加载的数据条数（返回最大的学生数据数组长度）"""
-    script = """
-    function findMaxStudentCount(el, maxCount) {
-        maxCount = maxCount || 0;
-        if (el.__vue__) {
-            var vm = el.__vue__;
-            var data = vm.$data || {};
-            for (var key in data) {
-                if (Array.isArray(data[key]) && data[key].length > 0) {
-                    var item = data[key][0];
-                    if (item && item.code && item.name) {
-                        if (data[key].length > maxCount) {
-                            maxCount = data[key].length;
-                        }
-                    }
-                }
-            }
-        }
-        for (var i = 0; i < el.children.length; i++) {
-            var childMax = findMaxStudentCount(el.children[i], maxCount);
-            if (childMax > maxCount) maxCount = childMax;
-        }
-        return maxCount;
-    }
-    return findMaxStudentCount(document.body, 0);
-    """
-    return driver.execute_script(script)
+    return run_script(driver, DATA_COUNT_SCRIPT)
 
 
+@traced('page.navigate')
 def click_next_page(driver):
     """点击下一页按钮"""
+    from selenium.webdriver.common.by import By
+
     # 下一页按钮XPath（不带/i，点击button本身）
     NEXT_BTN_XPATH = '//*[@id="app"]/div/div/div[1]/section/div[6]/div[2]/div[2]/button[2]'
     
@@ -214,6 +240,7 @@ def click_next_page(driver):
         return False
 
 
+@traced('db.init')
 def init_database():
     """初始化数据库和表"""
     conn = pymysql.connect(
@@ -263,18 +290,43 @@ def init_database():
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
         INDEX idx_id (id),
         INDEX idx_name (name),
-        INDEX idx_class_id (class_id)
+        INDEX idx_class_id (class_id),
+        INDEX idx_grade_name (grade_name),
+        INDEX idx_college_name (college_name),
+        INDEX idx_class_name (class_name),
+        INDEX idx_campus_name (campus_name)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='第二课堂学生信息表'
     """
     cursor.execute(create_table_sql)
     print("[DB] 已重建students表")
     
+    # 基础表重建后汇总表同步清零
+    reset_summary(cursor, 'students')
+    # 学分/总分历史按爬取批次记录，之后写入的学生都记在这个批次下
+    crawl_id = begin_crawl(cursor)
+    
     conn.commit()
     cursor.close()
     conn.close()
-    print("[DB] 数据库和表初始化完成")
+    print(f"[DB] 数据库和表初始化完成，历史批次 {crawl_id}")
+
+
+def finish_snapshot(complete):
+    """结束本次爬取的历史批次（没有进行中的批次时什么都不做）"""
+    if current_crawl() is None:
+        return
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        crawl = finish_crawl(cursor, complete)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    print(f"    历史批次 {crawl['id']}: {crawl['students']} 名学生中 {crawl['changed']} 名学分/总分有变化")
 
 
+@traced('db.write', rows_from_result=True)
 def save_batch_to_mysql(students):
     """批量保存学生数据到MySQL"""
     if not students:
@@ -299,6 +351,11 @@ def save_batch_to_mysql(students):
     )
     """
     
+    # 写入前读取旧行，用于计算汇总表的增量
+    existing = fetch_existing_rows(cursor, 'students', [student.get('code') for student in students])
+    changes = new_changeset()
+    written = []
+    
     success_count = 0
     fail_count = 0
     for student in students:
@@ -344,6 +401,15 @@ def save_batch_to_mysql(students):
                 student.get('leaveFailNum', 0) or 0
             )
             cursor.execute(insert_sql, values)
+            record_change(changes, 'students', existing, {
+                'code': student.get('code'),
+                'id': student.get('id'),
+                'grade_name': student.get('gradeName'),
+                'college_name': student.get('collegeName'),
+                'class_name': student.get('className'),
+                'campus_name': student.get('campusName'),
+            })
+            written.append(student)
             success_count += 1
         except Exception as e:
             fail_count += 1
@@ -351,6 +417,8 @@ def save_batch_to_mysql(students):
             if fail_count <= 3:
                 print(f"    写入失败: {student.get('code')} - {e}")
     
+    apply_changes(cursor, 'students', changes)
+    record_snapshots(cursor, written)
     conn.commit()
     cursor.close()
     conn.close()
@@ -362,11 +430,122 @@ def save_batch_to_mysql(students):
 
 
 
-def crawl_all_pages(driver):
-    """爬取所有页面的学生数据"""
+def reposition(driver, size, offset, total):
+    """切换到每页 size 条并跳到第 offset 行所在的页（total 为列表总条数，用于判断最后一页的行数）
+
+    Returns:
+        tuple: (该页开头已读过、需要跳过的行数, 跳页前显示的首条ID；已在目标页时为 None)
+    """
+    page_no, skip = locate(offset, size)
+    print(f"    切换到每页 {size} 条，从第 {offset + 1} 行（第 {page_no} 页）继续")
+    set_page_size(driver, size)
+    # 切换后显示的可能是第一页（满页），也可能已是目标页；目标页是最后一页时不满 size 条
+    expected = (size, min(size, total - (page_no - 1) * size))
+    with span('page.wait_data', page_size=size) as waited:
+        for i in range(20):
+            time.sleep(1)
+            waited['polls'] = i + 1
+            if get_data_count(driver) in expected:
+                break
+    info = get_page_info(driver) or {}
+    if page_no == 1 or info.get('currentPage') == page_no:
+        return skip, None
+    shown = run_script(driver, PAGE_DATA_SCRIPT) or [{}]
+    with span('page.navigate', page=page_no):
+        go_to_page(driver, page_no)
+    return skip, shown[0].get('id')
+
+
+def recover_page(driver, size, offset, total):
+    """重试前的恢复：会话掉线时重新登录（失败时抛出 RuntimeError）并回到学生列表，再定位到第 offset 行所在的页"""
+    if session_lost(driver):
+        from main import login
+
+        print("    会话已失效，重新登录...")
+        if login(driver) is None:
+            # login 失败时已关闭浏览器（合并爬取时是这个标签页），不能再翻页
+            raise RuntimeError("重新登录失败，停止爬取")
+        with span('page.navigate', url=STUDENT_LIST_URL):
+            driver.get(STUDENT_LIST_URL)
+            time.sleep(3)
+    return reposition(driver, size, offset, total)
+
+
+def repair_missing(driver, coverage, size, save=None):
+    """按ID覆盖记录找出缺失的ID区间，只重新读取它们可能所在的页并补写入库；
+    死信队列里的页（本次和以前爬取时重试用完的）整页重新读取；save 为写入函数，默认直接写库
+
+    Returns:
+        list: 补读到的学生
+    """
+    save = save or save_batch_to_mysql
+    ranges = coverage.missing_ranges(load_snapshot('students'))
+    coverage.report(ranges)
+    # 死信页按当前每页条数拆成对齐的页；pending: 死信记录的行偏移 -> 还没读到的页
+    pending = {}
+    for record in load_dead_pages('students'):
+        rows = range(record['offset'], record['offset'] + record['size'], size)
+        pending.setdefault(record['offset'], set()).update(row - row % size for row in rows)
+    dead_offsets = set().union(*pending.values())
+    offsets = sorted(set(coverage.suspect_offsets(ranges, size)) | dead_offsets)
+    if not offsets:
+        return []
+    if len(offsets) > REPAIR_MAX_PAGES:
+        print(f"    可疑页 {len(offsets)} 个，超过 {REPAIR_MAX_PAGES} 页，请重新全量爬取")
+        coverage.complete = False
+        return []
+    print(f"\n[修补] {len(ranges)} 个缺失区间、{len(pending)} 个死信页，重新读取 {len(offsets)} 页...")
+    recovered = []
+    with span('page.repair', ranges=len(ranges), pages=len(offsets)) as repaired:
+        for index, offset in enumerate(offsets):
+            page_no = offset // size + 1
+            with get_governor().request():
+                info = get_page_info(driver) or {}
+                prev_first_id = None
+                if info.get('currentPage') != page_no:
+                    shown = run_script(driver, PAGE_DATA_SCRIPT) or [{}]
+                    prev_first_id = shown[0].get('id')
+                    go_to_page(driver, page_no)
+                rows = get_current_page_data(driver, prev_first_id, max_wait=20) or []
+            if rows and offset in dead_offsets:
+                for waiting in pending.values():
+                    waiting.discard(offset)
+            missing = coverage.missing(ranges)
+            found = [r for r in rows if r.get('id') is not None and (
+                offset in dead_offsets and int(r['id']) not in coverage.seen
+                or any(start <= int(r['id']) <= end for start, end in missing))]
+            if found:
+                save(found)
+                coverage.recover(found)
+                recovered.extend(found)
+            log(f"    第 {page_no} 页: 补读 {len(found)} 条", page=page_no, recovered=len(found))
+            if not coverage.missing(ranges) and not dead_offsets.intersection(offsets[index + 1:]):
+                break
+        repaired['recovered'] = len(recovered)
+    clear_dead_pages('students', {offset for offset, waiting in pending.items() if not waiting})
+    if any(pending.values()):
+        coverage.complete = False
+    left = coverage.missing(ranges)
+    if left:
+        print(f"    仍有 {sum(end - start + 1 for start, end in left)} 个ID未找到（可能已被删除）")
+    return recovered
+
+
+def crawl_all_pages(driver, sink=None):
+    """爬取所有页面的学生数据
+
+    Args:
+        sink: crawl_jobs.CrawlPipeline；给出时每页交给 sink.write 异步写库和导出，
+              sink.stopped 时不再翻页。不给时直接写库，结束后导出 JSON
+    """
+    from browser_pool import set_resource_blocking
+
     print("\n[6] 访问学生列表页面...")
-    driver.get(STUDENT_LIST_URL)
-    time.sleep(3)
+    set_resource_blocking(driver, 'crawl')
+    governor = get_governor()
+    with governor.request(), span('page.navigate', url=STUDENT_LIST_URL):
+        driver.get(STUDENT_LIST_URL)
+        time.sleep(3)
     
     # 获取分页信息
     page_info = get_page_info(driver)
@@ -376,81 +555,161 @@ def crawl_all_pages(driver):
     else:
         print("[7] 无法获取总数，将持续爬取直到没有数据")
         total = 999999
+    total_known = page_info is not None
     
-    # 输入每页2000条并按回车触发加载
-    print(f"[8] 输入每页 {PAGE_SIZE} 条并按回车...")
-    set_page_size(driver, PAGE_SIZE)
-    
-    # 等待第一页数据加载完成
-    print("    等待第一页数据加载...")
-    for i in range(20):
-        time.sleep(1)
-        data_count = get_data_count(driver)
-        if data_count and data_count >= PAGE_SIZE * 0.9:
-            print(f"    第一页数据加载完成: {data_count} 条")
-            break
-        print(f"    加载中... ({i+1}/20) 当前: {data_count} 条")
-    
-    # 初始化数据库
-    init_database()
-    
-    all_students = []
-    total_saved = 0
-    page = 1
-    max_pages = MAX_PAGES or (total // PAGE_SIZE + 1)
-    prev_first_id = None  # 上一页第一条数据的ID，用于验证翻页成功
-    
-    print(f"\n[9] 开始爬取数据 (预计 {max_pages} 页)...")
-    
-    while page <= max_pages:
-        # 等待数据加载
-        time.sleep(2)
-        
-        # 获取当前页数据
-        if page == 1:
-            # 第一页直接读取
-            students = get_current_page_data(driver)
-        else:
-            # 后续页需要验证数据已更新（首条ID变化）
-            students = get_current_page_data(driver, prev_first_id, max_wait=20)
+    # 每页条数由控制器根据加载情况调整，从历史吞吐最高的档位开始
+    controller = PageSizeController('students', max_size=PAGE_SIZE)
+    size = controller.size
+    print(f"[8] 输入每页 {size} 条并按回车...")
+    ticket = governor.acquire()
+    try:
+        set_page_size(driver, size)
+    
+        # 等待第一页数据加载完成
+        print("    等待第一页数据加载...")
+        with span('page.wait_data', page=1) as waited:
+            for i in range(20):
+                time.sleep(1)
+                data_count = get_data_count(driver)
+                waited.update(polls=i + 1, rows=data_count or 0)
+                if data_count and data_count >= min(size, total) * 0.9:
+                    print(f"    第一页数据加载完成: {data_count} 条")
+                    break
+                print(f"    加载中... ({i+1}/20) 当前: {data_count} 条")
+    
+        # 初始化数据库
+        init_database()
+    
+        all_students = []
+        total_saved = 0
+        page = 1
+        offset = 0  # 已读取的行数；换档时按它计算新页码
+        skip = 0  # 当前页开头已读过的行数
+        retries = PageRetry('students')
+        max_pages = MAX_PAGES or (total // size + 1)
+        coverage = IdCoverage('students', 'id', total)
+        save = sink.write if sink else save_batch_to_mysql
+        prev_first_id = None  # 上一页第一条数据的ID，用于验证翻页成功
+    
+        print(f"\n[9] 开始爬取数据 (预计 {max_pages} 页)...")
+    
+        while page <= max_pages:
+            if sink and sink.stopped:
+                governor.release(ticket)
+                break
+            # 等待数据加载
+            time.sleep(2)
         
-        # 验证数据
-        if not students or len(students) == 0:
-            print(f"    第 {page} 页无数据，停止爬取")
-            break
+            # 获取当前页数据
+            failure = None
+            try:
+                if prev_first_id is None:
+                    # 第一页直接读取
+                    students = get_current_page_data(driver)
+                else:
+                    # 后续页需要验证数据已更新（首条ID变化）
+                    students = get_current_page_data(driver, prev_first_id, max_wait=20)
+            except Exception as e:
+                students, failure = None, f"读取出错: {e}"
+            load_seconds = ticket.elapsed
         
-        # 检查数据量
-        current_first_id = students[0].get('id') if students else None
+            # 验证数据：还没读够总数时的空页、等待后首条ID仍没变都算这一页失败
+            current_first_id = students[0].get('id') if students else None
+            at_end = not students and not failure and (not total_known or offset >= total)
+            if not students and not at_end:
+                failure = failure or '空页'
+            elif students and prev_first_id is not None and current_first_id == prev_first_id:
+                failure = '数据未更新'
+            governor.release(ticket, error=bool(failure))
+            if at_end:
+                print(f"    第 {page} 页无数据，停止爬取")
+                break
         
-        # 前15页必须是完整的2000条
-        if page <= 15 and len(students) < PAGE_SIZE:
-            print(f"    警告: 第 {page} 页数据不完整 ({len(students)}/{PAGE_SIZE})")
+            controller.observe(len(students or []), load_seconds, payload_kb(students), page_heap_mb(driver), bool(failure))
+            if failure:
+                # 降档后退避重试；重试次数用完的页进入死信队列，从下一页继续
+                size = controller.next_size(offset)
+                if retries.should_retry(offset, size, failure):
+                    with retries.backoff(offset):
+                        ticket = governor.acquire()
+                        skip, prev_first_id = recover_page(driver, size, offset, total)
+                elif retries.give_up:
+                    print(f"    连续 {retries.consecutive_dead} 页失败，停止爬取")
+                    break
+                else:
+                    offset += size
+                    page += 1
+                    if offset >= total:
+                        break
+                    ticket = governor.acquire()
+                    skip, prev_first_id = recover_page(driver, size, offset, total)
+                max_pages = MAX_PAGES or (page + (total - offset) // size)
+                continue
+            retries.succeeded(offset)
         
-        # 保存到数据库
-        saved = save_batch_to_mysql(students)
-        total_saved += saved
+            if len(students) < size and offset + len(students) < total:
+                print(f"    警告: 第 {page} 页数据不完整 ({len(students)}/{size})")
         
-        # 去重后添加到列表（用code学号去重）
-        existing_codes = {s.get('code') for s in all_students}
-        new_students = [s for s in students if s.get('code') not in existing_codes]
-        all_students.extend(new_students)
+            # 保存到数据库（跳过换档后与上一页重叠的行）
+            students = students[skip:]
+            coverage.add_page(offset, students)
+            saved = save(students)
+            total_saved += saved
+            offset += len(students)
         
-        print(f"    第 {page}/{max_pages} 页: 获取 {len(students)} 条, 新增 {len(new_students)} 条, 累计 {len(all_students)} 条, 首条ID: {current_first_id}")
+            # 去重后添加到列表（用code学号去重）
+            existing_codes = {s.get('code') for s in all_students}
+            new_students = [s for s in students if s.get('code') not in existing_codes]
+            all_students.extend(new_students)
         
-        # 记录当前页第一条数据的ID
-        prev_first_id = current_first_id
+            log(f"    第 {page}/{max_pages} 页: 获取 {len(students)} 条, 新增 {len(new_students)} 条, 累计 {len(all_students)} 条, 首条ID: {current_first_id}",
+                page=page, rows=len(students), new=len(new_students), total=len(all_students),
+                page_size=size, offset=offset, load_s=round(load_seconds, 2))
         
-        # 检查是否是最后一页（少于PAGE_SIZE条也继续写入，只是不再翻页）
-        if len(students) < PAGE_SIZE:
-            print(f"    当前页只有 {len(students)} 条，已到最后一页，数据已写入")
-            break
+            # 记录当前页第一条数据的ID
+            prev_first_id = current_first_id
         
-        # 点击下一页按钮跳转到下一页
-        page += 1
-        if page <= max_pages:
-            if not click_next_page(driver):
-                print("    无法翻页，停止爬取")
+            # 检查是否是最后一页（少于每页条数也继续写入，只是不再翻页）
+            if len(students) + skip < size or offset >= total:
+                print(f"    当前页只有 {len(students)} 条，已到最后一页，数据已写入")
                 break
+        
+            # 档位不变时点击下一页；换档时按偏移量跳到新档位对应的页
+            page += 1
+            if page <= max_pages:
+                ticket = governor.acquire()
+                new_size = controller.next_size(offset)
+                if new_size != size:
+                    size = new_size
+                    skip, prev_first_id = reposition(driver, size, offset, total)
+                    max_pages = MAX_PAGES or (page + (total - offset) // size)
+                elif click_next_page(driver):
+                    skip = 0
+                else:
+                    print("    点击下一页失败，按页码跳转")
+                    skip, prev_first_id = reposition(driver, size, offset, total)
+    except BaseException:
+        # recover_page / reposition 等抛出时归还手里的许可，不占着并发名额等 TICKET_TIMEOUT 过期
+        governor.release(ticket, error=True)
+        raise
+    # 正常结束时许可都已归还（再次 release 不起作用），翻页后没再读取就退出循环时在这里归还
+    governor.release(ticket)
+    
+    controller.summary()
+    retries.summary()
+    if retries.give_up:
+        # 连续死信后停止，后面的页没有读，快照要保留上次的ID
+        coverage.complete = False
+    if sink and sink.stopped:
+        # 中断时读到的ID不完整，不修补也不覆盖上次的快照
+        return all_students
+    all_students.extend(repair_missing(driver, coverage, size, save))
+    coverage.save()
+    if sink:
+        # 交给 sink 的页可能还没写完，历史批次由 crawl_jobs 在写库结束后按 sink.complete 关闭
+        sink.complete = coverage.complete
+        print(f"\n[10] 爬取完成! 内存中去重后: {len(all_students)} 条唯一记录")
+        return all_students
     
     # 查询数据库中的实际记录数
     try:
@@ -463,47 +722,83 @@ def crawl_all_pages(driver):
     except:
         db_count = "未知"
     
+    # 中途放弃、修补放弃或还有死信页没读到时，本批次记为不完整
+    finish_snapshot(complete=coverage.complete)
     print(f"\n[10] 爬取完成!")
     print(f"    内存中去重后: {len(all_students)} 条唯一记录")
     print(f"    数据库实际记录: {db_count} 条")
     
     # 保存到JSON文件
-    with open("students_data.json", "w", encoding="utf-8") as f:
-        json.dump(all_students, f, ensure_ascii=False, indent=2)
+    with span('export.flush', rows=len(all_students)):
+        with open("students_data.json", "w", encoding="utf-8") as f:
+            json.dump(all_students, f, ensure_ascii=False, indent=2)
     print(f"    数据已保存到 students_data.json")
     
     return all_students
 
 
-def main():
-    """主函数"""
+def main(profile_dir=None):
+    """主函数；profile_dir 不为空时开启性能分析"""
+    from main import login
+    from crawl_jobs import run_crawl
+
+    start_run('crawl_students')
+    metrics.install('students')
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
     print("=" * 60)
     print("第二课堂学生数据爬虫 - 支持翻页")
     print("=" * 60)
     
+    profiler = None
+    if profile_dir:
+        from profiling import CrawlProfiler
+        profiler = CrawlProfiler('students', profile_dir)
+        profiler.start()
+    
     # 登录
     driver = login()
     
     if not driver:
         print("登录失败，无法继续")
+        metrics.finish('students', success=False)
+        if profiler:
+            profiler.stop()
+        summary()
+        end_run()
         return
     
+    if profiler:
+        profiler.attach(driver)
+    
+    success = False
+    
     try:
-        # 爬取所有页面
-        students = crawl_all_pages(driver)
+        # 爬取所有页面：翻页、写库、导出由 crawl_jobs 的任务组并发执行
+        students = run_crawl(sys.modules[__name__], 'students', driver)
+        success = bool(students)
         
         if not students:
             print("\n未能获取学生数据")
         
     except KeyboardInterrupt:
-        print("\n\n用户中断，正在保存已爬取的数据...")
+        print("\n\n用户中断，已读取的页已写入数据库并导出到 students_data.json")
     except Exception as e:
         print(f"\n爬取异常: {e}")
     finally:
         print("\n等待3秒后关闭浏览器...")
         time.sleep(3)
         driver.quit()
+        metrics.finish('students', success)
+        if profiler:
+            profiler.stop()
+        summary()
+        end_run()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="爬取学生数据")
+    parser.add_argument('--profile', nargs='?', const=PROFILE_DIR, metavar='DIR',
+                        help=f'开启性能分析，报告写到该目录（默认 {PROFILE_DIR}）')
+    args = parser.parse_args()
+    main(profile_dir=args.profile)
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可编程的假 WebDriver
+实现 main.login、get_current_page_data、set_page_size、click_next_page、go_to_page 等用到的
+execute_script / find_element / ActionChains 接口，数据来自 mock_site 提供的本地HTTP接口
+"""
+
+import re
+import json
+import zlib
+import random
+import time
+
+from mock_site import MockSiteClient
+
+try:
+    from selenium.common.exceptions import NoSuchElementException
+    from selenium.webdriver.remote.webelement import WebElement as _ElementBase
+except ImportError:  # 不依赖selenium也能单独使用
+    class NoSuchElementException(Exception):
+        pass
+
+    _ElementBase = object
+
+LOGIN_URL = "https://2ketangpc.svtcc.edu.cn/login"
+HOME_URL = "https://2ketangpc.svtcc.edu.cn/home"
+ENTER_KEY = '\ue007'  # selenium Keys.ENTER
+CANVAS_SIZE = (310, 155)  # 验证码画布 CSS 宽高（与 gap_detector 一致）
+
+
+# 每个标签页各自的页面状态（登录状态、调用计数等整个会话共用）
+TAB_FIELDS = ('current_url', 'entity', 'page_no', 'page_size', 'total', 'data', 'typed')
+
+
+class _FakeSwitchTo:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def window(self, handle):
+        self._driver._switch_tab(handle)
+
+    def new_window(self, type_hint=None):
+        self._driver._new_tab()
+
+
+class FakeElement(_ElementBase):
+    """假页面元素，按角色响应点击和输入（继承WebElement以便ActionChains接受）"""
+
+    def __init__(self, driver, role, text=''):
+        self._parent = driver
+        self._id = f"fake-{role}"
+        self.tab = driver.current_window_handle  # 元素属于创建时的标签页
+        self.role = role
+        self._text = text
+        self.typed = ''
+
+    @property
+    def driver(self):
+        """经 _parent 调用（browser_pool.TabDriver 会把它换成标签页视图）"""
+        return self._parent
+
+    @property
+    def text(self):
+        return self._text
+
+    def is_displayed(self):
+        if self.role == 'dialog':
+            return self.driver.captcha_open
+        if self.role == 'mask':
+            return False
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def clear(self):
+        self.typed = ''
+
+    def send_keys(self, *values):
+        text = ''.join(str(v) for v in values)
+        if ENTER_KEY in text:
+            self.driver._on_enter(self)
+            text = text.replace(ENTER_KEY, '')
+        self.typed += text
+        self.driver.typed[self.role] = self.typed
+
+    def click(self):
+        self.driver._on_click(self)
+
+    @property
+    def size(self):
+        if self.role == 'canvas':
+            return {'width': CANVAS_SIZE[0], 'height': CANVAS_SIZE[1]}
+        return {'width': 0, 'height': 0}
+
+    @property
+    def screenshot_as_png(self):
+        """验证码画布：按当前 block_x 画一张合成验证码（gap_detector.synthetic_captcha）"""
+        if self.role != 'canvas':
+            raise NotImplementedError(f"FakeDriver 只提供验证码画布的截图，不支持 {self.role}")
+        return self.driver._captcha_png()
+
+
+class FakeDriver:
+    """模拟登录页、学生列表页、活动列表页的 WebDriver
+
+    Args:
+        base_url: mock_site 的HTTP地址
+        captcha_offset: 滑块真实需要的偏移（block_x + offset 才算成功）
+        captcha_noise: 每次验证码真实偏移的随机抖动（像素）
+        captcha_tolerance: 允许的误差（像素）
+        script_latency: 每次 execute_script 额外增加的延迟（秒），模拟 WebDriver 往返
+        hide_block_x: 读 block_x 的脚本返回 None（模拟站点隐藏该字段），登录改走画布截图定位
+    """
+
+    w3c = True
+
+    def __init__(self, base_url, captcha_offset=12, captcha_noise=0, captcha_tolerance=3,
+                 script_latency=0.0, seed=None, hide_block_x=False):
+        self.client = MockSiteClient(base_url)
+        self.rng = random.Random(seed)
+        self.captcha_offset = captcha_offset
+        self.captcha_noise = captcha_noise
+        self.captcha_tolerance = captcha_tolerance
+        self.script_latency = script_latency
+        self.hide_block_x = hide_block_x
+
+        self.current_url = 'about:blank'
+        self.title = ''
+        self.logged_in = False
+        self.captcha_open = False
+        self.block_x = None
+        self._required_offset = captcha_offset
+        self._drag = None
+        self._captcha_image = None  # (block_x, PNG)，同一张验证码只画一次
+
+        self.entity = None
+        self.page_no = 1
+        self.page_size = 10
+        self.total = 0
+        self.data = []
+        self.typed = {}
+        self.lookups = None
+
+        self.calls = {'execute_script': 0, 'cdp': 0, 'find_element': 0, 'get': 0, 'actions': 0}
+        self.captcha_attempts = 0
+        self.window_handles = ['main']
+        self.current_window_handle = 'main'
+        self.switch_to = _FakeSwitchTo(self)
+        self._tabs = {}  # 其他标签页的页面状态
+
+    # ---------- 导航 ----------
+    def get(self, url):
+        self.calls['get'] += 1
+        if not self.logged_in and 'login' not in url:
+            url = LOGIN_URL
+        self.current_url = url
+        if 'student/list' in url:
+            self.entity = 'students'
+        elif 'activityDown' in url:
+            self.entity = 'activities'
+        else:
+            self.entity = None
+        self.page_no = 1
+        self.page_size = 10
+        if self.entity:
+            self._load()
+
+    def _load(self):
+        self.total, self.data = self.client.fetch_page(self.entity, self.page_no, self.page_size)
+
+    # ---------- 标签页 ----------
+    def _switch_tab(self, handle):
+        if handle not in self.window_handles:
+            raise NoSuchElementException(f"no such window: {handle}")
+        if handle == self.current_window_handle:
+            return
+        self._tabs[self.current_window_handle] = {field: getattr(self, field) for field in TAB_FIELDS}
+        self.__dict__.update(self._tabs.pop(handle))
+        self.current_window_handle = handle
+
+    def _new_tab(self):
+        handle = f"tab{len(self.window_handles)}"
+        self.window_handles.append(handle)
+        self._tabs[handle] = {'current_url': 'about:blank', 'entity': None, 'page_no': 1, 'page_size': 10,
+                              'total': 0, 'data': [], 'typed': {}}
+        self._switch_tab(handle)
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def quit(self):
+        self.current_url = 'about:blank'
+
+    def close(self):
+        """关闭当前标签页；只剩一个时同 quit"""
+        handle = self.current_window_handle
+        if len(self.window_handles) == 1:
+            self.quit()
+            return
+        self.window_handles.remove(handle)
+        self._switch_tab(self.window_handles[0])
+        self._tabs.pop(handle, None)
+
+    def get_cookies(self):
+        return [{'name': 'JSESSIONID', 'value': 'fake'}] if self.logged_in else []
+
+    def delete_all_cookies(self):
+        self.logged_in = False
+
+    # ---------- 元素 ----------
+    def find_element(self, by=None, value=None):
+        self.calls['find_element'] += 1
+        value = value or ''
+        if 'login-input user' in value:
+            return FakeElement(self, 'username')
+        if 'pwd-after' in value:
+            return FakeElement(self, 'password')
+        if '@id="login"' in value:
+            return FakeElement(self, 'login_button')
+        if value == 'el-dialog__wrapper':
+            if not self.captcha_open:
+                raise NoSuchElementException(value)
+            return FakeElement(self, 'dialog')
+        if value == 'slide-verify-slider-mask-item':
+            return FakeElement(self, 'slider')
+        if value == 'slide-verify-refresh-icon':
+            return FakeElement(self, 'refresh')
+        if 'slideVerify canvas' in value:
+            if not self.captcha_open:
+                raise NoSuchElementException(value)
+            return FakeElement(self, 'canvas')
+        if self.entity and 'page-input' in value:
+            return FakeElement(self, 'page_input')
+        if self.entity and ('btn-next' in value or 'button[2]' in value):
+            return FakeElement(self, 'next')
+        if self.entity and 'el-pagination__total' in value:
+            return FakeElement(self, 'total', text=f"共 {self.total} 条")
+        raise NoSuchElementException(value)
+
+    def find_elements(self, by=None, value=None):
+        self.calls['find_element'] += 1
+        return []
+
+    def _check_tab(self, element):
+        """和真实浏览器一样，只能操作当前标签页里的元素"""
+        if element.tab != self.current_window_handle:
+            raise NoSuchElementException(f"element {element._id} is not in window {self.current_window_handle}")
+
+    def _on_click(self, element):
+        self._check_tab(element)
+        if element.role == 'login_button':
+            self._new_captcha()
+            self.captcha_open = True
+        elif element.role == 'refresh':
+            self._new_captcha()
+        elif element.role == 'next':
+            if self.page_no * self.page_size < self.total:
+                self.page_no += 1
+                self._load()
+
+    def _on_enter(self, element):
+        self._check_tab(element)
+        if element.role == 'page_input':
+            size = int(element.typed or 10)
+            self.page_size = max(1, size)
+            self.page_no = 1
+            self._load()
+
+    def _new_captcha(self):
+        # 缺口范围与 slide-verify 组件一致：[L+10, 宽度-(L+10)]，L = 42 + 2*10 + 3
+        self.block_x = self.rng.randint(75, CANVAS_SIZE[0] - 75)
+        self._required_offset = self.captcha_offset + self.rng.randint(-self.captcha_noise, self.captcha_noise)
+
+    def _captcha_png(self):
+        import io
+        import numpy as np
+        from PIL import Image
+        from gap_detector import synthetic_captcha
+
+        if not self.captcha_open or self.block_x is None:
+            raise NoSuchElementException("slideVerify canvas")
+        if self._captcha_image is None or self._captcha_image[0] != self.block_x:
+            rng = np.random.default_rng([self.captcha_attempts, self.block_x])
+            image, _ = synthetic_captcha(rng, *CANVAS_SIZE, x=self.block_x)
+            buffer = io.BytesIO()
+            Image.fromarray(image).save(buffer, format='PNG')
+            self._captcha_image = (self.block_x, buffer.getvalue())
+        return self._captcha_image[1]
+
+    # ---------- ActionChains ----------
+    def execute(self, command, params=None):
+        """处理 ActionChains 发出的 W3C actions 命令"""
+        self.calls['actions'] += 1
+        for device in (params or {}).get('actions', []):
+            if device.get('type') != 'pointer':
+                continue
+            for action in device.get('actions', []):
+                kind = action.get('type')
+                if kind == 'pointerDown':
+                    self._drag = 0
+                elif kind == 'pointerMove' and self._drag is not None:
+                    if action.get('origin', 'viewport') == 'pointer':
+                        self._drag += action.get('x', 0)
+                elif kind == 'pointerUp' and self._drag is not None:
+                    self._release(self._drag)
+                    self._drag = None
+        return {'value': None}
+
+    def _release(self, distance):
+        if not self.captcha_open or self.block_x is None:
+            return
+        self.captcha_attempts += 1
+        if abs(distance - (self.block_x + self._required_offset)) <= self.captcha_tolerance:
+            self.captcha_open = False
+            self.logged_in = True
+            self.current_url = HOME_URL
+        else:
+            self._new_captcha()
+
+    # ---------- 脚本 ----------
+    def execute_script(self, script, *args):
+        self.calls['execute_script'] += 1
+        if self.script_latency:
+            time.sleep(self.script_latency)
+        return self._answer(script, args)
+
+    def _answer(self, script, args=()):
+        """按脚本内容返回页面上的数据"""
+        if 'slideVerify' in script:
+            return self.block_x if self.captcha_open and not self.hide_block_x else None
+        if 'arguments[0].click()' in script and args:
+            args[0].click()
+            return None
+        if 'scrollIntoView' in script:
+            return None
+        if 'btn-next' in script:
+            return FakeElement(self, 'next') if self.entity else None
+        if 'findLookups' in script:
+            return self._lookup_result(args)
+        if 'fetchParticipants' in script:
+            return self._participant_result(json.loads(re.search(r'var args = (.*);', script).group(1)))
+        if not self.entity:
+            return None
+        if 'handleCurrentChange' in script:
+            # adaptive_paging.go_to_page：直接跳到指定页
+            self.page_no = int(re.search(r'handleCurrentChange\((\d+)\)', script).group(1))
+            self._load()
+            return self.page_no
+        if 'findVueData' in script or 'findPageInfo' in script:
+            return {'total': self.total, 'pageSize': self.page_size, 'currentPage': self.page_no}
+        if 'findMaxStudentCount' in script or 'return data.data.length;' in script:
+            return len(self.data) if self._matches(script) else 0
+        if 'findAllStudentData' in script or 'findActivityData' in script:
+            return [dict(r) for r in self.data] if self._matches(script) else None
+        return None
+
+    def execute_cdp_cmd(self, cmd, params):
+        """Network.* 直接忽略；Runtime.evaluate 按脚本内容应答，结果包成 CDP 的 returnByValue 格式"""
+        self.calls['cdp'] += 1
+        if cmd != 'Runtime.evaluate':
+            return {}
+        if self.script_latency:
+            time.sleep(self.script_latency)
+        value = self._answer(params['expression'])
+        if value is None:
+            return {'result': {'type': 'object', 'subtype': 'null', 'value': None}}
+        return {'result': {'type': 'object', 'value': value}}
+
+    def _matches(self, script):
+        """学生脚本只认学生数据，活动脚本只认活动数据"""
+        if 'Student' in script:
+            return self.entity == 'students'
+        return self.entity == 'activities'
+
+    def _lookup_result(self, args):
+        if self.entity != 'activities':
+            return {}
+        if self.lookups is None:
+            self.lookups = self.client.fetch_lookups()
+        keys = args[0] if args else list(self.lookups)
+        known = args[1] if len(args) > 1 else {}
+        result = {}
+        for key in keys:
+            items = self.lookups.get(key)
+            if not items:
+                continue
+            text = json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+            digest = f"{zlib.crc32(text.encode('utf-8')):x}-{len(items)}"
+            result[key] = {'hash': digest, 'len': len(items)}
+            if known.get(key) != digest:
+                result[key]['data'] = items
+        return result
+
+    def _participant_result(self, args):
+        """crawl_participants 的页面内并发请求：按 args 里的接口模板、workers 个线程取名单，哈希相同的不返回数据"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        def find_list(value):
+            # 与 DETAIL_SCRIPT 的 findList 相同：先找本层的数组，再逐层往下找
+            if isinstance(value, list):
+                return value
+            if not isinstance(value, dict):
+                return None
+            for item in value.values():
+                if isinstance(item, list):
+                    return item
+            for item in value.values():
+                found = find_list(item)
+                if found is not None:
+                    return found
+            return None
+
+        def fetch(act_id):
+            try:
+                items = find_list(self.client.fetch_participants(act_id, args['api']))
+            except Exception as e:
+                return act_id, {'error': str(e)}
+            if items is None:
+                return act_id, {'error': '响应中没有名单'}
+            text = json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+            digest = f"{zlib.crc32(text.encode('utf-8')):x}-{len(items)}"
+            info = {'hash': digest, 'len': len(items)}
+            if args['known'].get(str(act_id)) != digest:
+                info['data'] = items
+            return act_id, info
+
+        with ThreadPoolExecutor(max_workers=max(1, args['workers'])) as pool:
+            return {str(act_id): info for act_id, info in pool.map(fetch, args['ids'])}
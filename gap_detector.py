@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滑块缺口图像定位（block_x 读不到时的后备）
+验证码组件在背景图上把拼图形状填成 70% 白色，所以缺口比左右两侧明显更亮，
+四周是一圈由暗到亮、再由亮到暗的边缘。
+对整张图用 NumPy 一次算出：
+  边缘分  以 (y, x) 为左上角、边长 l 的方框：左/上边缘梯度之和 - 右/下边缘梯度之和
+  亮度分  以 (y, x) 为左上角的 l×l 方框平均亮度 - 左右相邻方框平均亮度
+两者相加取最大值的列即缺口左边缘，一张 310×155 的图几毫秒内完成
+
+python gap_detector.py --eval 500          用合成验证码评估准确率和耗时
+python gap_detector.py --eval 500 --scale 2 模拟高分屏截图（devicePixelRatio=2）
+python gap_detector.py captcha.png         定位一张截图里的缺口
+"""
+
+import sys
+import time
+import argparse
+
+import numpy as np
+
+# ============ 配置 ============
+CANVAS_WIDTH = 310  # 验证码画布 CSS 宽高（slide-verify 默认值）
+CANVAS_HEIGHT = 155
+SLIDER_L = 42  # 拼图方块边长
+SLIDER_R = 10  # 拼图凸起半径
+OVERLAY_ALPHA = 0.7  # 缺口填充的白色不透明度
+STROKE_OUTSET = 1  # 2 像素描边有 1 像素画在形状外，亮区比 block_x 向左多出这么多
+# ==============================
+
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def to_gray(image):
+    """PIL 图像或数组 -> float32 灰度数组"""
+    arr = np.asarray(image, dtype=np.float32)
+    if arr.ndim == 3:
+        arr = arr[..., :3] @ _LUMA
+    return arr
+
+
+def _box_sums(gray, size):
+    """积分图求所有 size×size 方框的和，结果 [y, x] 对应左上角 (y, x)"""
+    integral = np.zeros((gray.shape[0] + 1, gray.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(gray, axis=0), axis=1, out=integral[1:, 1:])
+    return (integral[size:, size:] - integral[:-size, size:]
+            - integral[size:, :-size] + integral[:-size, :-size])
+
+
+def gap_scores(image, css_width=None, piece=SLIDER_L):
+    """每个候选缺口位置的得分，返回 (scores[y, x], 起始列, 缩放比例)
+
+    scores[:, i] 对应缺口左边缘在图像第 起始列 + i 列
+    """
+    gray = to_gray(image)
+    if css_width and gray.shape[1] >= 2 * css_width:
+        # 高分屏截图先按整数倍平均缩小，在接近 CSS 分辨率上计算
+        factor = gray.shape[1] // css_width
+        height, width = gray.shape[0] // factor, gray.shape[1] // factor
+        gray = gray[:height * factor, :width * factor].reshape(height, factor, width, factor).mean(axis=(1, 3))
+    height, width = gray.shape
+    scale = width / css_width if css_width else 1.0
+    size = max(4, int(round(piece * scale)))
+    if width < 3 * size + 1 or height < size:
+        return None, size, scale
+
+    # 水平梯度沿列做长 size 的滑动和：column_run[y, x] = Σ gx[y:y+size, x]
+    gx = np.diff(gray, axis=1)
+    cumulative = np.zeros((height + 1, width - 1), dtype=np.float64)
+    np.cumsum(gx, axis=0, out=cumulative[1:])
+    column_run = cumulative[size:] - cumulative[:-size]
+    # 缺口左边缘在 x：gx[:, x-1] 为正；右边缘在 x+size：gx[:, x+size-1] 为负
+    edges = column_run[:, size - 1:width - 2 * size] - column_run[:, 2 * size - 1:width - size]
+
+    # 竖直梯度沿行做同样的滑动和：上边缘 gy[y-1] 为正，下边缘 gy[y+size-1] 为负
+    gy = np.diff(gray, axis=0)
+    cumulative = np.zeros((height - 1, width + 1), dtype=np.float64)
+    np.cumsum(gy, axis=1, out=cumulative[:, 1:])
+    row_run = (cumulative[:, size:] - cumulative[:, :-size])[:, size:width - 2 * size + 1]
+    horizontal = np.zeros_like(edges)
+    horizontal[1:height - size] = row_run[:height - size - 1] - row_run[size:height - 1]
+
+    # 方框平均亮度：缺口比左右相邻的方框亮
+    boxes = _box_sums(gray, size)
+    inside = boxes[:, size:width - 2 * size + 1]
+    beside = (boxes[:, :width - 3 * size + 1] + boxes[:, 2 * size:]) / 2
+    brightness = (inside - beside) / size
+
+    return (edges + horizontal + brightness) / size, size, scale
+
+
+def find_gap(image, css_width=None, piece=SLIDER_L):
+    """缺口左边缘的 x 坐标（CSS 像素，与 block_x 同一坐标系），找不到返回 None
+
+    Args:
+        image: 验证码画布截图（PIL 图像或 H×W[×C] 数组）
+        css_width: 画布的 CSS 宽度；截图按 devicePixelRatio 放大时用它换算回来
+        piece: 拼图方块边长（CSS 像素）
+    """
+    scores, size, scale = gap_scores(image, css_width, piece)
+    if scores is None:
+        return None
+    y, i = np.unravel_index(np.argmax(scores), scores.shape)
+    if scores[y, i] <= 0:
+        return None
+    return int(round((i + size) / scale)) + STROKE_OUTSET
+
+
+# ---------- 合成验证码（离线评估用） ----------
+
+def _piece_mask(height, width, x, y, l=SLIDER_L, r=SLIDER_R):
+    """与 slide-verify 的 drawPath 相同的拼图形状：方块 + 上方和右侧两个半圆凸起"""
+    yy, xx = np.mgrid[0:height, 0:width]
+    mask = (xx >= x) & (xx < x + l) & (yy >= y) & (yy < y + l)
+    mask |= (xx - (x + l / 2)) ** 2 + (yy - (y - r + 2)) ** 2 <= r * r
+    mask |= (xx - (x + l + r - 2)) ** 2 + (yy - (y + l / 2)) ** 2 <= r * r
+    return mask
+
+
+def _smooth_noise(rng, height, width, cells):
+    """低频噪声：随机小图双线性放大"""
+    small = rng.random((cells + 1, cells + 1))
+    ys = np.linspace(0, cells, height)
+    xs = np.linspace(0, cells, width)
+    y0, x0 = np.minimum(ys.astype(int), cells - 1), np.minimum(xs.astype(int), cells - 1)
+    fy, fx = (ys - y0)[:, None], (xs - x0)[None, :]
+    top = small[y0][:, x0] * (1 - fx) + small[y0][:, x0 + 1] * fx
+    bottom = small[y0 + 1][:, x0] * (1 - fx) + small[y0 + 1][:, x0 + 1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def synthetic_captcha(rng, width=CANVAS_WIDTH, height=CANVAS_HEIGHT, scale=1, x=None):
+    """生成一张带缺口的验证码图（RGB uint8），返回 (图像, 缺口 x)
+
+    背景是多尺度噪声 + 随机亮/暗色块（模拟天空、建筑等大面积亮区），
+    缺口位置范围与组件一致：x ∈ [L+10, width-(L+10)]，L = l + 2r + 3；
+    给定 x 时缺口画在 x 处（fake_driver 按它的 block_x 出图）
+    """
+    full = SLIDER_L + SLIDER_R * 2 + 3
+    if x is None:
+        x = int(rng.integers(full + 10, width - (full + 10) + 1))
+    y = int(rng.integers(10 + SLIDER_R * 2, height - (full + 10) + 1))
+
+    image = np.zeros((height, width, 3))
+    for channel in range(3):
+        image[..., channel] = (0.5 * _smooth_noise(rng, height, width, 3)
+                               + 0.3 * _smooth_noise(rng, height, width, 12)
+                               + 0.2 * rng.random((height, width)))
+    image *= 255 * rng.uniform(0.4, 1.0)
+    yy, xx = np.mgrid[0:height, 0:width]
+    for _ in range(int(rng.integers(2, 6))):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        radius = rng.integers(10, 50)
+        shade = rng.uniform(0, 255, 3)
+        if rng.random() < 0.5:
+            blob = (np.abs(xx - cx) < radius) & (np.abs(yy - cy) < radius // 2 + 5)
+        else:
+            blob = (xx - cx) ** 2 + (yy - cy) ** 2 < radius ** 2
+        image[blob] = 0.3 * image[blob] + 0.7 * shade
+
+    # 缺口：70% 白色填充 + 2 像素白色描边
+    mask = _piece_mask(height, width, x, y)
+    grown = _piece_mask(height, width, x - 1, y - 1, SLIDER_L + 2, SLIDER_R + 1)
+    outline = grown & ~_piece_mask(height, width, x + 1, y + 1, SLIDER_L - 2, SLIDER_R - 1)
+    region = mask | outline
+    image[region] = (1 - OVERLAY_ALPHA) * image[region] + OVERLAY_ALPHA * 255
+
+    image += rng.normal(0, 3, image.shape)  # 截图压缩噪声
+    image = np.clip(image, 0, 255).astype(np.uint8)
+    if scale > 1:
+        image = image.repeat(scale, axis=0).repeat(scale, axis=1)
+    return image, x
+
+
+def evaluate(count=500, scale=1, seed=0, tolerance=3):
+    """在合成验证码上评估：准确率（误差 ≤ tolerance）、平均误差和单张耗时"""
+    rng = np.random.default_rng(seed)
+    errors = []
+    latencies = []
+    misses = 0
+    for _ in range(count):
+        image, true_x = synthetic_captcha(rng, scale=scale)
+        start = time.perf_counter()
+        found = find_gap(image, css_width=CANVAS_WIDTH)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if found is None:
+            misses += 1
+        else:
+            errors.append(abs(found - true_x))
+
+    errors = np.array(errors) if errors else np.array([np.inf])
+    latencies = np.array(latencies)
+    within = int((errors <= tolerance).sum())
+    print(f"合成验证码 {count} 张 (scale={scale}, seed={seed})")
+    print(f"  误差 ≤{tolerance}px: {within}/{count} ({within / count * 100:.1f}%)")
+    print(f"  误差 ≤1px: {int((errors <= 1).sum())}/{count}, 未找到: {misses}")
+    print(f"  平均误差: {errors.mean():.2f}px, 最大误差: {errors.max():.0f}px")
+    print(f"  耗时: 平均 {latencies.mean():.2f}ms, p50 {np.percentile(latencies, 50):.2f}ms, "
+          f"p95 {np.percentile(latencies, 95):.2f}ms, 最大 {latencies.max():.2f}ms")
+    return within / count, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="滑块缺口图像定位")
+    parser.add_argument('image', nargs='?', help='验证码画布截图')
+    parser.add_argument('--css-width', type=int, default=None, help='画布 CSS 宽度（截图被放大时）')
+    parser.add_argument('--eval', type=int, metavar='N', help='用 N 张合成验证码评估')
+    parser.add_argument('--scale', type=int, default=1, help='合成图放大倍数（模拟 devicePixelRatio）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tolerance', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.eval:
+        evaluate(args.eval, args.scale, args.seed, args.tolerance)
+    elif args.image:
+        from PIL import Image
+        print(find_gap(Image.open(args.image), css_width=args.css_width))
+    else:
+        parser.print_help()
+        sys.exit(1)
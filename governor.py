@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+访问学校服务器的并发与速率调节（AIMD）
+所有会向 2ketangpc.svtcc.edu.cn 发请求的操作（打开页面、改每页条数、翻页、跳页）先向调节器领取许可：
+  - 本进程的速率和同时在途请求数按加性增、乘性减调整：
+    最近的请求都正常（延迟低于 LATENCY_TARGET、没有失败）时慢慢加，出现慢请求或失败时减半；
+  - 所有进程共享一个令牌桶（状态文件 + 文件锁），守护进程和手动运行的爬虫加起来也不超过 GLOBAL_RATE；
+  - QUIET_HOURS 里（选课、报名等高峰）速率和并发压到最低。
+每次领取和调整都记为 governor.* 区间，metrics 据此导出当前速率、并发上限、等待时间和调整次数
+python governor.py  查看当前的共享令牌桶
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from instrumentation import span, log
+
+# ============ 配置 ============
+START_RATE = 1.0  # 初始速率（请求/秒）
+MIN_RATE = 0.1
+MAX_RATE = 4.0
+RATE_STEP = 0.1  # 加性增：每个正常请求增加的速率
+MAX_INFLIGHT = 4  # 本进程同时在途请求数上限
+DECREASE_FACTOR = 0.5  # 乘性减
+DECREASE_COOLDOWN = 10  # 两次减速至少间隔的秒数（同一波慢请求只减一次）
+LATENCY_TARGET = 15  # 单次请求（含等数据加载）超过该秒数视为过慢
+ERROR_RATE_LIMIT = 0.2  # 最近 WINDOW 个请求的失败比例超过它时减速
+WINDOW = 20
+TICKET_TIMEOUT = 300  # 许可超过该秒数未归还视为遗失，释放并发名额
+GLOBAL_RATE = 2.0  # 所有进程合计的速率上限（请求/秒）
+GLOBAL_BURST = 4  # 共享令牌桶容量
+# 共享令牌桶的状态文件：放在本模块所在目录，从哪个目录启动的进程都用同一个桶
+BUCKET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "governor_bucket.json")
+QUIET_HOURS = ()  # 高峰时段，如 (('08:00', '09:30'), ('12:00', '14:00'))
+QUIET_RATE = 0.2  # 高峰时段的速率上限，并发固定为 1
+# ==============================
+
+
+def in_quiet_hours(moment=None, quiet_hours=None):
+    """moment（默认现在）是否落在配置的高峰时段里，支持跨零点的时段"""
+    now = (moment or datetime.now()).strftime('%H:%M')
+    for start, end in QUIET_HOURS if quiet_hours is None else quiet_hours:
+        if (start <= now < end) if start <= end else (now >= start or now < end):
+            return True
+    return False
+
+
+def _lock(handle):
+    """阻塞加排他锁，文件关闭时释放"""
+    if os.name == 'nt':
+        import msvcrt
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+
+
+class SharedBucket:
+    """跨进程的令牌桶：状态存在 JSON 文件里，读改写期间持有同目录下 .lock 文件的锁
+
+    拿不到令牌时先预支（令牌数可以为负），返回需要等待的秒数，排在后面的请求等得更久
+    """
+
+    def __init__(self, path=BUCKET_FILE, rate=GLOBAL_RATE, burst=GLOBAL_BURST):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+
+    def take(self, quiet=False):
+        """取一个令牌，返回需要等待的秒数；高峰时段按 QUIET_RATE 补充令牌"""
+        rate = min(self.rate, QUIET_RATE) if quiet else self.rate
+        with open(self.path + '.lock', 'a+') as handle:
+            _lock(handle)
+            now = time.time()
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {'tokens': self.burst, 'updated': now}
+            tokens = min(self.burst, state['tokens'] + (now - state['updated']) * rate)
+            tokens -= 1
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'tokens': tokens, 'updated': now, 'rate': rate}, f)
+        return max(0.0, -tokens / rate)
+
+
+class Ticket:
+    """一次请求的许可：归还时带上耗时和是否失败"""
+    __slots__ = ('started', 'done')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.done = False
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class Governor:
+    """本进程的 AIMD 调节器（线程安全），通过 get_governor() 共用一个实例"""
+
+    def __init__(self, bucket=None):
+        self.bucket = bucket or SharedBucket()
+        self.rate = START_RATE
+        self.limit = MAX_INFLIGHT
+        self.inflight = []
+        self.samples = deque(maxlen=WINDOW)  # (耗时, 是否失败)
+        self.next_slot = 0.0  # 本进程下一个请求最早的发出时间
+        self.last_decrease = 0.0
+        self.quiet = False
+        self._cond = threading.Condition()
+
+    def _effective(self):
+        """(速率, 并发上限)：高峰时段压到 QUIET_RATE 和 1"""
+        quiet = in_quiet_hours()
+        if quiet != self.quiet:
+            self.quiet = quiet
+            self._adjust('quiet' if quiet else 'resume')
+        if quiet:
+            return min(self.rate, QUIET_RATE), 1
+        return self.rate, self.limit
+
+    def _expire(self):
+        now = time.perf_counter()
+        self.inflight = [t for t in self.inflight if not t.done and now - t.started < TICKET_TIMEOUT]
+
+    def acquire(self):
+        """等到速率和并发都允许时返回许可；请求结束后必须 release"""
+        with span('governor.wait') as waited:
+            with self._cond:
+                while True:
+                    self._expire()
+                    rate, limit = self._effective()
+                    if len(self.inflight) < limit:
+                        break
+                    self._cond.wait(1)
+                now = time.perf_counter()
+                delay = max(0.0, self.next_slot - now)
+                self.next_slot = max(now, self.next_slot) + 1 / rate
+                ticket = Ticket()
+                self.inflight.append(ticket)
+            delay = max(delay, self.bucket.take(self.quiet))
+            if delay:
+                time.sleep(delay)
+            ticket.started = time.perf_counter()
+            waited.update(rate=round(rate, 3), limit=limit, inflight=len(self.inflight), delay=round(delay, 3))
+        return ticket
+
+    def release(self, ticket, error=False, latency=None):
+        """归还许可，按本次耗时和成败调整速率；返回耗时（秒）"""
+        latency = ticket.elapsed if latency is None else latency
+        with self._cond:
+            if ticket.done:
+                return latency
+            ticket.done = True
+            self.samples.append((latency, bool(error)))
+            errors = sum(failed for _, failed in self.samples)
+            slow = error or latency > LATENCY_TARGET or errors > ERROR_RATE_LIMIT * len(self.samples)
+            now = time.perf_counter()
+            if slow:
+                if now - self.last_decrease >= DECREASE_COOLDOWN:
+                    self.last_decrease = now
+                    self.rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+                    self.limit = max(1, int(self.limit * DECREASE_FACTOR))
+                    self._adjust('decrease', latency=round(latency, 2), errors=errors)
+            elif self.rate < MAX_RATE or self.limit < MAX_INFLIGHT:
+                self.rate = min(MAX_RATE, self.rate + RATE_STEP)
+                # 一整个窗口都正常时并发加一
+                if len(self.samples) == WINDOW and not errors and self.limit < MAX_INFLIGHT:
+                    self.limit += 1
+                    self.samples.clear()
+                    self._adjust('increase')
+            self._cond.notify_all()
+        return latency
+
+    @contextmanager
+    def request(self):
+        """with governor.request() as ticket: 发请求；块内抛异常记为失败"""
+        ticket = self.acquire()
+        try:
+            yield ticket
+        except BaseException:
+            self.release(ticket, error=True)
+            raise
+        self.release(ticket)
+
+    def _adjust(self, decision, **fields):
+        with span('governor.adjust', decision=decision, rate=round(self.rate, 3), limit=self.limit, **fields):
+            log(f"    [调节] {decision}: 速率 {self.rate:.2f}/s, 并发 {self.limit}", decision=decision)
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """本进程共用的调节器"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = Governor()
+        return _governor
+
+
+if __name__ == "__main__":
+    try:
+        with open(BUCKET_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        print(f"还没有共享令牌桶: {BUCKET_FILE}")
+    else:
+        age = time.time() - state['updated']
+        tokens = min(GLOBAL_BURST, state['tokens'] + age * state.get('rate', GLOBAL_RATE))
+        print(f"令牌 {tokens:.2f}/{GLOBAL_BURST}，速率上限 {state.get('rate', GLOBAL_RATE)}/s，"
+              f"{age:.0f} 秒前更新，{'高峰时段' if in_quiet_hours() else '非高峰时段'}")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取的ID覆盖记录与缺口修补
+爬取时把每页的ID（学生 id / 活动 actId）记进游程集合（连续ID只存首尾，几万条只占几个区间），
+同时记下每页的行偏移和ID范围。爬完后：
+  - 与上次快照（id_coverage_<实体>.json）比对，上次有、这次没读到的ID区间就是缺口；
+  - 读到的条数少于列表 total 时，相邻两页交界处ID跨度明显大于页内步长的位置也算可疑缺口
+    （翻页期间有行被删除、后面的行整体前移时，交界处正好漏掉一行）。
+再按页的ID范围找出缺口可能所在的页，修补时只重新读取这些页。
+python id_coverage.py [students|activities]  查看上次快照的覆盖情况
+"""
+
+import os
+import json
+import argparse
+from bisect import bisect_right
+from datetime import datetime
+
+# ============ 配置 ============
+SNAPSHOT_FILE = "id_coverage_{entity}.json"
+BOUNDARY_RATIO = 2  # 交界处ID跨度超过页内中位步长的这么多倍时视为可疑
+REPAIR_MAX_PAGES = 20  # 修补时最多重新读取的页数，超过说明应该重新全量爬取
+# ==============================
+
+
+class IdRuns:
+    """整数ID的游程集合：按起点排序的闭区间 [start, end]"""
+
+    def __init__(self, runs=()):
+        self.starts = []
+        self.ends = []
+        self.count = 0
+        for start, end in runs:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.count += end - start + 1
+
+    def add(self, value):
+        """加入一个ID，已存在时返回 False"""
+        starts, ends = self.starts, self.ends
+        i = bisect_right(starts, value)
+        if i and ends[i - 1] >= value:
+            return False
+        joins_left = i and ends[i - 1] == value - 1
+        joins_right = i < len(starts) and starts[i] == value + 1
+        if joins_left and joins_right:
+            ends[i - 1] = ends[i]
+            del starts[i], ends[i]
+        elif joins_left:
+            ends[i - 1] = value
+        elif joins_right:
+            starts[i] = value
+        else:
+            starts.insert(i, value)
+            ends.insert(i, value)
+        self.count += 1
+        return True
+
+    def __contains__(self, value):
+        i = bisect_right(self.starts, value)
+        return bool(i) and self.ends[i - 1] >= value
+
+    def __len__(self):
+        return self.count
+
+    def runs(self):
+        return list(zip(self.starts, self.ends))
+
+    def gaps(self, low, high):
+        """[low, high] 中不在集合里的区间"""
+        result = []
+        cursor = low
+        i = max(0, bisect_right(self.starts, low) - 1)
+        while i < len(self.starts) and self.starts[i] <= high:
+            if self.ends[i] >= cursor:
+                if self.starts[i] > cursor:
+                    result.append((cursor, self.starts[i] - 1))
+                cursor = self.ends[i] + 1
+            i += 1
+        if cursor <= high:
+            result.append((cursor, high))
+        return result
+
+    def difference(self, other):
+        """在本集合、不在 other 中的区间"""
+        result = []
+        for start, end in self.runs():
+            result.extend(other.gaps(start, end))
+        return result
+
+
+def _merge(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def snapshot_path(entity):
+    return SNAPSHOT_FILE.format(entity=entity)
+
+
+def load_snapshot(entity):
+    """上次爬取保存的ID集合，没有快照时返回 None"""
+    path = snapshot_path(entity)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    return IdRuns(snapshot['runs'])
+
+
+class IdCoverage:
+    """一次爬取的ID覆盖情况
+
+    Args:
+        entity: 'students' / 'activities'
+        key: 记录里的ID字段（'id' / 'actId'）
+        total: 列表显示的总条数
+    """
+
+    def __init__(self, entity, key, total):
+        self.entity = entity
+        self.key = key
+        self.total = total
+        self.seen = IdRuns()
+        self.pages = []  # (行偏移, 行数, 最小ID, 最大ID, 页内中位步长)
+        self.duplicates = 0
+        self.complete = True  # 爬取中途放弃、修补放弃或还有死信页没读到时为 False
+
+    def _ids(self, rows):
+        return [int(r[self.key]) for r in rows if r.get(self.key) is not None]
+
+    def add_page(self, offset, rows):
+        """记录从第 offset 行开始读到的一页"""
+        ids = self._ids(rows)
+        if not ids:
+            return
+        self.duplicates += len(ids) - sum(self.seen.add(i) for i in ids)
+        steps = sorted(abs(a - b) for a, b in zip(ids, ids[1:]))
+        self.pages.append((offset, len(rows), min(ids), max(ids), steps[len(steps) // 2] if steps else 1))
+
+    def recover(self, rows):
+        """修补时补读到的行，只计入集合，不改变页的记录；返回新增条数"""
+        return sum(self.seen.add(i) for i in self._ids(rows))
+
+    def missing(self, ranges):
+        """ranges 中仍未读到的ID区间"""
+        result = []
+        for start, end in ranges:
+            result.extend(self.seen.gaps(start, end))
+        return result
+
+    def _boundaries(self):
+        """相邻两页之间的ID区间: (前一页序号, 区间低端, 区间高端)，两页ID范围重叠时跳过"""
+        for index, (first, second) in enumerate(zip(self.pages, self.pages[1:])):
+            low1, high1, low2, high2 = first[2], first[3], second[2], second[3]
+            if high2 < low1:
+                yield index, high2 + 1, low1 - 1  # ID 倒序
+            elif high1 < low2:
+                yield index, high1 + 1, low2 - 1  # ID 正序
+
+    def _boundary_gaps(self):
+        """交界处ID跨度明显大于页内步长的区间"""
+        result = []
+        for index, low, high in self._boundaries():
+            step = max(self.pages[index][4], self.pages[index + 1][4], 1)
+            if high - low + 2 >= BOUNDARY_RATIO * step:
+                result.extend(self.seen.gaps(low, high))
+        return result
+
+    def missing_ranges(self, previous=None):
+        """缺失的ID区间：上次快照有而这次没有的，加上条数不足时交界处的可疑区间"""
+        ranges = previous.difference(self.seen) if previous else []
+        if len(self.seen) < self.total:
+            ranges += self._boundary_gaps()
+        return _merge(ranges)
+
+    def suspect_offsets(self, ranges, size):
+        """缺失区间可能所在的页（按每页 size 条对齐的行偏移）；ID 落在两页之间时两页都算"""
+        def overlaps(low, high):
+            return any(start <= high and end >= low for start, end in ranges)
+
+        pages = {index for index, page in enumerate(self.pages) if overlaps(page[2], page[3])}
+        for index, low, high in self._boundaries():
+            if overlaps(low, high):
+                pages.update((index, index + 1))
+        offsets = set()
+        for index in pages:
+            offset, rows = self.pages[index][:2]
+            for row in range(offset, offset + rows, size):
+                offsets.add(row - row % size)
+        return sorted(offsets)
+
+    def save(self):
+        """保存本次的ID集合，作为下次比对的快照
+
+        本次不完整（complete 为 False）时保存本次与上次快照的并集，
+        没读到的ID留在快照里，下次仍能发现它们缺失
+        """
+        seen = self.seen
+        previous = None if self.complete else load_snapshot(self.entity)
+        if previous:
+            seen = IdRuns(_merge(seen.runs() + previous.runs()))
+            print(f"    本次爬取不完整，快照保留上次的 {len(seen) - len(self.seen)} 个未读到的ID")
+        with open(snapshot_path(self.entity), "w", encoding="utf-8") as f:
+            json.dump({
+                'entity': self.entity,
+                'ts': datetime.now().isoformat(timespec='seconds'),
+                'total': self.total,
+                'count': len(seen),
+                'complete': self.complete,
+                'runs': seen.runs(),
+            }, f)
+
+    def report(self, ranges=None):
+        print(f"    ID覆盖: 读到 {len(self.seen)}/{self.total} 个ID, {len(self.seen.runs())} 个连续区间, "
+              f"重复 {self.duplicates} 条")
+        for start, end in (ranges or [])[:10]:
+            print(f"        缺失 {start}-{end} ({end - start + 1} 个)")
+        if ranges and len(ranges) > 10:
+            print(f"        ... 共 {len(ranges)} 个缺失区间")
+
+
+def report(entity):
+    path = snapshot_path(entity)
+    if not os.path.exists(path):
+        print(f"{entity}: 还没有快照 {path}")
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    runs = snapshot['runs']
+    print(f"{entity}: {snapshot['ts']} 读到 {snapshot['count']}/{snapshot['total']} 个ID, {len(runs)} 个连续区间"
+          + (f", ID {runs[0][0]}-{runs[-1][1]}" if runs else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查看ID覆盖快照")
+    parser.add_argument('entity', nargs='?', choices=['students', 'activities'])
+    args = parser.parse_args()
+    for entity in [args.entity] if args.entity else ['students', 'activities']:
+        report(entity)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行埋点
+命名的计时区间(span)和结构化JSON行日志：每个区间记录耗时、行数、尝试次数等字段，
+写入 logs/run-<时间>-<名称>.jsonl；运行结束时输出最慢阶段汇总表
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+
+# ============ 配置 ============
+LOG_DIR = "logs"
+# ==============================
+
+_lock = threading.Lock()
+_run = {'id': None, 'file': None, 'started': None}
+_stats = {}  # span名 -> [次数, 总耗时, 最大耗时, 行数]
+_listeners = []  # span结束时的回调: fn(name, duration, fields)
+
+
+def start_run(name, log_dir=LOG_DIR):
+    """开始一次运行，之后的区间和日志写入该次运行的JSON行文件"""
+    end_run()
+    os.makedirs(log_dir, exist_ok=True)
+    run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{name}"
+    with _lock:
+        _run['id'] = run_id
+        _run['file'] = open(os.path.join(log_dir, f"run-{run_id}.jsonl"), "a", encoding="utf-8")
+        _run['started'] = time.perf_counter()
+        _stats.clear()
+    _write({'event': 'run.start', 'name': name})
+    return run_id
+
+
+def end_run():
+    """结束当前运行并关闭日志文件"""
+    if _run['file'] is None:
+        return
+    _write({'event': 'run.end', 'duration_ms': round((time.perf_counter() - _run['started']) * 1000, 1)})
+    with _lock:
+        _run['file'].close()
+        _run['file'] = None
+
+
+def _write(record):
+    if _run['file'] is None:
+        return
+    record = {'ts': datetime.now().isoformat(timespec='milliseconds'), 'run': _run['id'], **record}
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _lock:
+        if _run['file'] is not None:
+            _run['file'].write(line + "\n")
+            _run['file'].flush()
+
+
+def add_listener(callback):
+    """注册区间结束回调（指标、性能分析等模块用）"""
+    _listeners.append(callback)
+
+
+def remove_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def log(message, **fields):
+    """输出进度信息：控制台照常打印，同时写一条结构化日志"""
+    print(message)
+    _write({'event': 'log', 'msg': message.strip(), **fields})
+
+
+@contextmanager
+def span(name, **fields):
+    """计时区间。with 块内可以往返回的字典里补充字段（如 rows、attempt）"""
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield fields
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        with _lock:
+            stats = _stats.setdefault(name, [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            rows = fields.get('rows')
+            if isinstance(rows, int):
+                stats[3] += rows
+        _write({'event': 'span', 'span': name, 'duration_ms': round(duration * 1000, 2), 'ok': ok, **fields})
+        for callback in _listeners:
+            callback(name, duration, fields)
+
+
+def traced(name, rows_from_result=False):
+    """函数装饰器：整个函数调用作为一个区间；rows_from_result 时把返回值的条数记为 rows"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as fields:
+                result = func(*args, **kwargs)
+                if rows_from_result:
+                    if isinstance(result, int):
+                        fields['rows'] = result
+                    elif result is not None:
+                        fields['rows'] = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def phase_stats():
+    """当前运行各区间的统计: {名称: (次数, 总耗时, 最大耗时, 行数)}"""
+    with _lock:
+        return {name: tuple(stats) for name, stats in _stats.items()}
+
+
+def print_phases(stats):
+    """打印 [(名称, (次数, 总耗时, 最大耗时, 行数))] 表格"""
+    print(f"\n{'阶段':<24}{'次数':>6}{'总耗时(s)':>12}{'平均(ms)':>12}{'最长(ms)':>12}{'行数':>10}")
+    for name, (count, total, longest, rows) in stats:
+        print(f"{name:<24}{count:>6}{total:>12.2f}{total / count * 1000:>12.1f}{longest * 1000:>12.1f}{rows:>10}")
+
+
+def summary(top=10):
+    """打印本次运行最慢的阶段（按总耗时排序）"""
+    stats = sorted(phase_stats().items(), key=lambda kv: -kv[1][1])[:top]
+    if not stats:
+        return
+    print_phases(stats)
+    _write({'event': 'summary', 'phases': {name: {'count': c, 'total_s': round(t, 3), 'max_ms': round(m * 1000, 1),
+                                                  'rows': r} for name, (c, t, m, r) in stats}})
+
+
+def latest_run_log(log_dir=LOG_DIR):
+    """最近一次运行的日志文件，没有则返回 None"""
+    if not os.path.isdir(log_dir):
+        return None
+    logs = sorted(f for f in os.listdir(log_dir) if f.startswith('run-') and f.endswith('.jsonl'))
+    return os.path.join(log_dir, logs[-1]) if logs else None
+
+
+def read_run_log(path):
+    """从运行日志重新统计各区间，返回 (运行名, {名称: (次数, 总耗时, 最大耗时, 行数)})"""
+    name = None
+    stats = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('event') == 'run.start':
+                name = record.get('name')
+            elif record.get('event') == 'span':
+                duration = record.get('duration_ms', 0) / 1000
+                entry = stats.setdefault(record['span'], [0, 0.0, 0.0, 0])
+                entry[0] += 1
+                entry[1] += duration
+                entry[2] = max(entry[2], duration)
+                if isinstance(record.get('rows'), int):
+                    entry[3] += record['rows']
+    return name, {key: tuple(value) for key, value in stats.items()}
@@ -13,18 +13,21 @@ from pathlib import Path
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.chrome.options import Options
+
+from instrumentation import span, log
+from browser_pool import create_driver, chrome_options, set_resource_blocking
+from slider_calibration import SliderCalibrator
+from governor import get_governor
 
 # ============ 配置区域 ============
 USERNAME = "2004"
 PASSWORD = "yxsh2004,,."
 LOGIN_URL = "https://2ketangpc.svtcc.edu.cn/login"
-SLIDE_OFFSET = 12  # 滑动偏移校准值
+SLIDE_OFFSET = 12  # 滑动偏移初始值（之后由 slider_calibration 按尝试记录校准）
 # =================================
 
 
@@ -40,6 +43,24 @@ def get_gap_position(driver) -> int:
     return driver.execute_script(script)
 
 
+def get_gap_position_from_image(driver):
+    """block_x 读不到时的后备：截取验证码画布，用图像定位缺口"""
+    try:
+        import io
+        from PIL import Image
+        from gap_detector import find_gap
+    except ImportError as e:
+        print(f"    图像定位不可用: {e}")
+        return None
+    try:
+        canvas = driver.find_element(By.CSS_SELECTOR, '#slideVerify canvas:not(.slide-verify-block)')
+        image = Image.open(io.BytesIO(canvas.screenshot_as_png))
+        return find_gap(image, css_width=canvas.size['width'])
+    except Exception as e:
+        print(f"    图像定位缺口失败: {e}")
+        return None
+
+
 def generate_track(distance: int):
     """生成人类化滑动轨迹"""
     track = []
@@ -62,25 +83,24 @@ def generate_track(distance: int):
     return track
 
 
-def login():
-    """执行登录"""
+def login(driver=None):
+    """执行登录；传入 driver 时在已打开的浏览器里重新登录（会话过期时用）"""
     print("=" * 50)
     print("第二课堂自动登录系统")
     print("=" * 50)
     
     # 初始化浏览器
-    options = Options()
-    options.add_argument('--window-size=1366,768')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--no-sandbox')
-    
-    driver = webdriver.Chrome(options=options)
+    if driver is None:
+        driver = create_driver(chrome_options(headless=False))
     
     try:
         # 1. 打开登录页面
         print("\n[1] 打开登录页面...")
-        driver.get(LOGIN_URL)
-        time.sleep(3)
+        # 登录页放行验证码背景图，其余静态资源照常拦截
+        set_resource_blocking(driver, 'login')
+        with get_governor().request(), span('page.navigate', url=LOGIN_URL):
+            driver.get(LOGIN_URL)
+            time.sleep(3)
         
         # 2. 输入账号密码
         print("[2] 输入账号密码...")
@@ -102,84 +122,108 @@ def login():
         
         # 4. 处理滑块验证码
         print("[4] 处理滑块验证码...")
+        calibrator = SliderCalibrator(default_offset=SLIDE_OFFSET)
+        captcha_started = time.perf_counter()
+        
+        def record_success(attempt_span, attempt, gap_x, offset, steps):
+            # 每个“登录成功”出口都要记录，否则尝试记录和成功指标会偏向失败
+            attempt_span['success'] = True
+            if gap_x is not None and offset is not None:
+                calibrator.record_attempt(gap_x, offset, True, steps, attempt + 1)
+            calibrator.record_login(attempt + 1, time.perf_counter() - captcha_started, True)
         
         for attempt in range(5):
-            try:
-                # 检查验证码对话框
-                dialog = WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, "el-dialog__wrapper"))
-                )
-                if not dialog.is_displayed():
-                    break
+            with span('login.captcha_attempt', attempt=attempt + 1) as attempt_span:
+                gap_x = offset = steps = None
+                try:
+                    # 检查验证码对话框
+                    dialog = WebDriverWait(driver, 5).until(
+                        EC.presence_of_element_located((By.CLASS_NAME, "el-dialog__wrapper"))
+                    )
+                    if not dialog.is_displayed():
+                        break
                 
-                print(f"    尝试 {attempt + 1}/5")
-                time.sleep(1)
+                    log(f"    尝试 {attempt + 1}/5", attempt=attempt + 1)
+                    time.sleep(1)
                 
-                # 获取缺口位置
-                gap_x = get_gap_position(driver)
-                if gap_x is None:
-                    print("    无法获取缺口位置")
-                    continue
+                    # 获取缺口位置
+                    gap_x = get_gap_position(driver)
+                    if gap_x is None:
+                        with span('login.gap_image'):
+                            gap_x = get_gap_position_from_image(driver)
+                    if gap_x is None:
+                        print("    无法获取缺口位置")
+                        continue
                 
-                # 计算滑动距离
-                slide_distance = gap_x + SLIDE_OFFSET
-                print(f"    缺口位置: {gap_x}px, 滑动距离: {slide_distance}px")
+                    # 计算滑动距离（偏移由历史尝试记录校准）
+                    offset = calibrator.choose(gap_x)
+                    slide_distance = gap_x + offset
+                    attempt_span.update(gap_x=gap_x, offset=offset, distance=slide_distance)
+                    log(f"    缺口位置: {gap_x}px, 滑动距离: {slide_distance}px", **attempt_span)
                 
-                # 生成轨迹
-                track = generate_track(slide_distance)
+                    # 生成轨迹
+                    track = generate_track(slide_distance)
                 
-                # 执行滑动 - 快速直接滑动
-                slider = driver.find_element(By.CLASS_NAME, "slide-verify-slider-mask-item")
-                actions = ActionChains(driver)
-                actions.click_and_hold(slider).perform()
-                time.sleep(0.05)
+                    # 执行滑动 - 快速直接滑动
+                    slider = driver.find_element(By.CLASS_NAME, "slide-verify-slider-mask-item")
+                    actions = ActionChains(driver)
+                    actions.click_and_hold(slider).perform()
+                    time.sleep(0.05)
                 
-                # 快速滑动：分3步完成
-                step1 = int(slide_distance * 0.7)
-                step2 = int(slide_distance * 0.2)
-                step3 = slide_distance - step1 - step2
+                    # 快速滑动：分3步完成
+                    step1 = int(slide_distance * 0.7)
+                    step2 = int(slide_distance * 0.2)
+                    step3 = slide_distance - step1 - step2
+                    steps = [step1, step2, step3]
                 
-                actions.move_by_offset(step1, 0).perform()
-                time.sleep(0.01)
-                actions.move_by_offset(step2, 0).perform()
-                time.sleep(0.01)
-                actions.move_by_offset(step3, random.randint(-2, 2)).perform()
+                    actions.move_by_offset(step1, 0).perform()
+                    time.sleep(0.01)
+                    actions.move_by_offset(step2, 0).perform()
+                    time.sleep(0.01)
+                    actions.move_by_offset(step3, random.randint(-2, 2)).perform()
                 
-                actions.release().perform()
-                time.sleep(2)
+                    actions.release().perform()
+                    time.sleep(2)
                 
-                # 检查是否成功
-                try:
-                    current_url = driver.current_url
-                    if 'login' not in current_url.lower():
-                        print(f"\n[5] 登录成功! 当前页面: {current_url}")
-                        return driver  # 返回driver供后续使用
-                except:
-                    print("\n[5] 登录成功!")
-                    return driver
+                    # 检查是否成功
+                    try:
+                        current_url = driver.current_url
+                        if 'login' not in current_url.lower():
+                            record_success(attempt_span, attempt, gap_x, offset, steps)
+                            log(f"\n[5] 登录成功! 当前页面: {current_url}", attempts=attempt + 1)
+                            return driver  # 返回driver供后续使用
+                    except:
+                        record_success(attempt_span, attempt, gap_x, offset, steps)
+                        print("\n[5] 登录成功!")
+                        return driver
+                    calibrator.record_attempt(gap_x, offset, False, steps, attempt + 1)
                 
-                # 刷新验证码
-                try:
-                    refresh = driver.find_element(By.CLASS_NAME, "slide-verify-refresh-icon")
-                    refresh.click()
-                    time.sleep(1)
-                except:
-                    pass
+                    # 刷新验证码
+                    try:
+                        refresh = driver.find_element(By.CLASS_NAME, "slide-verify-refresh-icon")
+                        refresh.click()
+                        time.sleep(1)
+                    except:
+                        pass
                     
-            except Exception as e:
-                try:
-                    current_url = driver.current_url
-                    if 'login' not in current_url.lower():
-                        print(f"\n[5] 登录成功! 当前页面: {current_url}")
+                except Exception as e:
+                    try:
+                        current_url = driver.current_url
+                        if 'login' not in current_url.lower():
+                            record_success(attempt_span, attempt, gap_x, offset, steps)
+                            print(f"\n[5] 登录成功! 当前页面: {current_url}")
+                            return driver
+                    except:
+                        record_success(attempt_span, attempt, gap_x, offset, steps)
+                        print("\n[5] 登录成功!")
                         return driver
-                except:
-                    print("\n[5] 登录成功!")
-                    return driver
-                print(f"    异常: {e}")
-                break
+                    print(f"    异常: {e}")
+                    break
         
         # 最终检查
-        if 'login' not in driver.current_url.lower():
+        logged_in = 'login' not in driver.current_url.lower()
+        calibrator.record_login(attempt + 1, time.perf_counter() - captcha_started, logged_in)
+        if logged_in:
             print(f"\n[5] 登录成功! 当前页面: {driver.current_url}")
             return driver
         else:
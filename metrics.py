@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫指标导出
+计数器/仪表/直方图，以 Prometheus 文本格式导出：
+写 node-exporter textfile（metrics/2ketang_<实体>.prom，登录、浏览器池等不属于某个实体的指标写
+metrics/2ketang_session.prom），或爬取期间开本地HTTP端口供抓取。
+指标由 instrumentation 的区间回调更新，热循环里只有几次加法
+"""
+
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import instrumentation
+
+# ============ 配置 ============
+TEXTFILE_DIR = "metrics"  # node-exporter --collector.textfile.directory 指向的目录
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# ==============================
+
+REGISTRY = []
+
+
+class _Metric:
+    """一个指标族；每组标签值对应一个子项，子项创建后缓存"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+    def render(self, entity=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            if entity is None or values[:1] == (entity,):
+                lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {child.value:g}"]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else f"{bound:g}"
+            lines.append(f"{self.name}_bucket{self._label_text(values, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {child.sum:g}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {child.count}")
+        return lines
+
+
+# ---------- 爬虫指标 ----------
+ROWS = Counter('crawl_rows_ingested_total', '写入数据库的行数', ['entity'])
+PAGES = Counter('crawl_pages_fetched_total', '提取的页数', ['entity'])
+CAPTCHA_ATTEMPTS = Counter('crawl_captcha_attempts_total', '滑块验证码尝试次数', ['entity'])
+CAPTCHA_SUCCESSES = Counter('crawl_captcha_successes_total', '滑块验证码成功次数', ['entity'])
+EXTRACT_SECONDS = Histogram('crawl_page_extract_seconds', '单页数据提取耗时', ['entity'])
+DB_WRITE_SECONDS = Histogram('crawl_db_write_seconds', '单批写库耗时', ['entity'])
+POOL_WAIT_SECONDS = Histogram('crawl_pool_wait_seconds', '等待空闲浏览器的时间', ['entity'],
+                              buckets=(0.1, 1, 5, 15, 60, 300))
+POOL_LEASES = Counter('crawl_pool_leases_total', '浏览器池租用次数（hit=直接拿到预热好的浏览器）', ['entity', 'result'])
+PAGE_RETRIES = Counter('crawl_page_retries_total', '单页失败后的重试次数', ['entity'])
+RETRY_SECONDS = Histogram('crawl_page_retry_seconds', '单次重试的退避和恢复耗时', ['entity'],
+                          buckets=(1, 2.5, 5, 10, 30, 60, 120))
+DEAD_PAGES = Counter('crawl_dead_pages_total', '重试用完后进入死信队列的页数', ['entity'])
+GOVERNOR_RATE = Gauge('crawl_governor_rate', '调节器当前允许的请求速率（请求/秒）', ['entity'])
+GOVERNOR_LIMIT = Gauge('crawl_governor_inflight_limit', '调节器当前允许的同时在途请求数', ['entity'])
+GOVERNOR_WAIT_SECONDS = Histogram('crawl_governor_wait_seconds', '请求等待调节器许可的时间', ['entity'],
+                                  buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30))
+GOVERNOR_DECISIONS = Counter('crawl_governor_decisions_total', '调节器的调整次数（increase/decrease/quiet/resume）',
+                             ['entity', 'decision'])
+LAST_SUCCESS = Gauge('crawl_last_success_timestamp_seconds', '最近一次成功爬取的时间戳', ['entity'])
+RUNNING = Gauge('crawl_running', '是否正在爬取', ['entity'])
+
+
+def render(entity=None):
+    """Prometheus 文本格式；指定 entity 时只输出该实体的样本
+
+    所有指标都带 entity 标签，每个实体写各自的 textfile，
+    node-exporter 合并多个文件时不会出现重复样本
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(entity))
+    return '\n'.join(lines) + '\n'
+
+
+def textfile_path(entity):
+    return os.path.join(TEXTFILE_DIR, f"2ketang_{entity}.prom")
+
+
+def write_textfile(path, entity=None):
+    """原子写入 textfile（node-exporter 不会读到写了一半的文件）"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render(entity))
+    os.replace(tmp_path, path)
+
+
+def _load_last_success(path, entity):
+    """从上次的 textfile 恢复最近成功时间，失败的运行不会把它清掉"""
+    prefix = f'{LAST_SUCCESS.name}{{entity="{entity}"}} '
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith(prefix):
+                    LAST_SUCCESS.labels(entity).set(float(line[len(prefix):]))
+    except (OSError, ValueError):
+        pass
+
+
+SESSION_ENTITY = 'session'  # 不属于某个实体爬取的登录、浏览器池等待
+_current = threading.local()  # 当前线程正在爬取的实体（守护进程里多个任务可以并行）
+_session_lock = threading.Lock()  # 多个实体同时结束时，session 的 textfile 只由一个线程写
+_listening = False
+
+
+def _on_span(name, duration, fields):
+    entity = getattr(_current, 'entity', None)
+    if name == 'login.captcha_attempt':
+        CAPTCHA_ATTEMPTS.labels(entity or SESSION_ENTITY).inc()
+        if fields.get('success'):
+            CAPTCHA_SUCCESSES.labels(entity or SESSION_ENTITY).inc()
+    elif name == 'governor.wait':
+        GOVERNOR_WAIT_SECONDS.labels(entity or SESSION_ENTITY).observe(duration)
+        GOVERNOR_RATE.labels(entity or SESSION_ENTITY).set(fields.get('rate') or 0)
+        GOVERNOR_LIMIT.labels(entity or SESSION_ENTITY).set(fields.get('limit') or 0)
+    elif name == 'governor.adjust':
+        GOVERNOR_DECISIONS.labels(entity or SESSION_ENTITY, fields.get('decision')).inc()
+    elif name == 'pool.wait':
+        POOL_WAIT_SECONDS.labels(entity or SESSION_ENTITY).observe(duration)
+        POOL_LEASES.labels(entity or SESSION_ENTITY, 'hit' if fields.get('hit') else 'miss').inc()
+    elif entity is None:
+        return
+    elif name == 'page.extract':
+        PAGES.labels(entity).inc()
+        EXTRACT_SECONDS.labels(entity).observe(duration)
+    elif name == 'db.write':
+        DB_WRITE_SECONDS.labels(entity).observe(duration)
+        ROWS.labels(entity).inc(fields.get('rows') or 0)
+    elif name == 'page.retry':
+        PAGE_RETRIES.labels(entity).inc()
+        RETRY_SECONDS.labels(entity).observe(duration)
+    elif name == 'page.dead_letter':
+        DEAD_PAGES.labels(entity).inc()
+
+
+def install(entity):
+    """开始收集当前线程里某个实体爬取的指标：订阅 instrumentation 的区间回调"""
+    global _listening
+    _current.entity = entity
+    _load_last_success(textfile_path(entity), entity)
+    RUNNING.labels(entity).set(1)
+    if not _listening:
+        instrumentation.add_listener(_on_span)
+        _listening = True
+
+
+def bind(entity):
+    """之后当前线程里的区间都记到 entity 名下（None 表示不属于某个实体）"""
+    _current.entity = entity
+
+
+@contextmanager
+def bound(entity):
+    """with 块内当前线程的区间记到 entity 名下（crawl_jobs 的浏览器线程、写库线程用）"""
+    previous = getattr(_current, 'entity', None)
+    _current.entity = entity
+    try:
+        yield
+    finally:
+        _current.entity = previous
+
+
+def finish(entity, success):
+    """爬取结束：更新成功时间，写该实体和 session 的 textfile
+
+    合并爬取时登录发生在绑定实体之前，验证码等指标记在 session 名下，也要导出
+    """
+    RUNNING.labels(entity).set(0)
+    _current.entity = None
+    if success:
+        LAST_SUCCESS.labels(entity).set(time.time())
+    write_textfile(textfile_path(entity), entity)
+    with _session_lock:
+        write_textfile(textfile_path(SESSION_ENTITY), SESSION_ENTITY)
+
+
+def serve(port, host='127.0.0.1'):
+    """后台线程提供 http://host:port/metrics，返回 server（http.server 到这里才导入）"""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            payload = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟的第二课堂站点
+生成N条与真实页面字段一致的合成学生/活动数据，通过本地HTTP接口按页提供，
+可配置每次请求的延迟；供 fake_driver.FakeDriver 和 bench_crawl.py 使用
+"""
+
+import json
+import time
+import random
+import threading
+import urllib.request
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+COLLEGES = ["道路与桥梁工程系", "航运工程系", "汽车工程系", "轨道交通系", "机电工程系", "信息工程系", "管理工程系"]
+CAMPUSES = ["龙泉校区", "成华校区"]
+ACTIVITY_CLASSES = [(503, "思政育人"), (504, "文体艺术"), (505, "志愿公益"), (506, "创新创业")]
+ETHNICS = [(1, "汉族"), (2, "彝族"), (3, "藏族"), (4, "羌族")]
+
+
+def make_student(i, rng):
+    """按真实学生列表的字段生成一条学生记录"""
+    grade = 2019 + i % 7
+    college_id = i % len(COLLEGES)
+    class_id = 12000 + (i // 40)
+    ethnic_id, ethnic = rng.choice(ETHNICS)
+    return {
+        'code': f"{grade}{i:06d}",
+        'id': 500000 - i,
+        'name': f"学生{i}",
+        'gender': rng.choice([1, 2]),
+        'ethnic': ethnic,
+        'ethnicId': ethnic_id,
+        'politics': rng.choice([0, 1, 2]),
+        'mobile': f"13{rng.randrange(10 ** 9):09d}",
+        'identity': 1,
+        'campusId': i % len(CAMPUSES) + 1,
+        'campusName': CAMPUSES[i % len(CAMPUSES)],
+        'collegeId': college_id + 100,
+        'collegeName': COLLEGES[college_id],
+        'majorId': college_id * 10 + i % 5,
+        'majorName': f"{COLLEGES[college_id][:2]}专业{i % 5}",
+        'classId': class_id,
+        'className': f"班级{grade % 100}-{class_id % 40}",
+        'grade': grade,
+        'gradeName': str(grade),
+        'lengthName': "三年制",
+        'credit': round(rng.uniform(0, 12), 2),
+        'sumScore': round(rng.uniform(0, 100), 2),
+        'userClassPass': rng.choice(["是", "否"]),
+        'status': 3,
+        'leaveTotalNum': 0,
+        'leaveSuccessNum': 0,
+        'leaveFailNum': 0,
+    }
+
+
+def make_activity(i, rng):
+    """按真实活动列表的字段生成一条活动记录"""
+    class_id, class_name = ACTIVITY_CLASSES[i % len(ACTIVITY_CLASSES)]
+    start = 1700000000000 + i * 3600 * 1000
+    org = COLLEGES[i % len(COLLEGES)]
+    return {
+        'actId': 100000 - i,
+        'adminCode': str(1000 + i % 30),
+        'adminId': 122100 + i % 30,
+        'adminName': org + "团总支",
+        'applyStatus': 2,
+        'chengeStatus': 0,
+        'classId': class_id,
+        'className': class_name,
+        'creatorId': 122100 + i % 30,
+        'editActivity': 1,
+        'endTime': start + 2 * 3600 * 1000,
+        'enrollEndTime': start - 3600 * 1000,
+        'finishStatus': "",
+        'finishStatus2': "",
+        'hours': rng.choice([0, 1, 2, 4]),
+        'name': f"{2023 + i % 3}年{i % 12 + 1}月第{i}期主题讲座活动（{org[:2]}系）",
+        'orgId': 12600 + i % len(COLLEGES),
+        'orgName': org + "团总支",
+        'oto': 0,
+        'startTime': start,
+        'status': 1,
+        'statusAll': 1,
+    }
+
+
+def make_participants(act_id, students):
+    """某个活动的报名/签到名单（按活动ID确定，名单里的学生取自前 students 个学生）"""
+    rng = random.Random(act_id)
+    rows = []
+    for i in sorted(rng.sample(range(max(students, 1)), min(students, rng.randint(0, 40)))):
+        signed = rng.random() < 0.8
+        rows.append({
+            'userId': 500000 - i,
+            'userCode': f"{2019 + i % 7}{i:06d}",
+            'userName': f"学生{i}",
+            'applyStatus': 2,
+            'signInTime': 1700000000000 + act_id * 1000 if signed else None,
+            'signOutTime': 1700000000000 + act_id * 1000 + 3600 * 1000 if signed else None,
+            'hours': rng.choice([0, 1, 2]) if signed else 0,
+        })
+    return rows
+
+
+class MockSite:
+    """内存中的模拟站点数据"""
+
+    def __init__(self, students=30000, activities=4000, latency=0.0, seed=2025):
+        rng = random.Random(seed)
+        self.latency = latency
+        self.records = {
+            'students': [make_student(i, rng) for i in range(students)],
+            'activities': [make_activity(i, rng) for i in range(activities)],
+        }
+        self.lookups = {
+            'organizationes': [{'id': 12363 + i, 'name': f"班级{i}"} for i in range(1470)],
+            'xieban': [{'organizationId': 12600 + i, 'organizationName': name + "团总支", 'type': 4}
+                       for i, name in enumerate(COLLEGES)],
+            # 与真实页面一致：classifies 只有“全部”，分类在 options 里
+            'classifies': [{'id': "", 'name': "全部"}],
+            'options': [{'id': cid, 'name': name, 'parentId': 0, 'parentIds': None,
+                         'isExistence': None, 'isAssociation': None} for cid, name in ACTIVITY_CLASSES],
+        }
+        self.participant_overrides = {}  # 活动ID -> 修改后的名单（模拟报名变化）
+        self.requests = 0
+
+    def participants(self, act_id):
+        if act_id in self.participant_overrides:
+            return self.participant_overrides[act_id]
+        return make_participants(act_id, len(self.records['students']))
+
+    def page(self, entity, page_no, size):
+        """返回 (总数, 第page_no页数据)"""
+        records = self.records[entity]
+        start = (page_no - 1) * size
+        return len(records), records[start:start + size]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    site = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        site = self.site
+        site.requests += 1
+        if site.latency:
+            time.sleep(site.latency)
+
+        parts = url.path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'api' and parts[1] in site.records:
+            page_no = int(query.get('page', ['1'])[0])
+            size = int(query.get('size', ['10'])[0])
+            total, data = site.page(parts[1], page_no, size)
+            body = {'total': total, 'data': data}
+        elif url.path == '/api/lookups':
+            body = site.lookups
+        elif url.path == '/api/participants':
+            body = {'code': 200, 'data': {'rows': site.participants(int(query['actId'][0]))}}
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(site, host='127.0.0.1', port=0):
+    """在后台线程启动模拟站点，返回 (server, base_url)"""
+    handler = type('MockSiteHandler', (_Handler,), {'site': site})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+class MockSiteClient:
+    """访问模拟站点HTTP接口的客户端"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def _get(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=30) as resp:
+            return json.loads(resp.read().decode('utf-8'))
+
+    def fetch_page(self, entity, page_no, size):
+        body = self._get(f"/api/{entity}?page={page_no}&size={size}")
+        return body['total'], body['data']
+
+    def fetch_lookups(self):
+        return self._get("/api/lookups")
+
+    def fetch_participants(self, act_id, api="/api/participants?actId={actId}"):
+        """按接口模板（活动ID写成 {actId}）请求名单；模板不是模拟站点的接口时 HTTP 404"""
+        return self._get(api.replace('{actId}', str(act_id)))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="启动模拟第二课堂站点")
+    parser.add_argument('--students', type=int, default=30000)
+    parser.add_argument('--activities', type=int, default=4000)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的延迟（秒）')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    server, base_url = serve(MockSite(args.students, args.activities, args.latency), port=args.port)
+    print(f"模拟站点已启动: {base_url}  (Ctrl+C 退出)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
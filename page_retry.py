@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列表翻页的单页重试与死信队列
+每一页是一个任务（行偏移 + 每页条数）：空页、翻页失败或等待后数据仍未更新都算这一页失败，
+按指数退避（带抖动）重试，重试前重新定位到这一页，会话掉线（跳回登录页）时先重新登录；
+超过重试次数的页写入死信文件 dead_pages.jsonl 后跳过，继续爬后面的页，
+由爬完后的修补阶段（或下一次爬取）重新读取。
+python page_retry.py [students|activities]  查看死信队列
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+
+from instrumentation import span, log
+
+# ============ 配置 ============
+MAX_RETRIES = 3  # 每页最多重试次数
+BACKOFF_BASE = 2  # 第 n 次重试前等待 BACKOFF_BASE * 2^(n-1) 秒
+BACKOFF_MAX = 30
+MAX_CONSECUTIVE_DEAD = 3  # 连续这么多页进入死信时停止爬取（站点可能已不可用）
+DEAD_LETTER_FILE = "dead_pages.jsonl"
+# ==============================
+
+
+def session_lost(driver):
+    """浏览器被重定向回登录页"""
+    try:
+        return 'login' in driver.current_url.lower()
+    except Exception:
+        return True
+
+
+def load_dead_pages(entity, path=DEAD_LETTER_FILE):
+    """某个实体的死信页: [{'offset', 'size', 'page', 'reason', 'attempts', 'ts'}]"""
+    if not os.path.exists(path):
+        return []
+    pages = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('entity') == entity:
+                pages.append(record)
+    return pages
+
+
+def clear_dead_pages(entity, offsets, path=DEAD_LETTER_FILE):
+    """修补成功后从死信文件删除这些行偏移的记录"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    kept = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get('entity') != entity or record.get('offset') not in offsets:
+            kept.append(line)
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(kept)
+
+
+class PageRetry:
+    """一次爬取中各页的重试计数、耗时和死信
+
+    Args:
+        entity: 'students' / 'activities'
+    """
+
+    def __init__(self, entity, max_retries=MAX_RETRIES, dead_letter_file=DEAD_LETTER_FILE):
+        self.entity = entity
+        self.max_retries = max_retries
+        self.dead_letter_file = dead_letter_file
+        self.attempts = {}  # 行偏移 -> 已失败次数
+        self.retries = 0
+        self.retry_seconds = 0.0
+        self.dead = []
+        self.consecutive_dead = 0
+
+    def should_retry(self, offset, size, reason):
+        """第 offset 行开始的页读取失败：还能重试返回 True，否则写入死信并返回 False"""
+        failures = self.attempts.get(offset, 0) + 1
+        self.attempts[offset] = failures
+        if failures <= self.max_retries:
+            log(f"    第 {offset + 1} 行起的页失败（{reason}），第 {failures}/{self.max_retries} 次重试",
+                offset=offset, reason=reason, attempt=failures)
+            return True
+        record = {'entity': self.entity, 'offset': offset, 'size': size, 'page': offset // size + 1,
+                  'reason': reason, 'attempts': failures, 'ts': datetime.now().isoformat(timespec='seconds')}
+        self.dead.append(record)
+        self.consecutive_dead += 1
+        with open(self.dead_letter_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        with span('page.dead_letter', offset=offset, reason=reason):
+            log(f"    第 {offset + 1} 行起的页重试 {self.max_retries} 次仍失败（{reason}），已加入死信队列",
+                offset=offset, reason=reason)
+        return False
+
+    def succeeded(self, offset):
+        self.attempts.pop(offset, None)
+        self.consecutive_dead = 0
+
+    @property
+    def give_up(self):
+        """连续多页进入死信，继续翻页没有意义"""
+        return self.consecutive_dead >= MAX_CONSECUTIVE_DEAD
+
+    @contextmanager
+    def backoff(self, offset):
+        """退避等待 + with 块内的恢复操作（重新定位、重新登录），整体计入重试耗时"""
+        failures = self.attempts.get(offset, 1)
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (failures - 1)) * random.uniform(0.8, 1.2)
+        start = time.perf_counter()
+        with span('page.retry', offset=offset, attempt=failures) as retried:
+            time.sleep(delay)
+            yield retried
+        self.retries += 1
+        self.retry_seconds += time.perf_counter() - start
+
+    def summary(self):
+        print(f"    重试 {self.retries} 次，耗时 {self.retry_seconds:.1f}s，死信 {len(self.dead)} 页")
+        for record in self.dead:
+            print(f"        第 {record['offset'] + 1} 行起 (每页 {record['size']} 条): {record['reason']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查看死信队列")
+    parser.add_argument('entity', nargs='?', choices=['students', 'activities'])
+    args = parser.parse_args()
+    for entity in [args.entity] if args.entity else ['students', 'activities']:
+        pages = load_dead_pages(entity)
+        print(f"{entity}: {len(pages)} 页待修补")
+        for record in pages:
+            print(f"    {record['ts']} 第 {record['offset'] + 1} 行起 (每页 {record['size']} 条, "
+                  f"重试 {record['attempts'] - 1} 次): {record['reason']}")
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取性能分析（crawl_students.py / crawl_activities.py 的 --profile）
+一次运行同时收集三类数据，写到同一个报告目录：
+  cpu.folded   采样分析的折叠栈（flamegraph.pl / speedscope 可直接读取）
+  pages.tsv    每页的提取耗时、内存占用和相对上一页的增长
+  memory.txt   每页 tracemalloc 最大分配点和增长最多的代码行
+  scripts.tsv  每次 execute_script 的浏览器端JS执行时间与往返总耗时
+不加 --profile 时不导入、不挂钩任何东西
+"""
+
+import os
+import re
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+import instrumentation
+
+# ============ 配置 ============
+PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL = 0.005  # CPU采样间隔（秒）
+TOP_ALLOCATORS = 10
+# ==============================
+
+# 把脚本包进函数，在浏览器里用 performance.now() 计时，连同结果一起返回
+_JS_TIMER = """
+var __t0 = performance.now();
+var __r = (function() {
+%s
+}).apply(this, arguments);
+return {__profile_result: __r, __profile_js_ms: performance.now() - __t0};
+"""
+
+# Runtime.evaluate 的表达式（cdp_transport 包好的立即执行函数，可能返回 Promise）外再包一层计时
+_CDP_JS_TIMER = """(function() {
+var __t0 = performance.now();
+return Promise.resolve(%s).then(function(__r) {
+    return {__profile_result: __r, __profile_js_ms: performance.now() - __t0};
+});
+})()"""
+
+_FUNCTION_NAME = re.compile(r'function\s+(\w+)')
+
+
+def script_label(script):
+    """脚本的简短名称：第一个函数名，否则取开头一段"""
+    match = _FUNCTION_NAME.search(script)
+    if match:
+        return match.group(1)
+    return ' '.join(script.split())[:40]
+
+
+class StackSampler(threading.Thread):
+    """定时采样目标线程的调用栈，按折叠栈计数
+
+    采的是墙钟时间：等待浏览器、sleep、网络读写的栈同样会被计入，便于看出时间花在哪一侧
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.overhead = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename == __file__ and code.co_name == '_on_span':
+                    # 正在做内存快照等分析本身的工作，不计入
+                    self.overhead += 1
+                    break
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            else:
+                self.stacks[';'.join(reversed(names))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class CrawlProfiler:
+    """一次爬取的性能分析会话"""
+
+    def __init__(self, name, out_dir=PROFILE_DIR):
+        self.report_dir = os.path.join(out_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{name}")
+        self.page = 1
+        self.pages = []  # (页码, 提取ms, 当前内存KB, 峰值KB, 增长KB)
+        self.page_memory = []  # (页码, 最大分配点, 增长最多的行)
+        self.scripts = []  # (页码, 脚本名, 往返ms, JS执行ms)
+        self._sampler = None
+        self._snapshot = None
+        self._driver = None
+        self._started = None
+
+    def start(self, driver=None):
+        tracemalloc.start()
+        self._snapshot = tracemalloc.take_snapshot()
+        self._sampler = StackSampler(threading.get_ident())
+        self._sampler.start()
+        instrumentation.add_listener(self._on_span)
+        if driver is not None:
+            self.attach(driver)
+        self._started = time.perf_counter()
+        print(f"[profile] 性能分析已开启，报告目录: {self.report_dir}")
+
+    def attach(self, driver):
+        """替换 driver 实例上的 execute_script，记录每次调用的JS执行时间"""
+        original = driver.execute_script
+
+        def execute_script(script, *args):
+            start = time.perf_counter()
+            result = original(_JS_TIMER % script, *args)
+            wall_ms = (time.perf_counter() - start) * 1000
+            js_ms = None
+            if isinstance(result, dict) and '__profile_js_ms' in result:
+                js_ms = result['__profile_js_ms']
+                result = result.get('__profile_result')
+            self.scripts.append((self.page, script_label(script), wall_ms, js_ms))
+            return result
+
+        driver.execute_script = execute_script
+        self._driver = (driver, original, None)
+
+        # cdp_transport 的 Runtime.evaluate 调用同样计入，表达式包一层 performance.now() 计时
+        original_cdp = getattr(driver, 'execute_cdp_cmd', None)
+        if original_cdp is not None:
+            def execute_cdp_cmd(cmd, params):
+                if cmd != 'Runtime.evaluate':
+                    return original_cdp(cmd, params)
+                expression = params.get('expression', '')
+                start = time.perf_counter()
+                response = original_cdp(cmd, dict(params, expression=_CDP_JS_TIMER % expression))
+                wall_ms = (time.perf_counter() - start) * 1000
+                js_ms = None
+                value = (response.get('result') or {}).get('value')
+                if not response.get('exceptionDetails') and isinstance(value, dict) \
+                        and '__profile_js_ms' in value:
+                    js_ms = value['__profile_js_ms']
+                    result = value.get('__profile_result')
+                    response = dict(response, result={'type': 'object', 'value': result} if result is not None
+                                    else {'type': 'object', 'subtype': 'null', 'value': None})
+                self.scripts.append((self.page, script_label(expression), wall_ms, js_ms))
+                return response
+
+            driver.execute_cdp_cmd = execute_cdp_cmd
+            self._driver = (driver, original, original_cdp)
+
+    def _on_span(self, name, duration, fields):
+        if name != 'page.extract':
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        growth = snapshot.compare_to(self._snapshot, 'lineno') if self._snapshot else []
+        grown = sum(stat.size_diff for stat in growth)
+        self.pages.append((self.page, duration * 1000, current / 1024, peak / 1024, grown / 1024))
+        self.page_memory.append((self.page, snapshot.statistics('lineno')[:TOP_ALLOCATORS],
+                                 [s for s in growth if s.size_diff > 0][:TOP_ALLOCATORS]))
+        self._snapshot = snapshot
+        self.page += 1
+
+    def stop(self):
+        """停止采样并写报告，返回报告目录"""
+        elapsed = time.perf_counter() - self._started
+        self._sampler.stop()
+        instrumentation.remove_listener(self._on_span)
+        tracemalloc.stop()
+        if self._driver is not None:
+            driver, original, original_cdp = self._driver
+            driver.execute_script = original
+            if original_cdp is not None:
+                driver.execute_cdp_cmd = original_cdp
+        self.write_report(elapsed)
+        print(f"[profile] 报告已写入 {self.report_dir}")
+        return self.report_dir
+
+    def write_report(self, elapsed):
+        os.makedirs(self.report_dir, exist_ok=True)
+
+        with open(os.path.join(self.report_dir, "cpu.folded"), "w", encoding="utf-8") as f:
+            for stack, count in self._sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        with open(os.path.join(self.report_dir, "pages.tsv"), "w", encoding="utf-8") as f:
+            f.write("page\textract_ms\tcurrent_kb\tpeak_kb\tgrowth_kb\tscript_calls\tjs_ms\tround_trip_ms\n")
+            for page, extract_ms, current, peak, grown in self.pages:
+                calls = [s for s in self.scripts if s[0] == page]
+                js_ms = sum(s[3] or 0 for s in calls)
+                wall_ms = sum(s[2] for s in calls)
+                f.write(f"{page}\t{extract_ms:.1f}\t{current:.0f}\t{peak:.0f}\t{grown:+.0f}\t"
+                        f"{len(calls)}\t{js_ms:.1f}\t{wall_ms:.1f}\n")
+
+        with open(os.path.join(self.report_dir, "memory.txt"), "w", encoding="utf-8") as f:
+            for page, top, growth in self.page_memory:
+                f.write(f"===== 第 {page} 页 =====\n最大分配点:\n")
+                for stat in top:
+                    f.write(f"  {stat}\n")
+                f.write("相对上一页增长:\n")
+                for stat in growth:
+                    f.write(f"  {stat}\n")
+                f.write("\n")
+
+        with open(os.path.join(self.report_dir, "scripts.tsv"), "w", encoding="utf-8") as f:
+            f.write("page\tscript\tround_trip_ms\tjs_ms\tmarshal_ms\n")
+            for page, label, wall_ms, js_ms in self.scripts:
+                js = '' if js_ms is None else f"{js_ms:.2f}"
+                marshal = '' if js_ms is None else f"{wall_ms - js_ms:.2f}"
+                f.write(f"{page}\t{label}\t{wall_ms:.2f}\t{js}\t{marshal}\n")
+
+        # 总览：CPU采样最多的函数 + 各阶段耗时
+        self_time = Counter()
+        for stack, count in self._sampler.stacks.items():
+            self_time[stack.rsplit(';', 1)[-1]] += count
+        samples = self._sampler.samples or 1
+        with open(os.path.join(self.report_dir, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(f"总耗时 {elapsed:.2f}s, 采样 {self._sampler.samples} 次"
+                    f"（另有 {self._sampler.overhead} 次落在分析自身）, "
+                    f"execute_script {len(self.scripts)} 次\n\n采样最多的函数(自身):\n")
+            for name, count in self_time.most_common(20):
+                f.write(f"  {count / samples * 100:6.1f}%  {name}\n")
+            f.write("\n阶段耗时:\n")
+            for name, (count, total, longest, rows) in sorted(instrumentation.phase_stats().items(),
+                                                              key=lambda kv: -kv[1][1]):
+                f.write(f"  {name:<24}{count:>6}{total:>10.2f}s\n")
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报表查询执行计划检查
+对 check_data.REPORT_QUERIES 逐条执行 EXPLAIN，出现超过阈值的全表扫描或文件排序时判为失败；
+--bench 在合成的学生表上对比加索引前后的耗时
+"""
+
+import sys
+import time
+import random
+import argparse
+import pymysql
+from check_data import DB_CONFIG, REPORT_QUERIES
+
+# ============ 配置 ============
+MAX_PLAN_ROWS = 5000  # 全表扫描/文件排序允许的最大估算行数
+BENCH_ROWS = 300000  # 合成学生表行数
+# ==============================
+
+# 报表负载需要的索引（新建表时已包含在 CREATE TABLE 中，这里用于给旧表补齐）
+REPORT_INDEXES = {
+    'students': (
+        ('idx_grade_name', 'grade_name'),
+        ('idx_college_name', 'college_name'),
+        ('idx_class_name', 'class_name'),
+        ('idx_campus_name', 'campus_name'),
+    ),
+    'activities': (
+        ('idx_start_time_hours', 'start_time, hours'),
+        ('idx_org_name_hours', 'org_name, hours'),
+        ('idx_class_name_hours', 'class_name, hours'),
+    ),
+}
+
+
+def explain(cursor, sql):
+    """执行 EXPLAIN，返回每行计划的字典列表"""
+    cursor.execute("EXPLAIN " + sql)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def plan_problems(plan, max_rows=MAX_PLAN_ROWS):
+    """找出计划中超过阈值的全表扫描和文件排序"""
+    problems = []
+    for row in plan:
+        rows = row.get('rows') or 0
+        extra = row.get('Extra') or ''
+        if row.get('type') == 'ALL' and rows > max_rows:
+            problems.append(f"全表扫描 {row.get('table')} (估算 {rows} 行)")
+        if 'Using filesort' in extra and rows > max_rows:
+            problems.append(f"文件排序 {row.get('table')} (估算 {rows} 行)")
+    return problems
+
+
+def describe_plan(plan):
+    """计划的一行摘要：每张表的 type / key / rows / Extra"""
+    return ' | '.join(f"{row.get('table')}: type={row.get('type')}, key={row.get('key')}, "
+                      f"rows={row.get('rows')}, Extra={row.get('Extra') or ''}" for row in plan)
+
+
+def check_report_plans(cursor, queries=None, max_rows=MAX_PLAN_ROWS):
+    """检查所有已登记报表查询的执行计划
+
+    Returns:
+        int: 不合格的查询数
+    """
+    queries = queries or REPORT_QUERIES
+    failures = 0
+    for name, sql in queries.items():
+        plan = explain(cursor, sql)
+        problems = plan_problems(plan, max_rows)
+        keys = ', '.join(str(row.get('key')) for row in plan)
+        if problems:
+            failures += 1
+            print(f"  [失败] {name}: {'; '.join(problems)}")
+        else:
+            print(f"  [通过] {name}: type={plan[0].get('type')}, key={keys}")
+    return failures
+
+
+def ensure_report_indexes(cursor, database=DB_CONFIG['database']):
+    """给已存在的表补齐报表索引（不重建表）"""
+    for table, indexes in REPORT_INDEXES.items():
+        cursor.execute(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+            (database, table)
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        for index_name, columns in indexes:
+            if index_name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD INDEX {index_name} ({columns})")
+                print(f"  [索引] {table}.{index_name} ({columns}) 已添加")
+
+
+def _create_bench_table(cursor, rows):
+    """创建只有原始索引的合成学生表"""
+    cursor.execute("DROP TABLE IF EXISTS students_bench")
+    cursor.execute("""
+    CREATE TABLE students_bench (
+        code VARCHAR(20) PRIMARY KEY,
+        id INT,
+        name VARCHAR(50) NOT NULL,
+        campus_name VARCHAR(100),
+        college_name VARCHAR(100),
+        class_id INT,
+        class_name VARCHAR(50),
+        grade_name VARCHAR(20),
+        INDEX idx_id (id),
+        INDEX idx_name (name),
+        INDEX idx_class_id (class_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+    rng = random.Random(2025)
+    colleges = [f"学院{i:02d}" for i in range(18)]
+    campuses = ["校区A", "校区B", "校区C"]
+    insert_sql = "INSERT INTO students_bench VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+    batch = []
+    for i in range(rows):
+        grade = 2018 + rng.randrange(8)
+        class_id = rng.randrange(1500)
+        batch.append((
+            f"{grade}{i:07d}", i + 1, f"学生{i}", rng.choice(campuses), rng.choice(colleges),
+            class_id, f"班级{class_id}", str(grade)
+        ))
+        if len(batch) >= 5000:
+            cursor.executemany(insert_sql, batch)
+            batch = []
+    if batch:
+        cursor.executemany(insert_sql, batch)
+    cursor.execute("ANALYZE TABLE students_bench")
+    cursor.fetchall()
+
+
+def _time_query(cursor, sql, repeat=3):
+    """取多次执行中的最短耗时（毫秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_student_queries(cursor, rows=BENCH_ROWS, keep=False):
+    """在合成学生表上对比加报表索引前后的查询耗时"""
+    print(f"[基准] 生成 {rows} 行合成学生数据...")
+    _create_bench_table(cursor, rows)
+
+    queries = {name: sql.replace("FROM students", "FROM students_bench")
+               for name, sql in REPORT_QUERIES.items() if name.startswith('student_')}
+
+    before = {name: (_time_query(cursor, sql), explain(cursor, sql)) for name, sql in queries.items()}
+
+    for index_name, columns in REPORT_INDEXES['students']:
+        cursor.execute(f"ALTER TABLE students_bench ADD INDEX {index_name} ({columns})")
+    cursor.execute("ANALYZE TABLE students_bench")
+    cursor.fetchall()
+
+    after = {name: (_time_query(cursor, sql), explain(cursor, sql)) for name, sql in queries.items()}
+
+    # 输出可直接贴进提交说明或报告：耗时对比，以及加索引前后的 EXPLAIN
+    print(f"\n  {'查询':<18}{'加索引前(ms)':>14}{'加索引后(ms)':>14}  计划")
+    for name in queries:
+        problems = plan_problems(after[name][1])
+        plan_note = '通过' if not problems else '; '.join(problems)
+        print(f"  {name:<18}{before[name][0]:>14.1f}{after[name][0]:>14.1f}  {plan_note}")
+    print("\n  EXPLAIN:")
+    for name in queries:
+        print(f"  {name}")
+        print(f"    前: {describe_plan(before[name][1])}")
+        print(f"    后: {describe_plan(after[name][1])}")
+
+    if not keep:
+        cursor.execute("DROP TABLE IF EXISTS students_bench")
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description="报表查询执行计划检查")
+    parser.add_argument('--max-rows', type=int, default=MAX_PLAN_ROWS, help='允许全表扫描/文件排序的最大估算行数')
+    parser.add_argument('--apply-indexes', action='store_true', help='给已存在的表补齐报表索引')
+    parser.add_argument('--bench', type=int, nargs='?', const=BENCH_ROWS, help='在合成学生表上测量加索引前后的耗时')
+    parser.add_argument('--keep', action='store_true', help='保留合成表 students_bench')
+    args = parser.parse_args()
+
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        if args.bench:
+            bench_student_queries(cursor, args.bench, keep=args.keep)
+            conn.commit()
+            return 0
+
+        if args.apply_indexes:
+            ensure_report_indexes(cursor)
+            conn.commit()
+
+        print("报表查询执行计划检查:")
+        failures = check_report_plans(cursor, max_rows=args.max_rows)
+        print(f"\n共 {len(REPORT_QUERIES)} 条查询, 不合格 {failures} 条")
+        return 1 if failures else 0
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
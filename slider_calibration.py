@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滑块偏移自适应校准
+每次拖拽记录 block_x、使用的偏移、拖拽步长和是否成功（captcha_attempts.jsonl），
+据此在线估计"真实偏移"的分布，选首次成功概率最大的偏移；
+某段 block_x 的记录足够多时按段单独估计（分段修正）。
+python slider_calibration.py 输出按天的平均尝试次数、首次成功率和登录耗时
+"""
+
+import os
+import json
+import math
+import argparse
+from datetime import datetime
+
+# ============ 配置 ============
+ATTEMPT_LOG = "captcha_attempts.jsonl"
+DEFAULT_OFFSET = 12  # 没有记录时的先验中心（即原来的固定偏移）
+OFFSET_RANGE = (0, 30)  # 候选偏移范围（像素）
+TOLERANCE = 3  # 假设验证码允许的误差（像素）
+NOISE = 0.1  # 偏移正确却失败/偏移错误却成功的概率（拖拽没被识别等）
+PRIOR_SD = 4.0
+BUCKET_WIDTH = 50  # 分段修正：block_x 每50像素一段
+MIN_BUCKET_ATTEMPTS = 8  # 一段内至少这么多记录才单独估计
+# ==============================
+
+
+class SliderCalibrator:
+    """真实偏移 θ 的网格后验
+
+    一次尝试用偏移 o：|o-θ| <= TOLERANCE 时成功概率 1-NOISE，否则 NOISE。
+    选偏移时取 P(|o-θ| <= TOLERANCE) 最大的 o。
+    """
+
+    def __init__(self, path=ATTEMPT_LOG, default_offset=DEFAULT_OFFSET):
+        self.path = path
+        self.default_offset = default_offset
+        self.grid = list(range(OFFSET_RANGE[0], OFFSET_RANGE[1] + 1))
+        self.prior = [-((theta - default_offset) / PRIOR_SD) ** 2 / 2 for theta in self.grid]
+        self.loglik = [0.0] * len(self.grid)
+        self.bucket_loglik = {}  # 段号 -> 对数似然
+        self.bucket_counts = {}
+        self.attempts = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('type') == 'attempt' and record.get('block_x') is not None:
+                    self._update(record['block_x'], record['offset'], record['success'])
+
+    def _update(self, block_x, offset, success):
+        hit, miss = math.log(1 - NOISE), math.log(NOISE)
+        bucket = int(block_x) // BUCKET_WIDTH
+        bucket_loglik = self.bucket_loglik.setdefault(bucket, [0.0] * len(self.grid))
+        for i, theta in enumerate(self.grid):
+            inside = abs(offset - theta) <= TOLERANCE
+            delta = (hit if inside else miss) if success else (miss if inside else hit)
+            self.loglik[i] += delta
+            bucket_loglik[i] += delta
+        self.bucket_counts[bucket] = self.bucket_counts.get(bucket, 0) + 1
+        self.attempts += 1
+
+    def posterior(self, block_x=None):
+        """θ 的后验（按网格归一化）；block_x 所在段记录足够时用该段的数据"""
+        loglik = self.loglik
+        if block_x is not None:
+            bucket = int(block_x) // BUCKET_WIDTH
+            if self.bucket_counts.get(bucket, 0) >= MIN_BUCKET_ATTEMPTS:
+                loglik = self.bucket_loglik[bucket]
+        logp = [p + l for p, l in zip(self.prior, loglik)]
+        top = max(logp)
+        weights = [math.exp(v - top) for v in logp]
+        total = sum(weights)
+        return [w / total for w in weights]
+
+    def success_probability(self, offset, block_x=None):
+        posterior = self.posterior(block_x)
+        return sum(p for theta, p in zip(self.grid, posterior) if abs(offset - theta) <= TOLERANCE)
+
+    def choose(self, block_x=None):
+        """首次成功概率最大的偏移（相同时取离默认值近的）"""
+        posterior = self.posterior(block_x)
+        best, best_score = self.default_offset, -1.0
+        for offset in sorted(self.grid, key=lambda o: abs(o - self.default_offset)):
+            score = sum(p for theta, p in zip(self.grid, posterior) if abs(offset - theta) <= TOLERANCE)
+            if score > best_score + 1e-9:
+                best, best_score = offset, score
+        return best
+
+    def _append(self, record):
+        record['ts'] = datetime.now().isoformat(timespec='seconds')
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record_attempt(self, block_x, offset, success, steps=None, attempt=None):
+        """记录一次拖拽，并立即更新估计（同一次登录的下一次尝试就会用上）"""
+        self._update(block_x, offset, success)
+        self._append({'type': 'attempt', 'block_x': block_x, 'offset': offset, 'distance': block_x + offset,
+                      'steps': steps, 'success': bool(success), 'attempt': attempt})
+
+    def record_login(self, attempts, seconds, success):
+        self._append({'type': 'login', 'attempts': attempts, 'seconds': round(seconds, 2), 'success': bool(success)})
+
+
+def report(path=ATTEMPT_LOG):
+    """按天统计登录尝试情况，并输出当前的偏移估计"""
+    days = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            day = days.setdefault(record.get('ts', '')[:10], {'logins': 0, 'ok': 0, 'attempts': 0, 'seconds': 0.0,
+                                                              'first': 0, 'first_ok': 0})
+            if record.get('type') == 'login':
+                day['logins'] += 1
+                day['ok'] += record['success']
+                day['attempts'] += record['attempts']
+                day['seconds'] += record['seconds']
+            elif record.get('type') == 'attempt' and record.get('attempt') == 1:
+                day['first'] += 1
+                day['first_ok'] += record['success']
+
+    print(f"{'日期':<12}{'登录':>6}{'成功':>6}{'平均尝试':>10}{'首次成功率':>12}{'平均耗时(s)':>12}")
+    for day, s in sorted(days.items()):
+        if not s['logins']:
+            continue
+        first_rate = f"{s['first_ok'] / s['first'] * 100:.0f}%" if s['first'] else '-'
+        print(f"{day:<12}{s['logins']:>6}{s['ok']:>6}{s['attempts'] / s['logins']:>10.2f}"
+              f"{first_rate:>12}{s['seconds'] / s['logins']:>12.1f}")
+
+    calibrator = SliderCalibrator(path)
+    offset = calibrator.choose()
+    print(f"\n当前估计: 偏移 {offset}px, 首次成功概率 {calibrator.success_probability(offset) * 100:.0f}% "
+          f"({calibrator.attempts} 次记录)")
+    for bucket in sorted(calibrator.bucket_counts):
+        if calibrator.bucket_counts[bucket] >= MIN_BUCKET_ATTEMPTS:
+            block_x = bucket * BUCKET_WIDTH
+            print(f"    block_x {block_x}-{block_x + BUCKET_WIDTH - 1}: 偏移 {calibrator.choose(block_x)}px "
+                  f"({calibrator.bucket_counts[bucket]} 次)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="滑块偏移校准报告")
+    parser.add_argument('--log', default=ATTEMPT_LOG)
+    args = parser.parse_args()
+    if os.path.exists(args.log):
+        report(args.log)
+    else:
+        print(f"还没有尝试记录: {args.log}")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+学生学分/总分的历史快照（增量编码）
+students 表每次爬取都被整表覆盖，这里按爬取批次（crawl_id）只记录变化的字段：
+  - student_crawls: 每次爬取一行（开始/结束时间、是否完整、变化人数）
+  - student_history: (学号, crawl_id) 一行，changed_mask 标出本次变化的字段，没变的学生不写；
+    学生第一次出现、或距上个关键帧已累计 KEYFRAME_EVERY 条增量时写完整的关键帧
+  - student_history_head: 每个学生最新的取值和距关键帧的增量数，用于和本次爬取比较
+存储量随变化量增长，与学生数 × 爬取次数无关；还原某个时间点最多读每个学生 KEYFRAME_EVERY 行。
+查询: state_at(cursor, 时间) / changes_between(cursor, 时间1, 时间2)
+python student_history.py --at "2026-10-01" [--code 学号]
+python student_history.py --since "2026-09-01" [--until "2026-10-01"] [--field credit]
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+# ============ 配置 ============
+KEYFRAME_EVERY = 16  # 每个学生每累计这么多条增量写一次关键帧
+# ==============================
+
+# 记录历史的字段: (列名, 爬取数据里的键, 类型)；列在 changed_mask 里的位次即顺序，只能在末尾追加
+FIELDS = (
+    ('credit', 'credit', 'decimal'),
+    ('sum_score', 'sumScore', 'decimal'),
+    ('leave_total_num', 'leaveTotalNum', 'int'),
+    ('leave_success_num', 'leaveSuccessNum', 'int'),
+    ('leave_fail_num', 'leaveFailNum', 'int'),
+)
+COLUMNS = tuple(column for column, _, _ in FIELDS)
+FULL_MASK = (1 << len(FIELDS)) - 1
+
+_crawl = {'id': None, 'students': 0, 'changed': 0}  # 当前爬取批次（init_database 时开始）
+
+
+def init_history_tables(cursor):
+    """创建历史表（不存在时才创建；students 表重建时不动）"""
+    field_sql = ''.join(
+        f"        {column} {'DECIMAL(10,2)' if kind == 'decimal' else 'INT'},\n"
+        for column, _, kind in FIELDS
+    )
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS student_crawls (
+        crawl_id INT AUTO_INCREMENT PRIMARY KEY COMMENT '爬取批次',
+        started_at DATETIME NOT NULL COMMENT '开始时间',
+        finished_at DATETIME COMMENT '结束时间',
+        complete TINYINT NOT NULL DEFAULT 0 COMMENT '是否完整爬取',
+        students INT NOT NULL DEFAULT 0 COMMENT '本次写入的学生数',
+        changed INT NOT NULL DEFAULT 0 COMMENT '本次有变化的学生数',
+        INDEX idx_started_at (started_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='学生爬取批次'
+    """)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS student_history (
+        code VARCHAR(20) NOT NULL COMMENT '学号',
+        crawl_id INT NOT NULL COMMENT '爬取批次',
+        is_keyframe TINYINT NOT NULL DEFAULT 0 COMMENT '1=完整取值',
+        changed_mask INT NOT NULL COMMENT '按位标出本行记录的字段',
+{field_sql}        PRIMARY KEY (code, crawl_id),
+        INDEX idx_keyframe (is_keyframe, code, crawl_id),
+        INDEX idx_crawl_id (crawl_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='学生学分/总分历史（增量）'
+    """)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS student_history_head (
+        code VARCHAR(20) PRIMARY KEY COMMENT '学号',
+        last_crawl_id INT NOT NULL COMMENT '最近一次有变化的爬取批次',
+        deltas INT NOT NULL DEFAULT 0 COMMENT '距上个关键帧的增量数',
+{field_sql.rstrip().rstrip(',')}
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='学生历史的最新取值'
+    """)
+
+
+def begin_crawl(cursor):
+    """开始一个爬取批次（与建表在同一事务），之后的 record_snapshots 都记在这个批次下"""
+    init_history_tables(cursor)
+    cursor.execute("INSERT INTO student_crawls (started_at) VALUES (%s)", (datetime.now(),))
+    _crawl.update(id=cursor.lastrowid, students=0, changed=0)
+    return _crawl['id']
+
+
+def current_crawl():
+    return _crawl['id']
+
+
+def finish_crawl(cursor, complete):
+    """结束当前批次，记下结束时间和变化人数"""
+    if _crawl['id'] is None:
+        return None
+    cursor.execute(
+        "UPDATE student_crawls SET finished_at = %s, complete = %s, students = %s, changed = %s "
+        "WHERE crawl_id = %s",
+        (datetime.now(), int(bool(complete)), _crawl['students'], _crawl['changed'], _crawl['id'])
+    )
+    crawl = dict(_crawl)
+    _crawl.update(id=None, students=0, changed=0)
+    return crawl
+
+
+def _value(kind, val):
+    """统一爬取数据和数据库读出的值，便于比较（请假次数缺省为 0，与 students 表一致）"""
+    if val in ('', None):
+        return 0 if kind == 'int' else None
+    if kind == 'decimal':
+        return Decimal(str(val)).quantize(Decimal('0.01'))
+    return int(val)
+
+
+def _values(student):
+    return tuple(_value(kind, student.get(key)) for _, key, kind in FIELDS)
+
+
+def record_snapshots(cursor, students):
+    """登记一批学生在当前批次的取值，只写变化的字段（与 students 写入在同一事务中调用）
+
+    Returns:
+        int: 有变化的学生数；没有进行中的批次时不记录，返回 0
+    """
+    crawl_id = _crawl['id']
+    if crawl_id is None:
+        return 0
+    latest = {}
+    for student in students:
+        if student.get('code'):
+            latest[student['code']] = _values(student)
+    if not latest:
+        return 0
+
+    placeholders = ', '.join(['%s'] * len(latest))
+    cursor.execute(
+        f"SELECT code, last_crawl_id, deltas, {', '.join(COLUMNS)} FROM student_history_head "
+        f"WHERE code IN ({placeholders})",
+        list(latest)
+    )
+    heads = {row[0]: (row[1], row[2], tuple(_value(kind, v) for (_, _, kind), v in zip(FIELDS, row[3:])))
+             for row in cursor.fetchall()}
+
+    history = []
+    new_heads = []
+    for code, values in latest.items():
+        head = heads.get(code)
+        if head is None:
+            mask, keyframe, deltas = FULL_MASK, 1, 0
+        else:
+            last_crawl_id, deltas, old = head
+            mask = sum(1 << i for i, (a, b) in enumerate(zip(old, values)) if a != b)
+            if not mask:
+                continue
+            # 同一批次里再次出现（换档重叠、修补）不重复计数
+            if last_crawl_id != crawl_id:
+                deltas += 1
+            keyframe = int(deltas >= KEYFRAME_EVERY)
+            if keyframe:
+                mask, deltas = FULL_MASK, 0
+        stored = tuple(v if mask >> i & 1 else None for i, v in enumerate(values))
+        history.append((code, crawl_id, keyframe, mask) + stored)
+        new_heads.append((code, crawl_id, deltas) + values)
+
+    if history:
+        columns = ', '.join(COLUMNS)
+        marks = ', '.join(['%s'] * len(COLUMNS))
+        merge = ', '.join(f"{c} = IF(VALUES(changed_mask) & {1 << i}, VALUES({c}), {c})"
+                          for i, c in enumerate(COLUMNS))
+        # 同一批次已有一行时合并：字段取后到的值，掩码取并集
+        cursor.executemany(
+            f"INSERT INTO student_history (code, crawl_id, is_keyframe, changed_mask, {columns}) "
+            f"VALUES (%s, %s, %s, %s, {marks}) "
+            f"ON DUPLICATE KEY UPDATE {merge}, is_keyframe = GREATEST(is_keyframe, VALUES(is_keyframe)), "
+            f"changed_mask = changed_mask | VALUES(changed_mask)",
+            history
+        )
+        cursor.executemany(
+            f"REPLACE INTO student_history_head (code, last_crawl_id, deltas, {columns}) "
+            f"VALUES (%s, %s, %s, {marks})",
+            new_heads
+        )
+    _crawl['students'] += len(latest)
+    _crawl['changed'] += len(history)
+    return len(history)
+
+
+def resolve_crawl(cursor, when):
+    """时间点对应的爬取批次：when 之前开始的最后一次；when 为整数时当作 crawl_id"""
+    if isinstance(when, int):
+        return when
+    cursor.execute("SELECT MAX(crawl_id) FROM student_crawls WHERE started_at <= %s", (when,))
+    row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+
+def _replay(rows):
+    """按 (学号, crawl_id) 排好序的历史行依次叠加成 {学号: {字段: 值}}"""
+    states = {}
+    for code, _, mask, *values in rows:
+        state = states.setdefault(code, {})
+        for i, column in enumerate(COLUMNS):
+            if mask >> i & 1:
+                state[column] = values[i]
+    return states
+
+
+def state_at(cursor, when, codes=None):
+    """时间点 when 时各学生的取值: {学号: {字段: 值}}（从最近的关键帧叠加之后的增量）"""
+    crawl_id = resolve_crawl(cursor, when)
+    if not crawl_id:
+        return {}
+    params = [crawl_id]
+    code_filter = ''
+    if codes:
+        code_filter = f" AND code IN ({', '.join(['%s'] * len(codes))})"
+        params += list(codes)
+    cursor.execute(
+        f"SELECT h.code, h.crawl_id, h.changed_mask, {', '.join('h.' + c for c in COLUMNS)} "
+        f"FROM student_history h JOIN ("
+        f"  SELECT code, MAX(crawl_id) AS keyframe FROM student_history "
+        f"  WHERE is_keyframe = 1 AND crawl_id <= %s{code_filter} GROUP BY code"
+        f") k ON h.code = k.code AND h.crawl_id >= k.keyframe AND h.crawl_id <= %s "
+        f"ORDER BY h.code, h.crawl_id",
+        params + [crawl_id]
+    )
+    return _replay(cursor.fetchall())
+
+
+def changes_between(cursor, since, until=None):
+    """since 到 until（默认现在）之间有变化的学生: {学号: {字段: (旧值, 新值)}}"""
+    start = resolve_crawl(cursor, since)
+    end = resolve_crawl(cursor, until if until is not None else datetime.now())
+    if end <= start:
+        return {}
+    cursor.execute(
+        "SELECT DISTINCT code FROM student_history WHERE crawl_id > %s AND crawl_id <= %s",
+        (start, end)
+    )
+    codes = [row[0] for row in cursor.fetchall()]
+    if not codes:
+        return {}
+    before = state_at(cursor, start, codes) if start else {}
+    after = state_at(cursor, end, codes)
+    changes = {}
+    for code in codes:
+        old = before.get(code, {})
+        new = after.get(code, {})
+        diff = {column: (old.get(column), new.get(column)) for column in COLUMNS
+                if old.get(column) != new.get(column)}
+        if diff:
+            changes[code] = diff
+    return changes
+
+
+def main(argv=None):
+    import argparse
+    import pymysql
+    from check_data import DB_CONFIG
+
+    parser = argparse.ArgumentParser(description="查询学生学分/总分的历史快照")
+    parser.add_argument('--at', help='还原该时间点的取值')
+    parser.add_argument('--since', help='列出该时间点之后的变化')
+    parser.add_argument('--until', help='变化的截止时间（默认现在）')
+    parser.add_argument('--code', action='append', help='只看指定学号（可重复）')
+    parser.add_argument('--field', choices=COLUMNS, help='since: 只看某个字段的变化')
+    parser.add_argument('--limit', type=int, default=50, help='最多显示的学生数')
+    args = parser.parse_args(argv)
+    if not args.at and not args.since:
+        parser.error("需要 --at 或 --since")
+
+    conn = pymysql.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        if args.at:
+            states = state_at(cursor, args.at, args.code)
+            print(f"{args.at} 时共 {len(states)} 名学生有记录")
+            print(f"{'学号':<14}" + ''.join(f"{column:>18}" for column in COLUMNS))
+            for code in sorted(states)[:args.limit]:
+                print(f"{code:<14}" + ''.join(f"{str(states[code].get(column)):>18}" for column in COLUMNS))
+            return 0
+        changes = changes_between(cursor, args.since, args.until)
+        if args.code:
+            changes = {code: diff for code, diff in changes.items() if code in args.code}
+        if args.field:
+            changes = {code: {args.field: diff[args.field]} for code, diff in changes.items()
+                       if args.field in diff}
+        print(f"{args.since} ~ {args.until or '现在'}: {len(changes)} 名学生有变化")
+        for code in sorted(changes)[:args.limit]:
+            print(f"  {code}: " + ', '.join(f"{column} {old} -> {new}"
+                                           for column, (old, new) in changes[code].items()))
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+汇总表（增量维护）
+students / activities 每批写入时记录新增、更新的行，
+只把差值累加到汇总表，报表直接读取汇总结果，不再全表扫描
+（两张表都只在重建时删除数据，届时由 reset_summary / rebuild_summary 整体清零或重算）
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+
+def _month(row):
+    start_time = row.get('start_time')
+    return start_time.strftime('%Y-%m') if start_time else ''
+
+
+# 每个实体：基础表、主键、参与汇总的列、汇总维度 (维度名, 取值函数, SQL表达式)
+ENTITIES = {
+    'students': {
+        'table': 'students',
+        'key': 'code',
+        'id_col': 'id',
+        'summary': 'student_summary',
+        'columns': ('code', 'id', 'grade_name', 'college_name', 'class_name', 'campus_name'),
+        'hours': None,
+        'dims': (
+            ('grade', lambda r: r.get('grade_name'), 'grade_name'),
+            ('college', lambda r: r.get('college_name'), 'college_name'),
+            ('class', lambda r: r.get('class_name'), 'class_name'),
+            ('campus', lambda r: r.get('campus_name'), 'campus_name'),
+        ),
+    },
+    'activities': {
+        'table': 'activities',
+        'key': 'act_id',
+        'id_col': 'act_id',
+        'summary': 'activity_summary',
+        'columns': ('act_id', 'org_name', 'class_name', 'start_time', 'hours'),
+        'hours': 'hours',
+        'dims': (
+            ('org', lambda r: r.get('org_name'), 'org_name'),
+            ('class', lambda r: r.get('class_name'), 'class_name'),
+            ('month', _month, "DATE_FORMAT(start_time, '%%Y-%%m')"),
+        ),
+    },
+}
+
+ALL_DIM = 'all'  # 总计行：dim='all', dim_value=''
+
+
+def init_summary_tables(cursor):
+    """创建汇总表（不存在时才创建）"""
+    for entity, conf in ENTITIES.items():
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {conf['summary']} (
+            dim VARCHAR(20) NOT NULL COMMENT '维度: all/grade/college/...',
+            dim_value VARCHAR(200) NOT NULL DEFAULT '' COMMENT '维度取值',
+            cnt INT NOT NULL DEFAULT 0 COMMENT '记录数',
+            hours_sum DECIMAL(14,2) NOT NULL DEFAULT 0 COMMENT '学时合计',
+            min_id INT COMMENT '最小ID（仅总计行）',
+            max_id INT COMMENT '最大ID（仅总计行）',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+            PRIMARY KEY (dim, dim_value)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='{entity}汇总表'
+        """)
+
+
+def reset_summary(cursor, entity):
+    """清空某实体的汇总（基础表被重建时调用）"""
+    summary = ENTITIES[entity]['summary']
+    init_summary_tables(cursor)
+    cursor.execute(f"DELETE FROM {summary}")
+    cursor.execute(f"INSERT INTO {summary} (dim, dim_value, cnt) VALUES (%s, '', 0)", (ALL_DIM,))
+
+
+def rebuild_summary(cursor, entity):
+    """从基础表全量重算汇总（首次使用或校验不一致时调用）"""
+    conf = ENTITIES[entity]
+    summary = conf['summary']
+    hours_expr = f"COALESCE(SUM({conf['hours']}), 0)" if conf['hours'] else "0"
+
+    reset_summary(cursor, entity)
+    cursor.execute(
+        f"SELECT COUNT(*), {hours_expr}, MIN({conf['id_col']}), MAX({conf['id_col']}) FROM {conf['table']}"
+    )
+    cnt, hours_sum, min_id, max_id = cursor.fetchone()
+    cursor.execute(
+        f"UPDATE {summary} SET cnt = %s, hours_sum = %s, min_id = %s, max_id = %s WHERE dim = %s",
+        (cnt, hours_sum, min_id, max_id, ALL_DIM)
+    )
+    for dim, _, sql_expr in conf['dims']:
+        cursor.execute(
+            f"INSERT INTO {summary} (dim, dim_value, cnt, hours_sum) "
+            f"SELECT %s, COALESCE({sql_expr}, ''), COUNT(*), {hours_expr} "
+            f"FROM {conf['table']} GROUP BY COALESCE({sql_expr}, '')",
+            (dim,)
+        )
+
+
+def ensure_summary(cursor, entity):
+    """汇总表不存在或没有总计行时全量重算一次"""
+    init_summary_tables(cursor)
+    cursor.execute(f"SELECT 1 FROM {ENTITIES[entity]['summary']} WHERE dim = %s", (ALL_DIM,))
+    if cursor.fetchone() is None:
+        rebuild_summary(cursor, entity)
+
+
+def _normalize(entity, row):
+    """统一数据库读出的值和新写入的值，便于比较"""
+    conf = ENTITIES[entity]
+    result = {}
+    for col in conf['columns']:
+        val = row.get(col)
+        if col == conf['hours']:
+            val = Decimal(str(val or 0)).quantize(Decimal('0.01'))
+        elif isinstance(val, str) or val is None:
+            val = val or ''
+        result[col] = val
+    return result
+
+
+def fetch_existing_rows(cursor, entity, keys):
+    """读取本批次主键对应的旧行（写入前调用）
+
+    Returns:
+        dict: {主键: 旧行}
+    """
+    conf = ENTITIES[entity]
+    keys = [k for k in keys if k not in ('', None)]
+    if not keys:
+        return {}
+    columns = conf['columns']
+    placeholders = ', '.join(['%s'] * len(keys))
+    cursor.execute(
+        f"SELECT {', '.join(columns)} FROM {conf['table']} WHERE {conf['key']} IN ({placeholders})",
+        keys
+    )
+    existing = {}
+    for values in cursor.fetchall():
+        row = _normalize(entity, dict(zip(columns, values)))
+        existing[row[conf['key']]] = row
+    return existing
+
+
+def new_changeset():
+    """本批次的变更集合：新增行、(旧行, 新行) 更新对"""
+    return {'inserted': [], 'updated': []}
+
+
+def record_change(changes, entity, existing, row):
+    """登记一行成功写入，按旧行是否存在归入新增或更新"""
+    row = _normalize(entity, row)
+    key = row[ENTITIES[entity]['key']]
+    old = existing.get(key)
+    if old is None:
+        changes['inserted'].append(row)
+    elif old != row:
+        changes['updated'].append((old, row))
+    existing[key] = row
+
+
+def apply_changes(cursor, entity, changes):
+    """把变更集合的差值累加到汇总表（与写入在同一事务中调用）"""
+    conf = ENTITIES[entity]
+    summary = conf['summary']
+    id_col = conf['id_col']
+    hours_col = conf['hours']
+
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+
+    def add(row, sign):
+        hours = row[hours_col] if hours_col else Decimal(0)
+        for dim, value_of, _ in conf['dims']:
+            delta = deltas[(dim, str(value_of(row) or ''))]
+            delta[0] += sign
+            delta[1] += sign * hours
+        total = deltas[(ALL_DIM, '')]
+        total[0] += sign
+        total[1] += sign * hours
+
+    added_ids = []
+    removed_ids = []
+    for row in changes['inserted']:
+        add(row, 1)
+        added_ids.append(row[id_col])
+    for old, new in changes['updated']:
+        add(old, -1)
+        add(new, 1)
+        if old[id_col] != new[id_col]:
+            removed_ids.append(old[id_col])
+            added_ids.append(new[id_col])
+
+    rows = [(dim, value[:200], cnt, hours) for (dim, value), (cnt, hours) in deltas.items()
+            if cnt != 0 or hours != 0]
+    if rows:
+        cursor.executemany(
+            f"INSERT INTO {summary} (dim, dim_value, cnt, hours_sum) VALUES (%s, %s, %s, %s) "
+            f"ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt), hours_sum = hours_sum + VALUES(hours_sum)",
+            rows
+        )
+        cursor.execute(f"DELETE FROM {summary} WHERE cnt <= 0 AND dim <> %s", (ALL_DIM,))
+
+    added_ids = [i for i in added_ids if i not in ('', None)]
+    if added_ids:
+        lo, hi = min(added_ids), max(added_ids)
+        cursor.execute(
+            f"UPDATE {summary} SET min_id = LEAST(COALESCE(min_id, %s), %s), "
+            f"max_id = GREATEST(COALESCE(max_id, %s), %s) WHERE dim = %s",
+            (lo, lo, hi, hi, ALL_DIM)
+        )
+    if removed_ids:
+        # 删除的ID恰好是边界时才回表取值（id列有索引，代价很小）
+        cursor.execute(f"SELECT min_id, max_id FROM {summary} WHERE dim = %s", (ALL_DIM,))
+        bounds = cursor.fetchone()
+        if bounds and (bounds[0] in removed_ids or bounds[1] in removed_ids):
+            cursor.execute(f"SELECT MIN({id_col}), MAX({id_col}) FROM {conf['table']}")
+            min_id, max_id = cursor.fetchone()
+            cursor.execute(
+                f"UPDATE {summary} SET min_id = %s, max_id = %s WHERE dim = %s",
+                (min_id, max_id, ALL_DIM)
+            )
+
+    return len(changes['inserted']), len(changes['updated'])
+
+
+def read_total(cursor, entity):
+    """读取总计行: (记录数, 学时合计, 最小ID, 最大ID)"""
+    cursor.execute(
+        f"SELECT cnt, hours_sum, min_id, max_id FROM {ENTITIES[entity]['summary']} WHERE dim = %s",
+        (ALL_DIM,)
+    )
+    return cursor.fetchone()
+
+
+def read_dimension(cursor, entity, dim, order_by_count=False):
+    """读取某个维度的汇总: [(取值, 记录数, 学时合计)]"""
+    order = "cnt DESC" if order_by_count else "dim_value"
+    cursor.execute(
+        f"SELECT dim_value, cnt, hours_sum FROM {ENTITIES[entity]['summary']} "
+        f"WHERE dim = %s ORDER BY {order}",
+        (dim,)
+    )
+    return cursor.fetchall()
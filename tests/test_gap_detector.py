@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+gap_detector 的离线准确率与耗时测试
+tests/captchas/ 下是保存好的验证码图，文件名里带缺口位置：<序号>_x<缺口x>[_dpr2].jpg
+（_dpr2 为 devicePixelRatio=2 的截图，画布 CSS 宽度仍是 310）；
+换成真实截图时按同样的规则命名放进去即可
+
+python -m pytest tests -q
+"""
+
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gap_detector import CANVAS_WIDTH, find_gap, synthetic_captcha  # noqa: E402
+
+Image = pytest.importorskip('PIL.Image')
+
+# ============ 配置 ============
+CAPTCHA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'captchas')
+TOLERANCE = 3  # 允许的误差（CSS 像素），滑块校验的容差比这个大
+MAX_MS = 20  # 单张图的耗时上限（取多次运行的中位数），实测 2-4ms
+SYNTHETIC_COUNT = 200
+MIN_ACCURACY = 0.95  # 合成图误差 ≤ TOLERANCE 的比例下限，seed=0 实测 96%
+# ==============================
+
+_NAME = re.compile(r'_x(\d+)(?:_dpr(\d))?\.(?:png|jpg)$')
+
+
+def _saved_captchas():
+    cases = []
+    for name in sorted(os.listdir(CAPTCHA_DIR)):
+        match = _NAME.search(name)
+        if match:
+            cases.append(pytest.param(name, int(match.group(1)), id=name))
+    return cases
+
+
+def _timed_ms(image, runs=5):
+    """多次运行取中位数，避开首次调用和调度抖动"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        found = find_gap(image, css_width=CANVAS_WIDTH)
+        timings.append((time.perf_counter() - start) * 1000)
+    return found, float(np.median(timings))
+
+
+@pytest.mark.parametrize('name, expected', _saved_captchas())
+def test_saved_captcha(name, expected):
+    image = Image.open(os.path.join(CAPTCHA_DIR, name)).convert('RGB')
+    found, elapsed = _timed_ms(image)
+    assert found is not None, f"{name}: 没有找到缺口"
+    assert abs(found - expected) <= TOLERANCE, f"{name}: 找到 {found}，实际 {expected}"
+    assert elapsed < MAX_MS, f"{name}: 耗时 {elapsed:.1f}ms"
+
+
+@pytest.mark.parametrize('scale', [1, 2])
+def test_synthetic_accuracy_and_latency(scale):
+    rng = np.random.default_rng(0)
+    count = SYNTHETIC_COUNT // scale
+    within = 0
+    latencies = []
+    for _ in range(count):
+        image, expected = synthetic_captcha(rng, scale=scale)
+        start = time.perf_counter()
+        found = find_gap(image, css_width=CANVAS_WIDTH)
+        latencies.append((time.perf_counter() - start) * 1000)
+        within += found is not None and abs(found - expected) <= TOLERANCE
+    assert within / count >= MIN_ACCURACY
+    assert np.median(latencies) < MAX_MS
+
+
+def test_too_small_image():
+    assert find_gap(np.zeros((20, 60, 3), dtype=np.uint8)) is None
+
+
+def test_flat_image_has_no_gap():
+    assert find_gap(np.full((155, 310, 3), 128, dtype=np.uint8), css_width=CANVAS_WIDTH) is None